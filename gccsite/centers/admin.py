@@ -2,8 +2,9 @@
 # SPDX-License-Identifier: GPL-3.0+
 
 import centers.models
-import traceback
+from centers.geocoding import enqueue_geocoding, geocoding_progress
 from django.contrib import admin
+from django.db.models import OuterRef, Subquery
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -20,47 +21,58 @@ class CenterAdmin(admin.ModelAdmin):
         'coordinates',
         'is_active',
         'contact_names',
+        'geocoding_status',
     )
     actions = ('geocode_centers', 'normalize_centers')
     search_fields = ('name', 'city', 'comments')
     inlines = [ContactInlineAdmin]
 
+    def get_queryset(self, request):
+        last_job = centers.models.GeocodingJob.objects.filter(
+            center=OuterRef('pk')
+        ).order_by('-pk')
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                last_job_kind=Subquery(last_job.values('kind')[:1]),
+                last_job_status=Subquery(last_job.values('status')[:1]),
+            )
+        )
+
     def contact_names(self, obj):
         return ', '.join(c.get_full_name() for c in obj.contacts.all())
 
-    def geocode_centers(self, request, queryset):
-        success = 0
-        errors = 0
-        for center in queryset:
-            try:
-                center.geocode(suffix=', FRANCE')
-                success += 1
-            except Exception:
-                errors += 1
+    def geocoding_status(self, obj):
+        if obj.last_job_status is None:
+            return '-'
+        return '{} ({})'.format(
+            centers.models.GeocodingJobKind(obj.last_job_kind).name,
+            centers.models.GeocodingJobStatus(obj.last_job_status).name,
+        )
+
+    geocoding_status.short_description = _("Geocoding")
+
+    def enqueue(self, request, queryset, kind):
+        queued = enqueue_geocoding(queryset, kind)
         self.message_user(
             request,
-            "{success} centers geocoded, {errors} errors".format(
-                success=success, errors=errors
+            "{queued} centers queued, geocoding jobs: {pending} pending, "
+            "{done} done, {failed} failed".format(
+                queued=queued, **geocoding_progress()
             ),
         )
 
+    def geocode_centers(self, request, queryset):
+        self.enqueue(
+            request, queryset, centers.models.GeocodingJobKind.geocode
+        )
+
     geocode_centers.short_description = _("Geocode selected centers")
 
     def normalize_centers(self, request, queryset):
-        success = 0
-        errors = 0
-        for center in queryset:
-            try:
-                center.normalize(suffix=', FRANCE')
-                success += 1
-            except Exception:
-                traceback.print_exc()
-                errors += 1
-        self.message_user(
-            request,
-            "{success} centers normalized, {errors} errors".format(
-                success=success, errors=errors
-            ),
+        self.enqueue(
+            request, queryset, centers.models.GeocodingJobKind.normalize
         )
 
     normalize_centers.short_description = _(
@@ -68,4 +80,19 @@ class CenterAdmin(admin.ModelAdmin):
     )
 
 
+class GeocodingJobAdmin(admin.ModelAdmin):
+    list_filter = ('status', 'kind')
+    list_display = (
+        'center',
+        'kind',
+        'status',
+        'attempts',
+        'next_attempt',
+        'last_error',
+    )
+    list_select_related = ('center',)
+    readonly_fields = ('created', 'done')
+
+
 admin.site.register(centers.models.Center, CenterAdmin)
+admin.site.register(centers.models.GeocodingJob, GeocodingJobAdmin)
@@ -0,0 +1,268 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Process-level cache of the map of the centers: the GeoJSON feed of the active
+centers and their upcoming events, and a k-d tree of their coordinates to find
+the centers closest to an applicant without querying the database.
+
+Like gcc.models.SignupWindow, the cache is invalidated through a token stored
+in Django's cache each time a center or an event changes (see gcc.signals),
+and it expires when the next upcoming event starts.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Prefetch
+from django.utils import timezone
+
+from centers.models import Center
+from gcc.models import Event
+
+# Mean radius of the Earth, in kilometers
+EARTH_RADIUS = 6371
+
+CenterMapState = namedtuple(
+    'CenterMapState',
+    'generation expires modified centers located index geojson etag',
+)
+NearCenter = namedtuple('NearCenter', 'center distance')
+
+
+def unit_vector(lat, lng):
+    """
+    Position of a point on the unit sphere, the euclidean distance between two
+    positions grows with the great-circle distance between the points.
+    """
+    lat, lng = math.radians(lat), math.radians(lng)
+    return (
+        math.cos(lat) * math.cos(lng),
+        math.cos(lat) * math.sin(lng),
+        math.sin(lat),
+    )
+
+
+def squared_distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def great_circle_distance(a, b):
+    """
+    Distance in kilometers between two unit vectors.
+    """
+    chord = math.sqrt(squared_distance(a, b))
+    return 2 * EARTH_RADIUS * math.asin(min(1, chord / 2))
+
+
+class KDTree:
+    """
+    Static k-d tree of points, nodes are (index, axis, left, right) tuples
+    where index is the position of the point in `points`.
+    """
+
+    def __init__(self, points):
+        self.points = list(points)
+        self.root = self.build(list(range(len(self.points))), 0)
+
+    def build(self, indices, depth):
+        if not indices:
+            return None
+
+        axis = depth % len(self.points[0])
+        indices.sort(key=lambda index: self.points[index][axis])
+        median = len(indices) // 2
+        return (
+            indices[median],
+            axis,
+            self.build(indices[:median], depth + 1),
+            self.build(indices[median + 1 :], depth + 1),
+        )
+
+    def nearest(self, point, count):
+        """
+        Get the indices of the `count` points closest to `point`, closest
+        first.
+        """
+        # Max-heap of the best candidates, by negated squared distance
+        best = []
+
+        def visit(node):
+            if node is None:
+                return
+
+            index, axis, left, right = node
+            distance = squared_distance(point, self.points[index])
+
+            if len(best) < count:
+                heapq.heappush(best, (-distance, index))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, index))
+
+            delta = point[axis] - self.points[index][axis]
+            near, far = (left, right) if delta < 0 else (right, left)
+            visit(near)
+
+            # The other side may only hold closer points if the splitting
+            # plane is closer than the worst candidate
+            if len(best) < count or delta * delta < -best[0][0]:
+                visit(far)
+
+        if count > 0:
+            visit(self.root)
+
+        return [index for _, index in sorted(best, reverse=True)]
+
+
+def feature(center):
+    return {
+        'type': 'Feature',
+        'id': center.pk,
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [float(center.lng), float(center.lat)],
+        },
+        'properties': {
+            'name': center.name,
+            'type': Center.Type(center.type).name,
+            'address': center.address,
+            'postal_code': center.postal_code,
+            'city': center.city,
+            'events': [
+                {
+                    'id': event.pk,
+                    'start': event.event_start,
+                    'end': event.event_end,
+                    'is_long': event.is_long,
+                    'signup_start': event.signup_start,
+                    'signup_end': event.signup_end,
+                }
+                for event in center.upcoming_events
+            ],
+        },
+    }
+
+
+class CenterMap:
+    """
+    Map of the active centers, rebuilt by each process when the data changes.
+    """
+
+    GENERATION_KEY = 'centers.map.generation'
+
+    def __init__(self):
+        self.state = None
+
+    @classmethod
+    def generation(cls):
+        """
+        Get the token of the current data along with the date it was issued.
+        """
+        return cache.get_or_set(
+            cls.GENERATION_KEY,
+            lambda: (uuid.uuid4().hex, timezone.now()),
+            None,
+        )
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.GENERATION_KEY, (uuid.uuid4().hex, timezone.now()), None)
+
+    @staticmethod
+    def load(generation):
+        token, issued = generation
+        now = timezone.now()
+        centers = tuple(
+            Center.objects.active().prefetch_related(
+                Prefetch(
+                    'event_set',
+                    queryset=Event.objects.filter(
+                        event_start__gt=now
+                    ).order_by('event_start'),
+                    to_attr='upcoming_events',
+                )
+            )
+        )
+        located = [
+            center for center in centers if center.has_valid_geolocation
+        ]
+        geojson = json.dumps(
+            {
+                'type': 'FeatureCollection',
+                'features': [feature(center) for center in located],
+            },
+            cls=DjangoJSONEncoder,
+            separators=(',', ':'),
+        ).encode()
+
+        # The feed also changes when an event starts, without invalidation
+        last_start = Event.objects.filter(
+            center__is_active=True, event_start__lte=now
+        ).aggregate(last_start=Max('event_start'))['last_start']
+
+        return CenterMapState(
+            generation=token,
+            expires=min(
+                (
+                    event.event_start
+                    for center in centers
+                    for event in center.upcoming_events
+                ),
+                default=None,
+            ),
+            modified=max(issued, last_start or issued),
+            centers=centers,
+            located=located,
+            index=KDTree(
+                unit_vector(center.lat, center.lng) for center in located
+            ),
+            geojson=geojson,
+            etag='"{}"'.format(hashlib.sha1(geojson).hexdigest()),
+        )
+
+    def get(self):
+        token, _ = generation = self.generation()
+        state = self.state
+
+        if (
+            state is None
+            or state.generation != token
+            or (state.expires is not None and state.expires <= timezone.now())
+        ):
+            state = self.state = self.load(generation)
+
+        return state
+
+    def centers(self):
+        """
+        List the active centers, including those which are not geocoded.
+        """
+        return self.get().centers
+
+    def nearest(self, lat, lng, count):
+        """
+        Get the `count` geocoded active centers closest to a point, as
+        NearCenter(center, distance) with the distance in kilometers.
+        """
+        state = self.get()
+
+        if not state.located:
+            return []
+
+        point = unit_vector(lat, lng)
+        return [
+            NearCenter(
+                state.located[index],
+                great_circle_distance(point, state.index.points[index]),
+            )
+            for index in state.index.nearest(point, count)
+        ]
+
+
+center_map = CenterMap()
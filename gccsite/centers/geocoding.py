@@ -0,0 +1,391 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Geocoding of the centers.
+
+The admin actions only enqueue a GeocodingJob per center, the jobs are then
+run in batches by the `geocode_centers` management command. The addresses of a
+batch are looked up concurrently by CENTERS_GEOCODING_CONCURRENCY threads,
+and the requests to the geocoder of all the threads are limited to
+CENTERS_GEOCODING_RATE_LIMIT per second. Each address is only sent once to the
+geocoder: the results are stored in the GeocodedAddress table. Jobs are
+retried on transient errors, but fail at once if the geocoder has no result
+for their address.
+
+NearestCentersView never calls the geocoder, it only finds the postal codes
+stored beforehand by the `geocode_postal_codes` management command.
+
+The geocoder is CENTERS_GEOCODING_BACKEND, instantiated with
+CENTERS_GEOCODING_OPTIONS. OfflineBackend does not use the network, it is
+meant for tests and development.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import geopy.geocoders
+
+from centers.models import (
+    GeocodedAddress,
+    GeocodingJob,
+    GeocodingJobKind,
+    GeocodingJobStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+Location = namedtuple('Location', 'address latitude longitude')
+
+POSTAL_CODE_RE = re.compile(r'^\d{5}$')
+
+
+class GeocodingError(Exception):
+    """
+    This exception is raised if the geocoder has no result for an address.
+    Asking again won't help, so the job is not retried.
+    """
+
+
+class GeopyBackend:
+    """
+    Geocoder of a geopy service, extra options are given to the geopy
+    geocoder, e.g. the API key.
+    """
+
+    def __init__(self, service='google', language='fr', timeout=10, **options):
+        self.geocoder = geopy.geocoders.get_geocoder_for_service(service)(
+            **options
+        )
+        self.language = language
+        self.timeout = timeout
+
+    def geocode(self, query):
+        location = self.geocoder.geocode(
+            query, language=self.language, timeout=self.timeout
+        )
+
+        if location is None:
+            return None
+
+        return Location(
+            location.address, location.latitude, location.longitude
+        )
+
+
+class OfflineBackend:
+    """
+    Local stand-in of a geocoder: the address is the cleaned up query and the
+    coordinates, derived from a hash of the query, lie in metropolitan France.
+    Queries containing `unknown` have no result.
+    """
+
+    def __init__(self, **options):
+        pass
+
+    def geocode(self, query):
+        if 'unknown' in query.lower():
+            return None
+
+        digest = hashlib.sha1(query.encode()).digest()
+        return Location(
+            ', '.join(' '.join(part.split()) for part in query.split(',')),
+            round(42.3 + 8.8 * digest[0] / 255, 6),
+            round(-4.8 + 13 * digest[1] / 255, 6),
+        )
+
+
+def get_geocoder():
+    return import_string(settings.CENTERS_GEOCODING_BACKEND)(
+        **settings.CENTERS_GEOCODING_OPTIONS
+    )
+
+
+class RateLimiter:
+    """
+    Space the calls of all the threads of the process by at least 1 / `rate`
+    seconds.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+rate_limiter = RateLimiter(settings.CENTERS_GEOCODING_RATE_LIMIT)
+
+
+def cache_key(query):
+    """
+    Queries differing only by their case and spacing share their result.
+    """
+    return ', '.join(
+        ' '.join(part.split()) for part in query.lower().split(',')
+    )
+
+
+def lookup(geocoder, query):
+    """
+    Send a query to the geocoder, bypassing the cache.
+    """
+    rate_limiter.wait()
+    location = geocoder.geocode(query)
+
+    if location is None:
+        raise GeocodingError("no result for {!r}".format(query))
+
+    return location
+
+
+def store(locations):
+    """
+    Save the results of the geocoder, given by cache key.
+    """
+    GeocodedAddress.objects.bulk_create(
+        [
+            GeocodedAddress(
+                query=key,
+                address=location.address,
+                lat=location.latitude,
+                lng=location.longitude,
+            )
+            for key, location in locations.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def postal_code_query(postal_code):
+    return postal_code + settings.CENTERS_GEOCODING_SUFFIX
+
+
+def cached_location(query):
+    """
+    Get the location of an address from the cache only, None if it was never
+    geocoded.
+    """
+    return GeocodedAddress.objects.filter(query=cache_key(query)).first()
+
+
+def locate(query, geocoder=None):
+    """
+    Get the location of an address from the cache, or else from the geocoder.
+    """
+    location = cached_location(query)
+
+    if location is None:
+        location = lookup(geocoder or get_geocoder(), query)
+        store({cache_key(query): location})
+
+    return location
+
+
+def geocode_queries(queries, concurrency=None):
+    """
+    Get the locations of queries, given by cache key, from the cache or else
+    from the geocoder. The addresses missing from the cache are sent by
+    `concurrency` threads. Returns the locations and the errors, by cache key.
+    """
+    locations = {
+        location.query: location
+        for location in GeocodedAddress.objects.filter(query__in=queries)
+    }
+    missing = {
+        key: query for key, query in queries.items() if key not in locations
+    }
+    errors = {}
+
+    if missing:
+        geocoder = get_geocoder()
+
+        # Threads don't touch the database, results are saved from here
+        with ThreadPoolExecutor(
+            concurrency or settings.CENTERS_GEOCODING_CONCURRENCY
+        ) as executor:
+            futures = {
+                key: executor.submit(lookup, geocoder, query)
+                for key, query in missing.items()
+            }
+
+        found = {}
+
+        for key, future in futures.items():
+            try:
+                found[key] = future.result()
+            except Exception as exp:
+                errors[key] = exp
+
+        store(found)
+        locations.update(found)
+
+    return locations, errors
+
+
+def geocode_postal_codes(postal_codes, concurrency=None):
+    """
+    Store the locations of postal codes for NearestCentersView, the postal
+    codes already in the cache are not sent again. Returns the number of
+    located postal codes and the errors, by postal code.
+    """
+    postal_codes = {
+        cache_key(postal_code_query(code)): code for code in postal_codes
+    }
+    locations, errors = geocode_queries(
+        {key: postal_code_query(code) for key, code in postal_codes.items()},
+        concurrency,
+    )
+    return (
+        len(locations),
+        {postal_codes[key]: error for key, error in errors.items()},
+    )
+
+
+def enqueue_geocoding(centers, kind):
+    """
+    Queue a job of the given kind for each center that doesn't already have
+    one waiting. Returns the number of queued jobs.
+    """
+    pending = GeocodingJob.objects.filter(
+        kind=kind.value, status=GeocodingJobStatus.pending.value
+    ).values('center')
+    jobs = GeocodingJob.objects.bulk_create(
+        [
+            GeocodingJob(center_id=center, kind=kind.value)
+            for center in centers.exclude(pk__in=pending).values_list(
+                'pk', flat=True
+            )
+        ]
+    )
+    return len(jobs)
+
+
+def geocoding_progress():
+    """
+    Count the jobs by status, in a single query.
+    """
+    return GeocodingJob.objects.aggregate(
+        **{
+            status.name: Count('pk', filter=Q(status=status.value))
+            for status in GeocodingJobStatus
+        }
+    )
+
+
+def claim_jobs(limit):
+    """
+    Lock a batch of due jobs for this worker by postponing their next attempt,
+    so that concurrent workers skip them.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.CENTERS_GEOCODING_RETRY_DELAY)
+
+    with transaction.atomic():
+        jobs = list(
+            GeocodingJob.objects.filter(
+                status=GeocodingJobStatus.pending.value, next_attempt__lte=now
+            )
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('center')
+            .order_by('pk')[:limit]
+        )
+        GeocodingJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            next_attempt=lease
+        )
+
+    return jobs
+
+
+def job_query(job):
+    if job.kind == GeocodingJobKind.geocode.value:
+        return job.center.geocoding_query()
+
+    return job.center.normalization_query()
+
+
+def run_job(job, location):
+    center = job.center
+
+    with transaction.atomic():
+        if job.kind == GeocodingJobKind.geocode.value:
+            center.set_location(location)
+            center.save(update_fields=['lat', 'lng'])
+        else:
+            center.set_normalized_address(location)
+            center.save(update_fields=['address', 'postal_code', 'city'])
+
+        job.status = GeocodingJobStatus.done.value
+        job.attempts += 1
+        job.done = timezone.now()
+        job.last_error = ''
+        job.save()
+
+
+def job_failed(job, error):
+    logger.warning("Failed to run %s: %s", job, error)
+    job.attempts += 1
+    job.last_error = str(error)
+
+    if (
+        isinstance(error, GeocodingError)
+        or job.attempts >= settings.CENTERS_GEOCODING_MAX_ATTEMPTS
+    ):
+        job.status = GeocodingJobStatus.failed.value
+    else:
+        delay = settings.CENTERS_GEOCODING_RETRY_DELAY * pow(2, job.attempts)
+        job.next_attempt = timezone.now() + timedelta(seconds=delay)
+
+    job.save()
+
+
+def run_geocoding_jobs(limit=50, concurrency=None):
+    """
+    Run a batch of due jobs, see geocode_queries. Returns the number of done
+    and failed jobs.
+    """
+    jobs = claim_jobs(limit)
+
+    if not jobs:
+        return 0, 0
+
+    locations, errors = geocode_queries(
+        {cache_key(job_query(job)): job_query(job) for job in jobs},
+        concurrency,
+    )
+    done = failed = 0
+
+    for job in jobs:
+        key = cache_key(job_query(job))
+
+        try:
+            if key in errors:
+                raise errors[key]
+
+            run_job(job, locations[key])
+        except Exception as exp:
+            job_failed(job, exp)
+            failed += 1
+        else:
+            done += 1
+
+    return done, failed
@@ -0,0 +1,56 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from centers.geocoding import run_geocoding_jobs
+
+
+class Command(BaseCommand):
+    help = "Geocode and normalize the queued centers."
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="number of jobs claimed at once",
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.CENTERS_GEOCODING_CONCURRENCY,
+            help="number of concurrent requests to the geocoder",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help="seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="exit as soon as there is no job left to run",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = run_geocoding_jobs(
+                options['batch_size'], options['concurrency']
+            )
+
+            if done or failed:
+                self.stdout.write(
+                    "{} centers updated, {} failed".format(done, failed)
+                )
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
@@ -0,0 +1,75 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from centers.geocoding import POSTAL_CODE_RE, geocode_postal_codes
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the location of postal codes, so that the closest centers to "
+        "them can be found without calling the geocoder."
+    )
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument('postal_codes', nargs='*', metavar='postal_code')
+        parser.add_argument(
+            '--file',
+            help="file of postal codes to geocode too, one per line",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="number of postal codes geocoded at once",
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.CENTERS_GEOCODING_CONCURRENCY,
+            help="number of concurrent requests to the geocoder",
+        )
+
+    def handle(self, *args, **options):
+        postal_codes = list(options['postal_codes'])
+
+        if options['file']:
+            with open(options['file']) as f:
+                postal_codes.extend(line.strip() for line in f)
+
+        postal_codes = [code for code in postal_codes if code]
+
+        if not postal_codes:
+            raise CommandError("No postal code given.")
+
+        invalid = [
+            code for code in postal_codes if not POSTAL_CODE_RE.match(code)
+        ]
+
+        if invalid:
+            raise CommandError(
+                "Invalid postal codes: {}".format(', '.join(invalid))
+            )
+
+        located = failed = 0
+        batch_size = options['batch_size']
+
+        for start in range(0, len(postal_codes), batch_size):
+            count, errors = geocode_postal_codes(
+                postal_codes[start : start + batch_size],
+                options['concurrency'],
+            )
+            located += count
+            failed += len(errors)
+
+            for code, error in errors.items():
+                self.stderr.write("{}: {}".format(code, error))
+
+        self.stdout.write(
+            "{} postal codes located, {} failed".format(located, failed)
+        )
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.3 on 2019-08-26 18:40
+
+import centers.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import prologin.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedAddress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.TextField(unique=True)),
+                ('address', models.TextField()),
+                ('lat', models.DecimalField(decimal_places=6, max_digits=16)),
+                ('lng', models.DecimalField(decimal_places=6, max_digits=16)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GeocodingJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', prologin.models.EnumField(centers.models.GeocodingJobKind, choices=[(0, 'Geocode'), (1, 'Normalize')])),
+                ('status', prologin.models.EnumField(centers.models.GeocodingJobStatus, choices=[(0, 'Pending'), (1, 'Done'), (2, 'Failed')], db_index=True, default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('done', models.DateTimeField(blank=True, null=True)),
+                ('center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geocoding_jobs', to='centers.Center')),
+            ],
+        ),
+    ]
@@ -1,9 +1,10 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import ugettext_noop
-import geopy.geocoders
 
 from prologin.models import AddressableModel, ContactModel, EnumField
 from prologin.utils import ChoiceEnum
@@ -50,37 +51,32 @@ class Center(AddressableModel):
     def has_valid_geolocation(self):
         return self.lat != 0 and self.lng != 0
 
-    def geocode(self, suffix=', FRANCE', geocoder=None):
-        if geocoder is None:
-            geocoder = geopy.geocoders.get_geocoder_for_service('google')
-        location = geocoder().geocode(
-            "{name}, {addr}, {code} {city} {suffix}".format(
-                name=self.name,
-                addr=self.address,
-                code=self.postal_code,
-                city=self.city,
-                suffix=suffix,
-            ),
-            language='fr',
-            timeout=10,
+    def geocoding_query(self, suffix=None):
+        if suffix is None:
+            suffix = settings.CENTERS_GEOCODING_SUFFIX
+        return "{name}, {addr}, {code} {city}{suffix}".format(
+            name=self.name,
+            addr=self.address,
+            code=self.postal_code,
+            city=self.city,
+            suffix=suffix,
         )
+
+    def normalization_query(self, suffix=None):
+        if suffix is None:
+            suffix = settings.CENTERS_GEOCODING_SUFFIX
+        return "{addr}, {code} {city}{suffix}".format(
+            addr=self.address,
+            code=self.postal_code,
+            city=self.city,
+            suffix=suffix,
+        )
+
+    def set_location(self, location):
         self.lat = location.latitude
         self.lng = location.longitude
-        self.save()
 
-    def normalize(self, suffix=', FRANCE', geocoder=None):
-        if geocoder is None:
-            geocoder = geopy.geocoders.get_geocoder_for_service('google')
-        location = geocoder().geocode(
-            "{addr}, {code} {city} {suffix}".format(
-                addr=self.address,
-                code=self.postal_code,
-                city=self.city,
-                suffix=suffix,
-            ),
-            language='fr',
-            timeout=10,
-        )
+    def set_normalized_address(self, location):
         addr, city, country = location.address.split(',')
         if country.strip().lower() != 'france':
             raise ValueError("Country is not France")
@@ -88,6 +84,23 @@ class Center(AddressableModel):
         self.address = addr.strip()
         self.postal_code = code.strip()
         self.city = city.strip()
+
+    def geocode(self, suffix=None, geocoder=None):
+        """
+        Geocode the center right away, see centers.geocoding to do it in the
+        background.
+        """
+        from centers.geocoding import locate
+
+        self.set_location(locate(self.geocoding_query(suffix), geocoder))
+        self.save()
+
+    def normalize(self, suffix=None, geocoder=None):
+        from centers.geocoding import locate
+
+        self.set_normalized_address(
+            locate(self.normalization_query(suffix), geocoder)
+        )
         self.save()
 
     def __str__(self):
@@ -109,3 +122,66 @@ class Contact(ContactModel):
 
     def __str__(self):
         return "{} ({})".format(self.get_full_name(), Contact.Type(self.type))
+
+
+class GeocodedAddress(models.Model):
+    """
+    Persistent cache of the geocoder results, keyed on the normalized query.
+    """
+
+    query = models.TextField(unique=True)
+    address = models.TextField()
+    lat = models.DecimalField(max_digits=16, decimal_places=6)
+    lng = models.DecimalField(max_digits=16, decimal_places=6)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def latitude(self):
+        return self.lat
+
+    @property
+    def longitude(self):
+        return self.lng
+
+    def __str__(self):
+        return self.query
+
+
+@ChoiceEnum.labels(str.capitalize)
+class GeocodingJobKind(ChoiceEnum):
+    geocode = 0  # set the coordinates of the center
+    normalize = 1  # rewrite the address of the center
+
+
+@ChoiceEnum.labels(str.capitalize)
+class GeocodingJobStatus(ChoiceEnum):
+    pending = 0  # the job is waiting to be run or retried
+    done = 1  # the center has been updated
+    failed = 2  # the address has no result, or errors outlasted the retries
+
+
+class GeocodingJob(models.Model):
+    """
+    A center waiting to be geocoded or normalized by the `geocode_centers`
+    worker. See centers.geocoding.
+    """
+
+    center = models.ForeignKey(
+        Center, related_name='geocoding_jobs', on_delete=models.CASCADE
+    )
+    kind = EnumField(GeocodingJobKind)
+    status = EnumField(
+        GeocodingJobStatus,
+        db_index=True,
+        default=GeocodingJobStatus.pending.value,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    done = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '{} {}'.format(
+            GeocodingJobKind(self.kind).name.capitalize(), self.center
+        )
@@ -0,0 +1,315 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import io
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from centers import geocoding
+from centers.admin import CenterAdmin
+from centers.center_map import (
+    KDTree,
+    center_map,
+    squared_distance,
+    unit_vector,
+)
+from centers.models import (
+    Center,
+    GeocodedAddress,
+    GeocodingJob,
+    GeocodingJobKind,
+    GeocodingJobStatus,
+)
+from gcc.models import Edition, Event, Form
+
+
+@override_settings(
+    CENTERS_GEOCODING_BACKEND='centers.geocoding.OfflineBackend',
+    CENTERS_GEOCODING_OPTIONS={},
+)
+class GeocodingTest(TestCase):
+    def setUp(self):
+        self.centers = [
+            Center.objects.create(
+                name="Center {}".format(i),
+                type=Center.Type.center.value,
+                address="{}  rue de la  Paix".format(i + 1),
+                postal_code='75002',
+                city='Paris',
+            )
+            for i in range(2)
+        ]
+
+    def enqueue(self, kind=GeocodingJobKind.geocode):
+        return geocoding.enqueue_geocoding(Center.objects.all(), kind)
+
+    def test_enqueue(self):
+        self.assertEqual(self.enqueue(), 2)
+        self.assertEqual(self.enqueue(), 0)
+        self.assertEqual(self.enqueue(GeocodingJobKind.normalize), 2)
+        self.assertEqual(
+            geocoding.geocoding_progress(),
+            {'pending': 4, 'done': 0, 'failed': 0},
+        )
+
+    def test_admin_actions_only_enqueue(self):
+        center_admin = CenterAdmin(Center, admin.site)
+        request = RequestFactory().get('/')
+
+        with mock.patch.object(center_admin, 'message_user') as message:
+            center_admin.geocode_centers(request, Center.objects.all())
+
+        message.assert_called_once_with(
+            request,
+            "2 centers queued, geocoding jobs: 2 pending, 0 done, 0 failed",
+        )
+        self.assertFalse(GeocodedAddress.objects.exists())
+        for center in self.centers:
+            center.refresh_from_db()
+            self.assertFalse(center.has_valid_geolocation)
+
+    def test_geocode(self):
+        self.enqueue()
+        self.assertEqual(geocoding.run_geocoding_jobs(), (2, 0))
+        self.assertEqual(geocoding.run_geocoding_jobs(), (0, 0))
+        self.assertEqual(GeocodedAddress.objects.count(), 2)
+        self.assertEqual(
+            geocoding.geocoding_progress(),
+            {'pending': 0, 'done': 2, 'failed': 0},
+        )
+        for center in self.centers:
+            center.refresh_from_db()
+            self.assertTrue(center.has_valid_geolocation)
+
+    def test_normalize(self):
+        self.enqueue(GeocodingJobKind.normalize)
+        self.assertEqual(geocoding.run_geocoding_jobs(), (2, 0))
+        center = Center.objects.get(pk=self.centers[0].pk)
+        self.assertEqual(center.address, '1 rue de la Paix')
+        self.assertEqual(center.postal_code, '75002')
+        self.assertEqual(center.city, 'Paris')
+
+    def test_cached_addresses(self):
+        self.enqueue()
+        geocoding.run_geocoding_jobs()
+        GeocodingJob.objects.all().delete()
+        Center.objects.update(lat=0, lng=0)
+
+        self.enqueue()
+        with mock.patch.object(geocoding.OfflineBackend, 'geocode') as geocode:
+            with self.assertNumQueries(1):
+                geocoding.locate(self.centers[0].geocoding_query().upper())
+            self.assertEqual(geocoding.run_geocoding_jobs(), (2, 0))
+        geocode.assert_not_called()
+
+    def test_no_result(self):
+        Center.objects.filter(pk=self.centers[0].pk).update(name="Unknown")
+        self.enqueue()
+
+        self.assertEqual(geocoding.run_geocoding_jobs(), (1, 1))
+        job = GeocodingJob.objects.get(center=self.centers[0])
+        self.assertEqual(job.status, GeocodingJobStatus.failed.value)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("no result", job.last_error)
+
+    def test_retry(self):
+        self.enqueue()
+
+        with mock.patch.object(
+            geocoding.OfflineBackend,
+            'geocode',
+            side_effect=OSError("timed out"),
+        ):
+            self.assertEqual(geocoding.run_geocoding_jobs(), (0, 2))
+
+        job = GeocodingJob.objects.get(center=self.centers[0])
+        self.assertEqual(job.status, GeocodingJobStatus.pending.value)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("timed out", job.last_error)
+        self.assertGreater(job.next_attempt, timezone.now())
+
+        # The job is not due yet
+        self.assertEqual(geocoding.run_geocoding_jobs(), (0, 0))
+
+
+class KDTreeTest(TestCase):
+    def test_nearest(self):
+        rng = random.Random(0)
+        points = [
+            unit_vector(rng.uniform(42, 51), rng.uniform(-5, 8))
+            for _ in range(200)
+        ]
+        tree = KDTree(points)
+
+        for _ in range(20):
+            point = unit_vector(rng.uniform(42, 51), rng.uniform(-5, 8))
+            expected = sorted(
+                range(len(points)),
+                key=lambda index: squared_distance(point, points[index]),
+            )[:5]
+            self.assertEqual(tree.nearest(point, 5), expected)
+
+    def test_empty(self):
+        self.assertEqual(KDTree([]).nearest(unit_vector(45, 5), 3), [])
+
+
+@override_settings(
+    CENTERS_GEOCODING_BACKEND='centers.geocoding.OfflineBackend',
+    CENTERS_GEOCODING_OPTIONS={},
+)
+class CenterMapTest(TestCase):
+    def setUp(self):
+        self.centers = {
+            name: Center.objects.create(
+                name=name, type=Center.Type.center.value, lat=lat, lng=lng
+            )
+            for name, lat, lng in (
+                ('Paris', 48.8566, 2.3522),
+                ('Lyon', 45.764, 4.8357),
+                ('Marseille', 43.2965, 5.3698),
+            )
+        }
+        Center.objects.create(
+            name='Lille',
+            type=Center.Type.center.value,
+            lat=50.6292,
+            lng=3.0573,
+            is_active=False,
+        )
+        Center.objects.create(name='Nowhere', type=Center.Type.center.value)
+
+        now = timezone.now()
+        edition = Edition.objects.create(
+            year=now.year, signup_form=Form.objects.create(name="signup")
+        )
+        self.events = [
+            Event.objects.create(
+                center=self.centers['Lyon'],
+                edition=edition,
+                event_start=now + timedelta(days=days),
+                event_end=now + timedelta(days=days + 5),
+                signup_start=now - timedelta(days=30),
+                signup_end=now + timedelta(days=days - 10),
+            )
+            for days in (-20, 30)
+        ]
+
+    def test_centers(self):
+        self.assertEqual(
+            sorted(center.name for center in center_map.centers()),
+            ['Lyon', 'Marseille', 'Nowhere', 'Paris'],
+        )
+        with self.assertNumQueries(0):
+            center_map.centers()
+
+    def test_geojson(self):
+        response = self.client.get(reverse('centers:geojson'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        features = {
+            feature['properties']['name']: feature
+            for feature in response.json()['features']
+        }
+        self.assertEqual(set(features), {'Paris', 'Lyon', 'Marseille'})
+        self.assertEqual(
+            features['Lyon']['geometry']['coordinates'], [4.8357, 45.764]
+        )
+        self.assertEqual(
+            [
+                event['id']
+                for event in features['Lyon']['properties']['events']
+            ],
+            [self.events[1].pk],
+        )
+
+        response = self.client.get(
+            reverse('centers:geojson'),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_geojson_invalidation(self):
+        etag = self.client.get(reverse('centers:geojson'))['ETag']
+        center = self.centers['Paris']
+        center.name = 'Paris 13'
+        center.save()
+
+        response = self.client.get(
+            reverse('centers:geojson'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Paris 13', response.content)
+
+    def nearest(self, **params):
+        return self.client.get(reverse('centers:nearest'), params)
+
+    def test_nearest_coordinates(self):
+        response = self.nearest(lat=45.7, lng=4.8, count=2)
+        self.assertEqual(response.status_code, 200)
+        centers = response.json()['centers']
+        self.assertEqual(
+            [center['name'] for center in centers], ['Lyon', 'Marseille']
+        )
+        self.assertLess(centers[0]['distance'], 10)
+
+    def test_nearest_postal_code(self):
+        GeocodedAddress.objects.create(
+            query='13001, france',
+            address='13001 Marseille, France',
+            lat=43.2999,
+            lng=5.3841,
+        )
+        response = self.nearest(postal_code='13001')
+        self.assertEqual(
+            [center['name'] for center in response.json()['centers']],
+            ['Marseille', 'Lyon', 'Paris'],
+        )
+
+    def test_geocode_postal_codes(self):
+        marseille = geocoding.Location('13001 Marseille, France', 43.3, 5.38)
+
+        with mock.patch.object(
+            geocoding.OfflineBackend, 'geocode', return_value=marseille
+        ) as geocode:
+            for _ in range(2):
+                stdout = io.StringIO()
+                call_command('geocode_postal_codes', '13001', stdout=stdout)
+                self.assertIn("1 postal codes located", stdout.getvalue())
+
+        # The second run finds the postal code in the cache
+        geocode.assert_called_once_with('13001, FRANCE')
+        response = self.nearest(postal_code='13001')
+        self.assertEqual(
+            [center['name'] for center in response.json()['centers']],
+            ['Marseille', 'Lyon', 'Paris'],
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('geocode_postal_codes', '1300')
+
+    def test_nearest_unknown_postal_code(self):
+        with mock.patch.object(geocoding.OfflineBackend, 'geocode') as geocode:
+            response = self.nearest(postal_code='13001')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['reason'], 'unknown postal code')
+        geocode.assert_not_called()
+
+    def test_nearest_errors(self):
+        for params in (
+            {'postal_code': '1300'},
+            {'lat': 'north', 'lng': 5},
+            {'lat': 95, 'lng': 5},
+            {},
+        ):
+            with self.subTest(params):
+                response = self.nearest(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
@@ -7,4 +7,14 @@ import centers.views
 
 app_name = 'centers'
 
-urlpatterns = [path('', centers.views.CenterListView.as_view(), name='map')]
+urlpatterns = [
+    path('', centers.views.CenterListView.as_view(), name='map'),
+    path(
+        'map.geojson',
+        centers.views.CenterGeoJSONView.as_view(),
+        name='geojson',
+    ),
+    path(
+        'nearest/', centers.views.NearestCentersView.as_view(), name='nearest'
+    ),
+]
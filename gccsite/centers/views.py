@@ -0,0 +1,116 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.translation import ugettext_lazy as _
+from django.views.decorators.http import condition
+from django.views.generic import TemplateView, View
+
+from centers.center_map import center_map
+from centers.geocoding import (
+    POSTAL_CODE_RE,
+    cached_location,
+    postal_code_query,
+)
+
+
+class CenterListView(TemplateView):
+    template_name = 'centers/map.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['centers'] = center_map.centers()
+        return context
+
+
+def geojson_etag(request, *args, **kwargs):
+    return center_map.get().etag
+
+
+def geojson_last_modified(request, *args, **kwargs):
+    return center_map.get().modified
+
+
+@method_decorator(
+    condition(
+        etag_func=geojson_etag, last_modified_func=geojson_last_modified
+    ),
+    name='get',
+)
+class CenterGeoJSONView(View):
+    """
+    GeoJSON feed of the active centers and their upcoming events, clients
+    revalidate it with the ETag or Last-Modified headers.
+    """
+
+    def get(self, request, *args, **kwargs):
+        response = HttpResponse(
+            center_map.get().geojson, content_type='application/geo+json'
+        )
+        response['Cache-Control'] = 'public, no-cache'
+        return response
+
+
+class NearestCentersView(View):
+    """
+    The active centers closest to a postal code or to coordinates, given by
+    the `postal_code` or `lat` and `lng` parameters. Postal codes are only
+    looked up in the GeocodedAddress table, filled by the
+    `geocode_postal_codes` management command: the geocoder is never called
+    while serving the request.
+    """
+
+    max_count = 10
+
+    def location(self, request):
+        if 'postal_code' in request.GET:
+            postal_code = request.GET['postal_code'].strip()
+
+            if not POSTAL_CODE_RE.match(postal_code):
+                raise ValueError(_('invalid postal code'))
+
+            location = cached_location(postal_code_query(postal_code))
+
+            if location is None:
+                raise ValueError(_('unknown postal code'))
+
+            return float(location.latitude), float(location.longitude)
+
+        try:
+            lat, lng = float(request.GET['lat']), float(request.GET['lng'])
+        except (KeyError, ValueError):
+            raise ValueError(_('invalid coordinates'))
+
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(_('invalid coordinates'))
+
+        return lat, lng
+
+    def get(self, request, *args, **kwargs):
+        try:
+            lat, lng = self.location(request)
+            count = min(int(request.GET.get('count', 3)), self.max_count)
+        except ValueError as exp:
+            return JsonResponse(
+                {'status': 'error', 'reason': str(exp)}, status=400
+            )
+
+        return JsonResponse(
+            {
+                'status': 'ok',
+                'centers': [
+                    {
+                        'id': near.center.pk,
+                        'name': near.center.name,
+                        'address': near.center.address,
+                        'postal_code': near.center.postal_code,
+                        'city': near.center.city,
+                        'lat': float(near.center.lat),
+                        'lng': float(near.center.lng),
+                        'distance': round(near.distance, 1),
+                    }
+                    for near in center_map.nearest(lat, lng, count)
+                ],
+            }
+        )
@@ -6,3 +6,7 @@ from django.apps import AppConfig
 
 class GccConfig(AppConfig):
     name = 'gcc'
+
+    def ready(self):
+        # Register signal handlers
+        import gcc.signals  # noqa
@@ -1,33 +1,132 @@
 import csv
 
-from django.http import HttpResponse
+from django.contrib.postgres.aggregates import StringAgg
+from django.http import StreamingHttpResponse
 
+from gcc.models import Answer, Applicant, Edition, QuestionForForm
 
-def export_queryset_as_csv(queryset, filename):
-    fieldnames = []
 
-    all_keys = set()
+class Echo:
+    """
+    Pseudo-buffer for csv writers which returns the written line instead of
+    storing it, so that it can be streamed.
+    """
 
-    datas = []
+    def write(self, value):
+        return value
 
-    # check all the cols names and perform SQL queries
-    for obj in queryset:
-        data = obj.get_export_data()
-        datas.append(data)
-        for key in data:
-            if key not in all_keys:
-                fieldnames.append(key)
-                all_keys.add(key)
 
-    # create the response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = (
-        'attachment; filename=' + filename + '.csv'
+def export_columns(applicants):
+    """
+    Get the header of the export and the questions to export, in the order
+    of the signup forms of the editions the applicants apply to.
+    """
+    header = [
+        "Username",
+        "First name",
+        "Last name",
+        "Email",
+        "Edition",
+        "Labels",
+    ]
+    questions = []
+    form_questions = {}
+
+    # Joining the applicants would repeat each question once per applicant
+    forms = Edition.objects.filter(
+        year__in=applicants.values('edition')
+    ).values('signup_form')
+    joined_questions = (
+        QuestionForForm.objects.filter(form__in=forms)
+        .select_related('question')
+        .order_by('form', 'order')
+    )
+
+    for joined in joined_questions:
+        if joined.question not in questions:
+            questions.append(joined.question)
+            header.append(str(joined.question))
+
+        form_questions.setdefault(joined.form_id, set()).add(
+            joined.question_id
+        )
+
+    return header, questions, form_questions
+
+
+def export_rows(applicants):
+    """
+    Generate the rows of the CSV export of a queryset of applicants, starting
+    with the header.
+
+    Applicants and their answers are read through two server-side cursors
+    sorted by applicant, and answers are pivoted into columns on the fly, so
+    that the memory usage doesn't grow with the size of the export.
+    """
+    applicants = Applicant.objects.filter(pk__in=applicants.values('pk'))
+    header, questions, form_questions = export_columns(applicants)
+    questions_by_pk = {question.pk: question for question in questions}
+    yield header
+
+    rows = (
+        applicants.select_related('user', 'edition')
+        .annotate(
+            labels_display=StringAgg('labels__display', ', ', distinct=True)
+        )
+        .order_by('pk')
+        .iterator()
     )
-    writer = csv.DictWriter(response, fieldnames=fieldnames)
-    writer.writeheader()
+    answers = (
+        Answer.objects.filter(
+            applicant__in=applicants, question__in=list(questions_by_pk)
+        )
+        .only('applicant_id', 'question_id', 'response')
+        .order_by('applicant_id')
+        .iterator()
+    )
+    answer = next(answers, None)
+
+    for applicant in rows:
+        applicant_answers = {}
+
+        while answer is not None and answer.applicant_id <= applicant.pk:
+            if answer.applicant_id == applicant.pk:
+                answer.question = questions_by_pk[answer.question_id]
+                applicant_answers[answer.question_id] = answer
+
+            answer = next(answers, None)
+
+        row = [
+            applicant.user.username,
+            applicant.user.first_name,
+            applicant.user.last_name,
+            applicant.user.email,
+            str(applicant.edition),
+            applicant.labels_display or '',
+        ]
+        asked = form_questions.get(applicant.edition.signup_form_id, ())
+
+        for question in questions:
+            if question.pk in applicant_answers:
+                row.append(str(applicant_answers[question.pk]))
+            elif question.pk in asked:
+                row.append("(empty)")
+            else:
+                row.append('')
 
-    for data in datas:
-        row = writer.writerow(data)
+        yield row
 
+
+def export_queryset_as_csv(applicants, filename):
+    """
+    Stream a queryset of applicants as a CSV file.
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in export_rows(applicants)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename=' + filename + '.csv'
+    )
     return response
@@ -0,0 +1,294 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Factories of realistic editions: a signup form, events in several centers,
+correctors and thousands of applicants with their wishes, answers and labels.
+
+Objects are inserted with bulk_create, which sends no signal, so the
+denormalized data (status of the applicants, participations of the users)
+and the caches are refreshed explicitly once everything is created.
+"""
+
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from centers.center_map import CenterMap
+from centers.models import Center
+from gcc.forms import invalidate_compiled_forms
+from gcc.models import (
+    Answer,
+    AnswerTypes,
+    Applicant,
+    ApplicantLabel,
+    ApplicantStatusTypes,
+    Corrector,
+    Edition,
+    Event,
+    EventWish,
+    Form,
+    Question,
+    QuestionForForm,
+    SignupWindow,
+    highest_status,
+)
+from gcc.page_cache import purge_page_cache
+from gcc.rules import invalidate_corrected_events
+from prologin.models import Gender
+
+BATCH_SIZE = 1000
+
+# The applicants and their users are given by pk
+SeededEdition = namedtuple(
+    'SeededEdition',
+    'edition form questions events correctors labels applicants users',
+)
+
+# Status of the wishes, weighted by how often they appear in a past edition
+WISH_STATUSES = (
+    [ApplicantStatusTypes.incomplete.value] * 3
+    + [ApplicantStatusTypes.pending.value] * 4
+    + [ApplicantStatusTypes.rejected.value] * 2
+    + [ApplicantStatusTypes.selected.value]
+    + [ApplicantStatusTypes.accepted.value]
+    + [ApplicantStatusTypes.confirmed.value]
+)
+
+MULTICHOICE_META = {'choices': {'0': "Yes", '1': "No", '2': "Maybe"}}
+
+
+def next_user_id():
+    last = get_user_model().objects.order_by('-pk').first()
+    return last.pk + 1 if last is not None else 1
+
+
+def build_users(first_id, count, prefix, rng):
+    """
+    Build (unsaved) users, those whose gender is left blank have an
+    incomplete profile.
+    """
+    password = make_password(None)
+    return [
+        get_user_model()(
+            id=pk,
+            username='{}{}'.format(prefix, pk),
+            email='{}{}@example.org'.format(prefix, pk),
+            password=password,
+            first_name='First{}'.format(pk),
+            last_name='Last{}'.format(pk),
+            gender=rng.choice([Gender.female.value, None]),
+            birthday=date(2000, 1, 1) + timedelta(days=rng.randrange(2000)),
+            phone='0600000000',
+            address='{} rue de la Paix'.format(pk),
+            postal_code='75000',
+            city='Paris',
+            country='France',
+        )
+        for pk in range(first_id, first_id + count)
+    ]
+
+
+def build_response(question, rng):
+    response_type = question.response_type
+
+    if response_type == AnswerTypes.boolean.value:
+        return rng.random() < 0.8
+    elif response_type == AnswerTypes.integer.value:
+        return rng.randrange(10, 20)
+    elif response_type == AnswerTypes.date.value:
+        return (
+            date(2000, 1, 1) + timedelta(days=rng.randrange(2000))
+        ).isoformat()
+    elif response_type == AnswerTypes.multichoice.value:
+        return rng.choice(list(question.meta['choices']))
+
+    # Some applicants left the question empty
+    return '' if rng.random() < 0.1 else "Answer {}".format(rng.random())
+
+
+def seed_centers(count, prefix="Center"):
+    return Center.objects.bulk_create(
+        Center(
+            name="{} {}".format(prefix, i),
+            type=Center.Type.center.value,
+            city="City {}".format(i),
+            # Spread over metropolitan France
+            lat=round(43 + (i * 0.61) % 7, 6),
+            lng=round(-1 + (i * 1.37) % 8, 6),
+        )
+        for i in range(count)
+    )
+
+
+def seed_labels(count):
+    return ApplicantLabel.objects.bulk_create(
+        ApplicantLabel(display="label {}".format(i)) for i in range(count)
+    )
+
+
+def seed_edition(
+    year=None,
+    applicants=1000,
+    centers=None,
+    questions=12,
+    labels=None,
+    returning_users=(),
+    seed=0,
+):
+    """
+    Create an edition along with its applicants, the events of the current
+    year are open for signup. The applicants are new users, except for the
+    pk of the `returning_users` who apply again. Events take place in
+    `centers`, and applicants are labelled with `labels`, both are created if
+    not given.
+
+    Applicants are created by chunks of BATCH_SIZE, so that large editions
+    fit in memory. The content only depends on the parameters and on the
+    users already in the database, so that query counts are reproducible.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    year = year or now.year
+    response_types = list(AnswerTypes)
+
+    form = Form.objects.create(name="Signup form {}".format(year))
+    question_list = Question.objects.bulk_create(
+        Question(
+            question="Question {}".format(i),
+            response_type=response_types[i % len(response_types)].value,
+            finaly_required=i % 4 != 0,
+            meta=(
+                MULTICHOICE_META
+                if response_types[i % len(response_types)]
+                == AnswerTypes.multichoice
+                else {}
+            ),
+        )
+        for i in range(questions)
+    )
+    QuestionForForm.objects.bulk_create(
+        QuestionForForm(question=question, form=form, order=i + 1)
+        for i, question in enumerate(question_list)
+    )
+
+    # Past editions took place during their summer
+    if year == now.year:
+        signup_end = now + timedelta(days=20)
+    else:
+        signup_end = now.replace(year=year, month=6, day=1)
+
+    edition = Edition.objects.create(year=year, signup_form=form)
+    centers = centers or seed_centers(8, "Center {}".format(year))
+    labels = labels or seed_labels(4)
+    events = Event.objects.bulk_create(
+        Event(
+            center=center,
+            edition=edition,
+            is_long=i % 2 == 0,
+            event_start=signup_end + timedelta(days=10 + 7 * i),
+            event_end=signup_end + timedelta(days=15 + 7 * i),
+            signup_start=signup_end - timedelta(days=30),
+            signup_end=signup_end,
+            signup_form=form,
+        )
+        for i, center in enumerate(centers)
+    )
+
+    # One corrector per event
+    first_id = next_user_id()
+    correctors = get_user_model().objects.bulk_create(
+        build_users(first_id, len(events), 'corrector', rng)
+    )
+    Corrector.objects.bulk_create(
+        Corrector(event=event, user=user)
+        for event, user in zip(events, correctors)
+    )
+
+    returning_users = list(returning_users)[:applicants]
+    next_id = first_id + len(events)
+    applicant_pks = []
+    user_pks = []
+
+    for offset in range(0, applicants, BATCH_SIZE):
+        count = min(BATCH_SIZE, applicants - offset)
+        users = returning_users[offset : offset + count]
+        created = count - len(users)
+
+        if created:
+            get_user_model().objects.bulk_create(
+                build_users(next_id, created, 'applicant', rng)
+            )
+            users += range(next_id, next_id + created)
+            next_id += created
+
+        # Pick the wishes first, so that the status of the applicants is
+        # known when they are created
+        chunk_wishes = [
+            [
+                (event, rng.choice(WISH_STATUSES))
+                for event in rng.sample(
+                    events, min(len(events), rng.randint(1, 3))
+                )
+            ]
+            for _ in users
+        ]
+        chunk = Applicant.objects.bulk_create(
+            Applicant(
+                user_id=user,
+                edition=edition,
+                status=highest_status(
+                    set(status for _, status in user_wishes)
+                ),
+            )
+            for user, user_wishes in zip(users, chunk_wishes)
+        )
+        EventWish.objects.bulk_create(
+            EventWish(
+                applicant=applicant, event=event, status=status, order=order
+            )
+            for applicant, user_wishes in zip(chunk, chunk_wishes)
+            for order, (event, status) in enumerate(user_wishes, 1)
+        )
+        Answer.objects.bulk_create(
+            Answer(
+                applicant=applicant,
+                question=question,
+                response=build_response(question, rng),
+            )
+            for applicant in chunk
+            for question in question_list
+        )
+        Applicant.labels.through.objects.bulk_create(
+            Applicant.labels.through(applicant=applicant, applicantlabel=label)
+            for applicant in chunk
+            for label in rng.sample(labels, rng.randint(0, len(labels)))
+        )
+
+        applicant_pks += [applicant.pk for applicant in chunk]
+        user_pks += users
+
+    # Refresh what the signals would have kept in sync
+    get_user_model().objects.filter(
+        applicant__edition=edition
+    ).update_participations_count()
+    invalidate_compiled_forms()
+    invalidate_corrected_events()
+    SignupWindow.invalidate()
+    CenterMap.invalidate()
+    purge_page_cache()
+
+    return SeededEdition(
+        edition=edition,
+        form=form,
+        questions=question_list,
+        events=events,
+        correctors=correctors,
+        labels=labels,
+        applicants=applicant_pks,
+        users=user_pks,
+    )
@@ -1,10 +1,15 @@
 # Copyright (C) <2018> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+import uuid
 from collections import OrderedDict
-from datetime import date
+from functools import partial
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
 from django.db.models import Q
 from django.utils import formats
 from django.utils.safestring import mark_safe
@@ -19,6 +24,7 @@ from gcc.models import (
     Event,
     EventWish,
     QuestionForForm,
+    signup_window,
 )
 
 from prologin import utils
@@ -32,94 +38,167 @@ class EmailForm(forms.Form):
     email = forms.EmailField(label=_('Email address'), max_length=254)
 
 
-def build_dynamic_form(form, user, edition):
-    """Build a form with fields described in models.Question"""
+# Cache key of a token which changes each time a question or the ordering of
+# a form changes, this invalidates the classes cached by compile_form(). The
+# token is stored in GCC_FORMS_CACHE_ALIAS, which is shared by the workers.
+FORMS_GENERATION_KEY = 'gcc.forms.generation'
 
-    class DynamicForm(forms.Form):
-        @staticmethod
-        def question_field_name(question_id):
-            return 'field_{}'.format(question_id)
+_compiled_forms = {}
 
-        def __init__(self, *args, **kwargs):
-            kwargs.pop('instance')
-            super(DynamicForm, self).__init__(*args, **kwargs)
 
-            self.edition = edition
-            self.form = form
+def forms_cache():
+    return caches[settings.GCC_FORMS_CACHE_ALIAS]
 
-            # Add fields to the form, query directly on the jointure in order
-            # to take the ordering into account
-            self.questions = [
-                joined.question
-                for joined in QuestionForForm.objects.filter(form=form)
-            ]
 
-            for question in self.questions:
-                # set basic fields parameters
-                basic_args = {
-                    'label': str(question),
-                    'required': question.always_required,
-                    'help_text': question.comment,
-                }
-                field_id = self.question_field_name(question.pk)
-
-                # Try to load existing configuration
-                try:
-                    answer = Answer.objects.get(
-                        question=question,
-                        applicant__user=user,
-                        applicant__edition=edition,
-                    )
-                    basic_args['initial'] = answer.response
-                except Answer.DoesNotExist:
-                    pass
-
-                if question.response_type == AnswerTypes.boolean.value:
-                    self.fields[field_id] = forms.BooleanField(**basic_args)
-                elif question.response_type == AnswerTypes.integer.value:
-                    self.fields[field_id] = forms.IntegerField(**basic_args)
-                elif question.response_type == AnswerTypes.date.value:
-                    self.fields[field_id] = forms.DateField(**basic_args)
-                elif question.response_type == AnswerTypes.string.value:
-                    self.fields[field_id] = forms.CharField(**basic_args)
-                elif question.response_type == AnswerTypes.text.value:
-                    self.fields[field_id] = forms.CharField(
-                        widget=forms.Textarea, **basic_args
-                    )
-                elif question.response_type == AnswerTypes.multichoice.value:
-                    self.fields[field_id] = forms.ChoiceField(
-                        choices=[
-                            (str(choice), question.meta['choices'][choice])
-                            for choice in question.meta['choices'].keys()
-                        ],
-                        **basic_args,
-                    )
-
-        def save(self):
-            """
-            Saves all filled fields for the applicant defined by the user and
-            edition specified in __init__.
-            """
-            data = self.cleaned_data
-            applicant = Applicant.for_user_and_edition(user, self.edition)
-
-            for question in self.questions:
-                field_id = self.question_field_name(question.pk)
-
-                if data[field_id] is not None:
-                    # Try to modify existing answer, create a new answer if it
-                    # doesn't exist
-                    try:
-                        answer = Answer.objects.get(
-                            applicant=applicant, question=question
-                        )
-                    except Answer.DoesNotExist:
-                        answer = Answer(applicant=applicant, question=question)
-
-                    answer.response = data[field_id]
-                    answer.save()
-
-    return DynamicForm
+def forms_generation():
+    return forms_cache().get_or_set(
+        FORMS_GENERATION_KEY, lambda: uuid.uuid4().hex, None
+    )
+
+
+def invalidate_compiled_forms():
+    forms_cache().set(FORMS_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def question_field(question):
+    """Build the form field described by a models.Question"""
+    basic_args = {
+        'label': str(question),
+        'required': question.always_required,
+        'help_text': question.comment,
+    }
+
+    if question.response_type == AnswerTypes.boolean.value:
+        return forms.BooleanField(**basic_args)
+    elif question.response_type == AnswerTypes.integer.value:
+        return forms.IntegerField(**basic_args)
+    elif question.response_type == AnswerTypes.date.value:
+        return forms.DateField(**basic_args)
+    elif question.response_type == AnswerTypes.string.value:
+        return forms.CharField(**basic_args)
+    elif question.response_type == AnswerTypes.text.value:
+        return forms.CharField(widget=forms.Textarea, **basic_args)
+    elif question.response_type == AnswerTypes.multichoice.value:
+        return forms.ChoiceField(
+            choices=[
+                (str(choice), question.meta['choices'][choice])
+                for choice in question.meta['choices'].keys()
+            ],
+            **basic_args,
+        )
+
+
+class DynamicForm(forms.Form):
+    """
+    Base class of the forms compiled from a models.Form by compile_form(),
+    filled with the answers of an applicant.
+    """
+
+    questions = ()
+
+    @staticmethod
+    def question_field_name(question_id):
+        return 'field_{}'.format(question_id)
+
+    def __init__(self, *args, user, edition, **kwargs):
+        kwargs.pop('instance', None)
+        super().__init__(*args, **kwargs)
+
+        self.user = user
+        self.edition = edition
+
+        # Load existing answers
+        answers = Answer.objects.filter(
+            applicant__user=user,
+            applicant__edition=edition,
+            question__in=[question.pk for question in self.questions],
+        ).values_list('question_id', 'response')
+
+        for question_id, response in answers:
+            self.initial.setdefault(
+                self.question_field_name(question_id), response
+            )
+
+    def save(self):
+        """
+        Saves all filled fields for the applicant defined by the user and
+        edition specified in __init__.
+
+        The applicant is locked during the update, so that concurrent
+        submissions don't both create the missing answers.
+        """
+        data = self.cleaned_data
+        responses = {}
+
+        for question in self.questions:
+            response = data[self.question_field_name(question.pk)]
+
+            if response is not None:
+                responses[question.pk] = response
+
+        with transaction.atomic():
+            applicant = Applicant.for_user_and_edition(
+                self.user, self.edition, lock=True
+            )
+
+            # Modify existing answers, create the missing ones
+            answers = Answer.objects.filter(
+                applicant=applicant, question__in=list(responses)
+            )
+            changed = []
+
+            for answer in answers:
+                response = responses.pop(answer.question_id)
+
+                if answer.response != response:
+                    answer.response = response
+                    changed.append(answer)
+
+            Answer.objects.bulk_update(changed, ['response'])
+            Answer.objects.bulk_create(
+                Answer(
+                    applicant=applicant, question_id=question, response=value
+                )
+                for question, value in responses.items()
+            )
+
+
+def compile_form(form):
+    """
+    Get the DynamicForm class with fields described by the questions of a
+    models.Form. Compiled classes are cached by each process until a question
+    or the ordering of a form changes. The other processes only see the change
+    if GCC_FORMS_CACHE_ALIAS is a cache they share, eg. not a LocMemCache.
+    """
+    generation = forms_generation()
+    cached_generation, form_class = _compiled_forms.get(form.pk, (None, None))
+
+    if cached_generation != generation:
+        # Query directly on the jointure in order to take the ordering into
+        # account
+        questions = tuple(
+            joined.question
+            for joined in QuestionForForm.objects.filter(
+                form=form
+            ).select_related('question')
+        )
+        attrs = {'questions': questions}
+
+        for question in questions:
+            field = question_field(question)
+
+            if field is not None:
+                attrs[DynamicForm.question_field_name(question.pk)] = field
+
+        form_class = type('DynamicForm', (DynamicForm,), attrs)
+        _compiled_forms[form.pk] = (generation, form_class)
+
+    return form_class
+
+
+def build_dynamic_form(form, user, edition):
+    """Build a form with fields described in models.Question"""
+    return partial(compile_form(form), user=user, edition=edition)
 
 
 class ApplicantUserForm(forms.ModelForm):
@@ -239,20 +318,23 @@ class ApplicationWishesForm(forms.Form):
     def __init__(self, edition, user, *args, **kwargs):
         super(ApplicationWishesForm, self).__init__(*args, **kwargs)
 
-        # Get the list of events the user can apply to
+        # Get the list of events the user can apply to, the events they
+        # already tried for are excluded by the query
         tried_for = EventWish.objects.filter(
             ~Q(status=ApplicantStatusTypes.incomplete.value),
             applicant__user=user,
-            event__edition=edition,
+            applicant__edition=edition,
+        ).values('event')
+        events = (
+            Event.objects.filter(
+                pk__in=[
+                    event.pk for event in signup_window.open_events(edition)
+                ]
+            )
+            .exclude(pk__in=tried_for)
+            .select_related('center')
+            .order_by('event_start')
         )
-        tried_for = set(wish.event for wish in tried_for)
-
-        events = Event.objects.filter(
-            signup_start__lt=date.today(),
-            signup_end__gt=date.today(),
-            edition=edition,
-        ).order_by('event_start')
-        events = [event for event in events if event not in tried_for]
 
         # Get a list of (primary_key, event name) for the selectors
         events_selection = [(None, '')] + [
@@ -268,37 +350,51 @@ class ApplicationWishesForm(forms.Form):
         Save the new applications.
         If an application was already being edited for current year, it will
         be replaced. If an application was rejected or accepted, it will raise
-        an Application.AlreadyLocked exception.
+        an Application.AlreadyLocked exception, and if a selected event was
+        deleted since the form was built, a ValidationError.
+
+        The applicant is locked during the update, so that concurrent
+        submissions are applied one after the other.
         """
         data = self.cleaned_data
-        applicant = Applicant.for_user_and_edition(user, edition)
-
-        # Verify that no application is already accepted or rejected
-        if applicant.status not in [
-            ApplicantStatusTypes.incomplete.value,
-            ApplicantStatusTypes.rejected.value,
-        ]:
-            raise Applicant.AlreadyLocked(
-                'The user has a processing application'
+
+        # Collect selected events, remove duplicates
+        selected = list(
+            OrderedDict.fromkeys(
+                int(data[field])
+                for field in ('priority1', 'priority2', 'priority3')
+                if data[field]
             )
+        )
 
-        # Remove previous choices
-        EventWish.objects.filter(
-            applicant=applicant, status=ApplicantStatusTypes.incomplete.value
-        ).delete()
+        with transaction.atomic():
+            applicant = Applicant.for_user_and_edition(
+                user, edition, lock=True
+            )
 
-        # Collect selected events, remove duplicates
-        events = [Event.objects.get(pk=data['priority1'])]
+            # Verify that no application is already accepted or rejected
+            if applicant.status not in [
+                ApplicantStatusTypes.incomplete.value,
+                ApplicantStatusTypes.rejected.value,
+            ]:
+                raise Applicant.AlreadyLocked(
+                    'The user has a processing application'
+                )
 
-        if data['priority2'] and data['priority2'] != data['priority1']:
-            events.append(Event.objects.get(pk=data['priority2']))
+            events = Event.objects.in_bulk(selected)
 
-        if data['priority3'] and data['priority3'] not in [
-            data['priority1'],
-            data['priority2'],
-        ]:
-            events.append(Event.objects.get(pk=data['priority3']))
+            if len(events) != len(selected):
+                raise forms.ValidationError(
+                    _("One of the selected events no longer exists."),
+                    code='invalid_choice',
+                )
 
-        # Save applications
-        for i, event in enumerate(events):
-            EventWish(applicant=applicant, event=event, order=i + 1).save()
+            # Replace previous choices
+            EventWish.objects.filter(
+                applicant=applicant,
+                status=ApplicantStatusTypes.incomplete.value,
+            ).delete()
+            EventWish.objects.bulk_create(
+                EventWish(applicant=applicant, event=events[pk], order=order)
+                for order, pk in enumerate(selected, 1)
+            )
@@ -0,0 +1,334 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Queue of acceptance mails.
+
+Accepting the candidates of an event only enqueues an AcceptanceMailJob per
+wish, the mails are then sent in batches by the `acceptance_mails` management
+command which reuses a single SMTP connection for a whole batch and retries
+failed deliveries with an exponential backoff. The attachments of each event
+are only read once per process, see AttachmentBundles.
+
+Each wish is locked while its mail is sent, and the mail is cancelled if the
+wish is no longer selected, e.g. if it was rejected after the mail was queued.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.db import transaction
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from gcc.models import (
+    AcceptanceMailJob,
+    Answer,
+    ApplicantStatusTypes,
+    EventWish,
+    MailJobStatusTypes,
+)
+from prologin.email import make_email
+
+logger = logging.getLogger(__name__)
+
+# TODO: CRITICAL: this is hardcoded pk of parent's email
+PARENT_EMAIL_QUESTION = 17
+
+ATTACHMENTS = (
+    'autorisation-participation',
+    'planning',
+    'droits-image',
+    'fiche-sanitaire',
+)
+
+
+class InvalidAttachments(Exception):
+    """
+    This exception is raised if some attachments of an event are missing or
+    are not PDF files.
+    """
+
+    def __init__(self, errors):
+        super().__init__(', '.join(errors))
+        self.errors = errors
+
+
+class AttachmentBundles:
+    """
+    In-process LRU cache of the PDF files attached to the acceptance mails,
+    keyed on the event slug. Bundles are validated once when they are loaded
+    and the cache holds at most `max_size` bytes of attachments.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.bundles = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def event_slug(event):
+        return slugify(
+            str(event.center) + '-' + event.event_start.strftime('%Y-%m-%d')
+        )
+
+    @staticmethod
+    def load(slug):
+        attachments = []
+        errors = []
+
+        for name in ATTACHMENTS:
+            path = 'gcc/attachments/{}-{}.pdf'.format(name, slug)
+
+            try:
+                with open(staticfiles_storage.path(path), 'rb') as attachment:
+                    content = attachment.read()
+            except OSError:
+                errors.append('missing {}'.format(path))
+                continue
+
+            if not content.startswith(b'%PDF-'):
+                errors.append('invalid PDF {}'.format(path))
+                continue
+
+            attachments.append((name + '.pdf', content, 'application/pdf'))
+
+        if errors:
+            raise InvalidAttachments(errors)
+
+        return attachments
+
+    def get(self, event):
+        """
+        Get the attachments of an event, they are read from the disk only if
+        they are not cached yet.
+        """
+        slug = self.event_slug(event)
+
+        with self.lock:
+            if slug in self.bundles:
+                self.bundles.move_to_end(slug)
+                return self.bundles[slug]
+
+        attachments = self.load(slug)
+        size = sum(len(content) for _, content, _ in attachments)
+
+        with self.lock:
+            if slug not in self.bundles and size <= self.max_size:
+                self.bundles[slug] = attachments
+                self.size += size
+
+            # Evict least recently used bundles
+            while self.size > self.max_size:
+                _, evicted = self.bundles.popitem(last=False)
+                self.size -= sum(len(content) for _, content, _ in evicted)
+
+        return attachments
+
+    def check(self, event):
+        """
+        Pre-flight check of the attachments of an event, returns the list of
+        errors which would prevent the acceptance mails to be sent.
+        """
+        try:
+            self.get(event)
+        except InvalidAttachments as exp:
+            return exp.errors
+
+        return []
+
+    def clear(self):
+        with self.lock:
+            self.bundles.clear()
+            self.size = 0
+
+
+attachment_bundles = AttachmentBundles(
+    settings.GCC_ACCEPTANCE_ATTACHMENTS_CACHE_SIZE
+)
+
+
+def enqueue_acceptance_mails(event):
+    """
+    Queue an acceptance mail for each selected wish of the event that doesn't
+    already have one waiting. Returns the number of queued mails.
+    """
+    wishes = EventWish.objects.filter(
+        event=event, status=ApplicantStatusTypes.selected.value
+    ).exclude(acceptance_mails__status=MailJobStatusTypes.pending.value)
+    jobs = AcceptanceMailJob.objects.bulk_create(
+        [AcceptanceMailJob(wish=wish) for wish in wishes]
+    )
+    return len(jobs)
+
+
+def acceptance_progress(event):
+    """
+    Count the acceptance mails of an event by status, in a single query.
+    """
+    return AcceptanceMailJob.objects.filter(wish__event=event).aggregate(
+        **{
+            status.name: Count('pk', filter=Q(status=status.value))
+            for status in MailJobStatusTypes
+        }
+    )
+
+
+def claim_jobs(limit):
+    """
+    Lock a batch of due jobs for this worker by postponing their next attempt,
+    so that concurrent workers skip them.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.GCC_ACCEPTANCE_MAIL_RETRY_DELAY)
+
+    with transaction.atomic():
+        jobs = list(
+            AcceptanceMailJob.objects.filter(
+                status=MailJobStatusTypes.pending.value, next_attempt__lte=now
+            )
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('wish__applicant__user', 'wish__event__center')
+            .order_by('wish__event', 'pk')[:limit]
+        )
+        AcceptanceMailJob.objects.filter(
+            pk__in=[job.pk for job in jobs]
+        ).update(next_attempt=lease)
+
+    return jobs
+
+
+def acceptance_messages(job, parent_email, attachments):
+    wish = job.wish
+    confirm_url = (
+        'https://'
+        + settings.SITE_HOST
+        + reverse('gcc:confirm', kwargs={'wish': wish.pk})
+    )
+
+    return [
+        make_email(
+            'gcc/mails/accept',
+            dest,
+            {
+                'applicant': wish.applicant,
+                'event': wish.event,
+                'confirm_url': confirm_url,
+            },
+            attachments,
+        )
+        for dest in [wish.applicant.user.email, parent_email]
+    ]
+
+
+def lock_selected_wish(job):
+    """
+    Lock the wish of a job until the end of the transaction, returns whether
+    it is still selected.
+    """
+    return (
+        EventWish.objects.select_for_update()
+        .filter(pk=job.wish_id, status=ApplicantStatusTypes.selected.value)
+        .exists()
+    )
+
+
+def job_delivered(job):
+    job.status = MailJobStatusTypes.sent.value
+    job.attempts += 1
+    job.sent = timezone.now()
+    job.last_error = ''
+    job.save()
+
+    # Only the status is written, the wish may have changed since the claim
+    EventWish.objects.filter(
+        pk=job.wish_id, status=ApplicantStatusTypes.selected.value
+    ).update(status=ApplicantStatusTypes.accepted.value)
+
+
+def job_cancelled(job):
+    logger.info("Cancelled %s, the wish is no longer selected", job)
+    job.status = MailJobStatusTypes.cancelled.value
+    job.save()
+
+
+def job_failed(job, error):
+    logger.warning("Failed to send %s: %s", job, error)
+    job.attempts += 1
+    job.last_error = str(error)
+
+    if job.attempts >= settings.GCC_ACCEPTANCE_MAIL_MAX_ATTEMPTS:
+        job.status = MailJobStatusTypes.failed.value
+    else:
+        delay = settings.GCC_ACCEPTANCE_MAIL_RETRY_DELAY * pow(2, job.attempts)
+        job.next_attempt = timezone.now() + timedelta(seconds=delay)
+
+    job.save()
+
+
+def send_acceptance_mails(limit=50):
+    """
+    Send a batch of due acceptance mails through a single SMTP connection.
+    Returns the number of delivered, failed and cancelled jobs, which are all
+    zero only if no job was due.
+    """
+    jobs = claim_jobs(limit)
+
+    if not jobs:
+        return 0, 0, 0
+
+    parent_emails = dict(
+        Answer.objects.filter(
+            applicant__in=[job.wish.applicant_id for job in jobs],
+            question__pk=PARENT_EMAIL_QUESTION,
+        ).values_list('applicant_id', 'response')
+    )
+    delivered = failed = cancelled = 0
+
+    # Bypass djmail which would open a new connection for each message
+    connection = mail.get_connection(
+        backend=settings.DJMAIL_REAL_BACKEND, fail_silently=False
+    )
+    connection.open()
+
+    try:
+        for job in jobs:
+            event = job.wish.event
+
+            try:
+                with transaction.atomic():
+                    if not lock_selected_wish(job):
+                        job_cancelled(job)
+                        cancelled += 1
+                        continue
+
+                    attachments = attachment_bundles.get(event)
+
+                    if job.wish.applicant_id not in parent_emails:
+                        raise ValueError("missing parent's email")
+
+                    connection.send_messages(
+                        acceptance_messages(
+                            job,
+                            parent_emails[job.wish.applicant_id],
+                            attachments,
+                        )
+                    )
+                    job_delivered(job)
+            except Exception as exp:
+                job_failed(job, exp)
+                failed += 1
+            else:
+                delivered += 1
+    finally:
+        connection.close()
+
+    return delivered, failed, cancelled
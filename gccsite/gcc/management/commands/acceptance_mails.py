@@ -0,0 +1,51 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from gcc.mailing import send_acceptance_mails
+
+
+class Command(BaseCommand):
+    help = "Send the queued acceptance mails."
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="number of mails sent through a single connection",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help="seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="exit as soon as there is no mail left to send",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed, cancelled = send_acceptance_mails(
+                options['batch_size']
+            )
+
+            if delivered or failed or cancelled:
+                self.stdout.write(
+                    "{} mails sent, {} failed, {} cancelled".format(
+                        delivered, failed, cancelled
+                    )
+                )
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
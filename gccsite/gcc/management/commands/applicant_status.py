@@ -0,0 +1,61 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gcc.models import Applicant, ApplicantStatusTypes
+
+
+class Command(BaseCommand):
+    help = "Check or rebuild the stored status of applicants."
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument(
+            '--edition', type=int, help="only process the given edition"
+        )
+        sp = parser.add_subparsers(dest="cmd")
+        sp.add_parser(
+            name="check",
+            help="list applicants whose status does not match their wishes",
+        )
+        sp.add_parser(
+            name="backfill",
+            help="recompute the status of applicants from their wishes",
+        )
+
+    def handle(self, *args, **options):
+        applicants = Applicant.objects.all()
+
+        if options['edition'] is not None:
+            applicants = applicants.filter(edition=options['edition'])
+
+        cmd = options['cmd']
+        if cmd == 'check':
+            inconsistent = applicants.inconsistent_status()
+
+            for applicant in Applicant.objects.filter(
+                pk__in=inconsistent
+            ).select_related('user', 'edition'):
+                self.stdout.write(
+                    "\t{applicant:<40} {status}".format(
+                        applicant=str(applicant),
+                        status=ApplicantStatusTypes(applicant.status).name,
+                    )
+                )
+
+            if inconsistent:
+                raise CommandError(
+                    "{} applicants have an inconsistent status".format(
+                        len(inconsistent)
+                    )
+                )
+
+            self.stdout.write("All applicants have a consistent status.")
+        elif cmd == 'backfill':
+            changed = applicants.update_status()
+            self.stdout.write("{} applicants updated.".format(len(changed)))
+        else:
+            raise CommandError("Unknown applicant_status sub-command")
@@ -0,0 +1,75 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gcc.profiling import collect, reset_profiling
+
+
+class Command(BaseCommand):
+    help = "Show or reset the percentiles of the profiled views."
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        sp = parser.add_subparsers(dest="cmd")
+        show = sp.add_parser(
+            name="show", help="dump the percentiles of the profiled views"
+        )
+        show.add_argument(
+            'views', nargs='*', help="only show the given view names"
+        )
+        sp.add_parser(name="reset", help="forget the samples of all views")
+
+    def show(self, views):
+        profiles = [
+            profile
+            for profile in collect()
+            if not views or profile.view in views
+        ]
+
+        if not profiles:
+            self.stdout.write("No request was profiled yet.")
+            return
+
+        self.stdout.write("Durations are in milliseconds.")
+        row = "\t{:<10} {:>10} {:>10} {:>10} {:>10}"
+
+        for profile in profiles:
+            self.stdout.write(
+                "{} ({} samples)".format(profile.view, profile.samples)
+            )
+            self.stdout.write(row.format('', 'p50', 'p90', 'p99', 'max'))
+
+            self.stdout.write(
+                row.format('queries', *(str(q) for q in profile.queries))
+            )
+
+            for name, values in (
+                ('request', profile.duration),
+                ('sql', profile.sql_time),
+                ('templates', profile.template_time),
+            ):
+                self.stdout.write(
+                    row.format(
+                        name, *('{:.1f}'.format(v * 1000) for v in values)
+                    )
+                )
+
+            for call_site in profile.call_sites:
+                self.stdout.write(
+                    "\t{:>4}x {}: {}".format(
+                        call_site.count, call_site.site, call_site.sql
+                    )
+                )
+
+    def handle(self, *args, **options):
+        cmd = options['cmd']
+        if cmd == 'show':
+            self.show(options['views'])
+        elif cmd == 'reset':
+            reset_profiling()
+            self.stdout.write("Profiling samples reset.")
+        else:
+            raise CommandError("Unknown profiling sub-command")
@@ -0,0 +1,255 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from gcc.models import (
+    ApplicantStatusTypes,
+    Corrector,
+    EventWish,
+    signup_window,
+)
+from gcc.profiling import percentiles
+
+
+class Traffic:
+    """
+    Traffic replayed by a thread, each scenario is a method making a
+    sequence of requests through `request`.
+    """
+
+    def __init__(self, edition, applicants, correctors, seed):
+        self.edition = edition
+        self.events = [event.pk for event in signup_window.open_events()]
+        self.applicants = applicants
+        self.correctors = correctors
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, step, method, url, data=None, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            response = getattr(self.client, method)(url, data, **kwargs)
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+
+        self.latencies[step].append(time.perf_counter() - start)
+
+        if failed:
+            self.errors[step] += 1
+
+    def signup(self):
+        self.client.logout()
+        self.request('index', 'get', reverse('gcc:index'))
+        self.request('learn_more', 'get', reverse('gcc:learn_more'))
+        self.client.force_login(self.rng.choice(self.applicants))
+        self.request(
+            'application_form',
+            'get',
+            reverse('gcc:application_form', args=[self.edition]),
+        )
+
+    def wishes(self):
+        user = self.rng.choice(self.applicants)
+        url = reverse('gcc:application_wishes', args=[self.edition])
+        self.client.force_login(user)
+        self.request('application_wishes', 'get', url)
+
+        if self.events:
+            events = self.rng.sample(self.events, min(3, len(self.events)))
+            self.request(
+                'application_wishes (post)',
+                'post',
+                url,
+                {
+                    'priority{}'.format(i): event
+                    for i, event in enumerate(events, 1)
+                },
+            )
+
+        self.request(
+            'application_summary',
+            'get',
+            reverse('gcc:application_summary', args=[user.pk]),
+        )
+
+    def review(self):
+        corrector = self.rng.choice(self.correctors)
+        event = corrector.event_id
+        self.client.force_login(corrector.user)
+        self.request(
+            'application_review',
+            'get',
+            reverse('gcc:application_review', args=[self.edition, event]),
+        )
+        wishes = list(
+            EventWish.objects.filter(event=event).values_list('pk', flat=True)
+        )
+        transitions = [
+            {
+                'wish': wish,
+                'status': self.rng.choice(
+                    [
+                        ApplicantStatusTypes.pending.value,
+                        ApplicantStatusTypes.selected.value,
+                        ApplicantStatusTypes.rejected.value,
+                    ]
+                ),
+            }
+            for wish in self.rng.sample(wishes, min(10, len(wishes)))
+        ]
+
+        if transitions:
+            self.request(
+                'update_wishes',
+                'post',
+                reverse('gcc:update_wishes'),
+                json.dumps({'transitions': transitions}),
+                content_type='application/json',
+            )
+
+    def run(self, scenarios, iterations):
+        try:
+            for _ in range(iterations):
+                getattr(self, self.rng.choice(scenarios))()
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay signup, wishes and review traffic against the application "
+        "in-process, with threads, and report the throughput and latency "
+        "percentiles of each step. The traffic modifies the database, run it "
+        "on a seeded development database (see the seed command)."
+    )
+
+    SCENARIOS = ('signup', 'wishes', 'review')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8, help="number of threads"
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help="number of scenarios replayed by each thread",
+        )
+        parser.add_argument(
+            '--scenarios',
+            nargs='+',
+            choices=self.SCENARIOS,
+            default=list(self.SCENARIOS),
+            help="replayed scenarios, picked at random",
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help="seed of the traffic"
+        )
+
+    def handle(self, *args, **options):
+        edition = signup_window.edition()
+
+        if edition is None:
+            raise CommandError("no edition is open for signup")
+
+        # Applicants who did not validate their wishes yet
+        applicants = list(
+            get_user_model().objects.filter(
+                applicant__edition=edition,
+                applicant__status=ApplicantStatusTypes.incomplete.value,
+            )[:10000]
+        )
+        correctors = list(
+            Corrector.objects.filter(event__edition=edition).select_related(
+                'user'
+            )
+        )
+
+        if not applicants or not correctors:
+            raise CommandError(
+                "edition {} has no incomplete applicant or no corrector, "
+                "seed the database first".format(edition.year)
+            )
+
+        traffics = [
+            Traffic(
+                edition.year,
+                applicants,
+                correctors,
+                options['seed'] + i,
+            )
+            for i in range(options['threads'])
+        ]
+        threads = [
+            threading.Thread(
+                target=traffic.run,
+                args=(options['scenarios'], options['iterations']),
+            )
+            for traffic in traffics
+        ]
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            start = time.perf_counter()
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            elapsed = time.perf_counter() - start
+
+        self.report(traffics, elapsed)
+
+    def report(self, traffics, elapsed):
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+
+        for traffic in traffics:
+            for step, values in traffic.latencies.items():
+                latencies[step] += values
+
+            for step, count in traffic.errors.items():
+                errors[step] += count
+
+        total = sum(len(values) for values in latencies.values())
+        self.stdout.write(
+            "{} requests in {:.1f}s, {:.1f} requests/s".format(
+                total, elapsed, total / elapsed
+            )
+        )
+        self.stdout.write(
+            "{:<28} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+                'step', 'req/s', 'p50', 'p90', 'p99', 'max', 'errors'
+            )
+        )
+
+        for step, values in sorted(latencies.items()):
+            self.stdout.write(
+                "{:<28} {:>8.1f} {} {:>8}".format(
+                    step,
+                    len(values) / elapsed,
+                    ' '.join(
+                        '{:>8.1f}'.format(value * 1000)
+                        for value in percentiles(values)
+                    ),
+                    errors[step],
+                )
+            )
+
+        self.stdout.write("Latencies are in milliseconds.")
@@ -0,0 +1,109 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gcc.factories import seed_centers, seed_edition, seed_labels
+from gcc.models import Edition
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic editions, the last one being open "
+        "for signup, to reproduce the production load locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--editions',
+            type=int,
+            default=3,
+            help="number of editions, up to the current year",
+        )
+        parser.add_argument(
+            '--applicants',
+            type=int,
+            default=10000,
+            help="number of applicants per edition",
+        )
+        parser.add_argument(
+            '--centers', type=int, default=8, help="number of centers"
+        )
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=12,
+            help="number of questions of the signup forms",
+        )
+        parser.add_argument(
+            '--returning',
+            type=float,
+            default=0.2,
+            help="ratio of applicants who applied to the previous edition",
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help="seed of the generated data"
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="seed the database even if DEBUG is disabled",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                "DEBUG is disabled, this may be a production database. Use "
+                "--force to seed it anyway."
+            )
+
+        current_year = timezone.now().year
+        years = list(
+            range(current_year - options['editions'] + 1, current_year + 1)
+        )
+        existing = Edition.objects.filter(year__in=years).values_list(
+            'year', flat=True
+        )
+
+        if existing:
+            raise CommandError(
+                "editions already exist: {}".format(
+                    ', '.join(map(str, existing))
+                )
+            )
+
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            centers = seed_centers(options['centers'])
+            labels = seed_labels(4)
+            users = []
+
+            for i, year in enumerate(years):
+                returning = int(options['applicants'] * options['returning'])
+                seeded = seed_edition(
+                    year=year,
+                    applicants=options['applicants'],
+                    centers=centers,
+                    questions=options['questions'],
+                    labels=labels,
+                    returning_users=users[-returning:] if returning else (),
+                    seed=options['seed'] + i,
+                )
+                users = seeded.users
+                self.stdout.write(
+                    "Edition {}: {} applicants in {} events".format(
+                        year, len(seeded.applicants), len(seeded.events)
+                    )
+                )
+
+        self.stdout.write(
+            "Seeded {} editions in {:.1f}s.".format(
+                len(years), time.perf_counter() - start
+            )
+        )
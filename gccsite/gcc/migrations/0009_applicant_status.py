@@ -0,0 +1,49 @@
+# Generated by Django 2.2.2 on 2019-08-20 21:04
+
+from django.db import migrations
+import gcc.models
+import prologin.models
+
+# Values of ApplicantStatusTypes and STATUS_ORDER when this migration was
+# written, copied so that later changes don't alter the backfill
+INCOMPLETE = 0
+STATUS_ORDER = [2, 0, 1, 3, 4, 5]
+
+
+def highest_status(statuses):
+    for status in reversed(STATUS_ORDER):
+        if status in statuses:
+            return status
+
+    return INCOMPLETE
+
+
+def backfill_status(apps, schema_editor):
+    Applicant = apps.get_model('gcc', 'Applicant')
+    wishes_status = {}
+
+    for pk, status in Applicant.objects.values_list('pk', 'eventwish__status'):
+        wishes_status.setdefault(pk, set())
+
+        if status is not None:
+            wishes_status[pk].add(status)
+
+    for pk, statuses in wishes_status.items():
+        status = highest_status(statuses)
+
+        if status != INCOMPLETE:
+            Applicant.objects.filter(pk=pk).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [('gcc', '0008_event_is_long')]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicant',
+            name='status',
+            field=prologin.models.EnumField(gcc.models.ApplicantStatusTypes, blank=True, choices=[(0, 'Incomplete'), (1, 'Pending'), (2, 'Rejected'), (3, 'Selected'), (4, 'Accepted'), (5, 'Confirmed')], db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.2 on 2019-08-22 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import gcc.models
+import prologin.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [('gcc', '0009_applicant_status')]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcceptanceMailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', prologin.models.EnumField(gcc.models.MailJobStatusTypes, choices=[(0, 'Pending'), (1, 'Sent'), (2, 'Failed')], db_index=True, default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('wish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acceptance_mails', to='gcc.EventWish')),
+            ],
+            options={
+                'ordering': ('created',),
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.3 on 2019-08-25 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gcc', '0010_acceptancemailjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['edition', 'signup_start', 'signup_end'], name='event_signup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventwish',
+            index=models.Index(fields=['event', 'status'], name='eventwish_event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventwish',
+            index=models.Index(condition=models.Q(_negated=True, status=2), fields=['applicant', 'status'], name='eventwish_active_idx'),
+        ),
+    ]
@@ -3,15 +3,18 @@
 
 import hashlib
 import os
-from collections import OrderedDict
-from datetime import date
+import uuid
+from collections import namedtuple
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import JSONField
+from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import Q
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.formats import date_format
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_noop
@@ -55,16 +58,11 @@ class Edition(models.Model):
     @staticmethod
     def current():
         """Gets current edition"""
-        return Edition.objects.latest()
+        return signup_window.edition()
 
     def subscription_is_open(self):
         """Is there still one event open for subscription"""
-        current_events = Event.objects.filter(
-            edition=self,
-            signup_start__lt=date.today(),
-            signup_end__gte=date.today(),
-        )
-        return current_events.exists()
+        return bool(signup_window.open_events(self))
 
     def user_has_applied(self, user):
         """Check whether a user has applied for this edition"""
@@ -113,6 +111,113 @@ class Event(models.Model):
             end=date_format(self.event_end, "SHORT_DATE_FORMAT"),
         )
 
+    class Meta:
+        indexes = [
+            # Events of an edition open for signup, see SignupWindow
+            models.Index(
+                fields=['edition', 'signup_start', 'signup_end'],
+                name='event_signup_idx',
+            )
+        ]
+
+
+SignupWindowState = namedtuple(
+    'SignupWindowState', ['generation', 'expires', 'edition', 'events']
+)
+
+
+class SignupWindow:
+    """
+    Process-level cache of the current edition and of its events which are
+    open for signup.
+
+    The cache expires at the next signup_start or signup_end among the events
+    of the edition, and it is invalidated through a token stored in Django's
+    cache each time an edition or an event changes, see gcc.signals.
+    """
+
+    GENERATION_KEY = 'gcc.signup_window.generation'
+
+    def __init__(self):
+        self.state = None
+
+    @classmethod
+    def generation(cls):
+        return cache.get_or_set(
+            cls.GENERATION_KEY, lambda: uuid.uuid4().hex, None
+        )
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.GENERATION_KEY, uuid.uuid4().hex, None)
+
+    @staticmethod
+    def load(generation):
+        now = timezone.now()
+        edition = Edition.objects.latest()
+        events = (
+            Event.objects.filter(edition=edition)
+            .select_related('center')
+            .order_by('event_start')
+        )
+        boundaries = [
+            boundary
+            for event in events
+            for boundary in (event.signup_start, event.signup_end)
+            if boundary > now
+        ]
+
+        return SignupWindowState(
+            generation=generation,
+            expires=min(boundaries, default=None),
+            edition=edition,
+            events=tuple(
+                event
+                for event in events
+                if event.signup_start < now < event.signup_end
+            ),
+        )
+
+    def get(self):
+        generation = self.generation()
+        state = self.state
+
+        if (
+            state is None
+            or state.generation != generation
+            or (state.expires is not None and state.expires <= timezone.now())
+        ):
+            state = self.state = self.load(generation)
+
+        return state
+
+    def edition(self):
+        """Gets current edition"""
+        return self.get().edition
+
+    def open_events(self, edition=None):
+        """
+        List the events of an edition which are open for signup, ordered by
+        date. Only the events of the current edition are cached.
+        """
+        state = self.get()
+        edition = getattr(edition, 'pk', edition)
+
+        if edition is None or edition == state.edition.pk:
+            return state.events
+
+        now = timezone.now()
+        return tuple(
+            Event.objects.filter(
+                edition=edition, signup_start__lt=now, signup_end__gt=now
+            )
+            .select_related('center')
+            .order_by('event_start')
+        )
+
+
+signup_window = SignupWindow()
+
 
 class Corrector(models.Model):
     event = models.ForeignKey(
@@ -157,6 +262,124 @@ STATUS_ORDER = [
 ]
 
 
+def highest_status(statuses):
+    """
+    Get the greatest status among `statuses` according to STATUS_ORDER, an
+    empty collection is considered incomplete.
+    """
+    for status in reversed(STATUS_ORDER):
+        if status in statuses:
+            return status
+
+    return ApplicantStatusTypes.incomplete.value
+
+
+def required_questions(editions):
+    """
+    Map the pk of each edition to the set of pk of the required questions of
+    its signup form, with a single query.
+    """
+    required = {edition: set() for edition in editions}
+    rows = QuestionForForm.objects.filter(
+        form__edition__in=editions, question__finaly_required=True
+    ).values_list('form__edition', 'question')
+
+    for edition, question in rows:
+        required[edition].add(question)
+
+    return required
+
+
+class ApplicantQuerySet(models.QuerySet):
+    def complete_application(self):
+        """
+        Check the completeness of the applications with three queries.
+        Returns a dict mapping applicant's pk to a boolean.
+        """
+        applicants = list(self.select_related('user'))
+        required = required_questions(
+            {applicant.edition_id for applicant in applicants}
+        )
+        responses = {applicant.pk: {} for applicant in applicants}
+        rows = Answer.objects.filter(
+            applicant__in=list(responses), question__finaly_required=True
+        ).values_list('applicant', 'question', 'response')
+
+        for applicant, question, response in rows:
+            responses[applicant][question] = response
+
+        return {
+            applicant.pk: applicant.user.has_complete_profile()
+            and all(
+                responses[applicant.pk].get(question)
+                for question in required[applicant.edition_id]
+            )
+            for applicant in applicants
+        }
+
+    def computed_status(self):
+        """
+        Compute the status of the applicants from their wishes with a single
+        query. Returns a dict mapping applicant's pk to a pair (stored status,
+        computed status).
+        """
+        rows = self.values_list('pk', 'status', 'eventwish__status')
+        stored = {}
+        wishes_status = {}
+
+        for pk, status, wish_status in rows:
+            stored[pk] = status
+            wishes_status.setdefault(pk, set())
+
+            if wish_status is not None:
+                wishes_status[pk].add(wish_status)
+
+        return {
+            pk: (stored[pk], highest_status(statuses))
+            for pk, statuses in wishes_status.items()
+        }
+
+    def inconsistent_status(self):
+        """
+        List the pk of applicants whose stored status does not match their
+        wishes.
+        """
+        return [
+            pk
+            for pk, (stored, computed) in self.computed_status().items()
+            if stored != computed
+        ]
+
+    def update_status(self):
+        """
+        Synchronize the stored status of the applicants with their wishes,
+        issuing at most one UPDATE per status value. Returns a dict mapping
+        the pk of updated applicants to their new status.
+        """
+        confirmed = ApplicantStatusTypes.confirmed.value
+        changed = {}
+        participations_changed = []
+
+        for pk, (stored, computed) in self.computed_status().items():
+            if stored != computed:
+                changed[pk] = computed
+
+                if confirmed in (stored, computed):
+                    participations_changed.append(pk)
+
+        for status in set(changed.values()):
+            Applicant.objects.filter(
+                pk__in=[pk for pk, new in changed.items() if new == status]
+            ).update(status=status)
+
+        if participations_changed:
+            get_user_model().objects.filter(
+                applicant__in=participations_changed
+            ).update_participations_count()
+
+        return changed
+
+
 class Applicant(models.Model):
     """
     An applicant for a specific edition and reviews about him.
@@ -186,15 +409,22 @@ class Applicant(models.Model):
     # Review of the application
     labels = models.ManyToManyField(ApplicantLabel, blank=True)
 
-    @property
-    def status(self):
-        wishes_status = set(wish.status for wish in self.eventwish_set.all())
+    # Greatest status of the wishes of the applicant, this is kept in sync
+    # with the wishes by the signals in gcc.signals
+    status = EnumField(
+        ApplicantStatusTypes,
+        db_index=True,
+        blank=True,
+        default=ApplicantStatusTypes.incomplete.value,
+    )
 
-        for wish_status in reversed(STATUS_ORDER):
-            if wish_status in wishes_status:
-                return wish_status
+    objects = ApplicantQuerySet.as_manager()
 
-        return ApplicantStatusTypes.incomplete.value
+    def compute_status(self):
+        """Compute the status of the applicant from its wishes"""
+        return highest_status(
+            set(wish.status for wish in self.eventwish_set.all())
+        )
 
     def is_locked(self):
         return EventWish.objects.filter(
@@ -217,30 +447,6 @@ class Applicant(models.Model):
             ~Q(status=ApplicantStatusTypes.rejected.value), applicant=self
         ).exists()
 
-    def get_export_data(self):
-        """
-        Return an array of data to be converted to csv
-        """
-
-        export_datas = OrderedDict()
-        export_datas["Username"] = self.user.username
-        export_datas["First name"] = self.user.first_name
-        export_datas["Last name"] = self.user.last_name
-        export_datas["Email"] = self.user.email
-        export_datas["Edition"] = str(self.edition)
-        export_datas["Labels"] = str(self.labels)
-
-        questions = self.edition.signup_form.question_list.all()
-
-        for question in questions:
-            try:
-                answer = Answer.objects.get(applicant=self, question=question)
-                export_datas[str(question)] = str(answer)
-            except Answer.DoesNotExist:
-                export_datas[str(question)] = "(empty)"
-
-        return export_datas
-
     def get_status_display(self):
         return ApplicantStatusTypes(self.status).name
 
@@ -251,20 +457,20 @@ class Applicant(models.Model):
         return [event for event in self.assignation_event.all()]
 
     def has_complete_application(self):
-        # TODO: optimize requests
+        """
+        Check if the applicant answered all the required questions of the
+        signup form of its edition. Answers are read from the prefetched
+        `answers` if available.
+        """
         if not self.user.has_complete_profile():
             return False
 
-        questions = Edition.current().signup_form.question_list.all()
-        for question in questions:
-            try:
-                answer = Answer.objects.get(applicant=self, question=question)
-                if not answer.is_valid():
-                    return False
-            except Answer.DoesNotExist:
-                return question.finaly_required
-
-        return True
+        required = required_questions([self.edition_id])[self.edition_id]
+        responses = {
+            answer.question_id: answer.response
+            for answer in self.answers.all()
+        }
+        return all(responses.get(question) for question in required)
 
     def validate_current_wishes(self):
         for wish in self.eventwish_set.all():
@@ -279,7 +485,7 @@ class Applicant(models.Model):
         """
         acceptable_wishes = EventWish.objects.filter(
             event=event, status=ApplicantStatusTypes.incomplete.value
-        )
+        ).select_related('applicant__user')
         return [wish.applicant for wish in acceptable_wishes]
 
     @staticmethod
@@ -290,7 +496,7 @@ class Applicant(models.Model):
         """
         acceptable_wishes = EventWish.objects.filter(
             event=event, status=ApplicantStatusTypes.selected.value
-        )
+        ).select_related('applicant__user')
         return [wish.applicant for wish in acceptable_wishes]
 
     @staticmethod
@@ -300,7 +506,7 @@ class Applicant(models.Model):
         """
         accepted_wishes = EventWish.objects.filter(
             event=event, status=ApplicantStatusTypes.accepted.value
-        )
+        ).select_related('applicant__user')
         return [wish.applicant for wish in accepted_wishes]
 
     @staticmethod
@@ -310,7 +516,7 @@ class Applicant(models.Model):
         """
         confirmed_wishes = EventWish.objects.filter(
             event=event, status=ApplicantStatusTypes.confirmed.value
-        )
+        ).select_related('applicant__user')
         return [wish.applicant for wish in confirmed_wishes]
 
     @staticmethod
@@ -320,22 +526,23 @@ class Applicant(models.Model):
         """
         acceptable_wishes = EventWish.objects.filter(
             event=event, status=ApplicantStatusTypes.rejected.value
-        )
+        ).select_related('applicant__user')
         return [wish.applicant for wish in acceptable_wishes]
 
     @staticmethod
-    def for_user_and_edition(user, edition):
+    def for_user_and_edition(user, edition, lock=False):
         """
         Get applicant object corresponding to an user for given edition. If no
         applicant has been created for this edition yet, it will be created.
+        With `lock`, the applicant is locked until the end of the current
+        transaction.
         """
-        applicant, created = Applicant.objects.get_or_create(
-            user=user, edition=edition
-        )
+        applicants = Applicant.objects
 
-        if created:
-            applicant.save()
+        if lock:
+            applicants = applicants.select_for_update()
 
+        applicant, _ = applicants.get_or_create(user=user, edition=edition)
         return applicant
 
     def __str__(self):
@@ -353,6 +560,58 @@ class Applicant(models.Model):
         unique_together = (('user', 'edition'),)
 
 
+class EventWishQuerySet(models.QuerySet):
+    """
+    Bulk operations on wishes bypass the model signals, so they refresh the
+    stored status of the affected applicants by themselves.
+    """
+
+    def _update_applicants_status(self, applicant_ids):
+        Applicant.objects.filter(pk__in=applicant_ids).update_status()
+
+    def update(self, **kwargs):
+        applicant_ids = set(self.values_list('applicant_id', flat=True))
+        rows = super().update(**kwargs)
+        self._update_applicants_status(applicant_ids)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._update_applicants_status({wish.applicant_id for wish in objs})
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        objs = list(objs)
+        super().bulk_update(objs, *args, **kwargs)
+        self._update_applicants_status({wish.applicant_id for wish in objs})
+
+    @staticmethod
+    def _status_counters():
+        return {
+            status.name: models.Count('pk', filter=Q(status=status.value))
+            for status in ApplicantStatusTypes
+        }
+
+    def status_counts(self):
+        """
+        Count the wishes of each status in a single aggregate query, the
+        result is a dict indexed by status names.
+        """
+        return self.aggregate(**self._status_counters())
+
+    def status_counts_by_event(self):
+        """
+        Same as status_counts, but grouped by event in a single query. The
+        result is a dict indexed by event's pk.
+        """
+        rows = (
+            self.order_by().values('event').annotate(**self._status_counters())
+        )
+        return {row.pop('event'): row for row in rows}
+
+
 class EventWish(models.Model):
     applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE)
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
@@ -367,12 +626,62 @@ class EventWish(models.Model):
     # The lower the order is, the more important is the choice
     order = models.IntegerField(default=1)
 
+    objects = EventWishQuerySet.as_manager()
+
     def __str__(self):
         return '{} for {}'.format(str(self.applicant), str(self.event))
 
     class Meta:
         ordering = ('order',)
         unique_together = (('applicant', 'event'),)
+        indexes = [
+            # Wishes of an event by status, for the review and acceptance
+            models.Index(
+                fields=['event', 'status'], name='eventwish_event_status_idx'
+            ),
+            # Wishes still in the running of an applicant, see is_locked and
+            # has_non_rejected_choices
+            models.Index(
+                fields=['applicant', 'status'],
+                name='eventwish_active_idx',
+                condition=~Q(status=ApplicantStatusTypes.rejected.value),
+            ),
+        ]
+
+
+@ChoiceEnum.labels(str.capitalize)
+class MailJobStatusTypes(ChoiceEnum):
+    pending = 0  # the mail is waiting to be sent or retried
+    sent = 1  # the mail has been delivered
+    failed = 2  # the mail could not be delivered after all retries
+    cancelled = 3  # the wish was no longer selected when the mail was due
+
+
+class AcceptanceMailJob(models.Model):
+    """
+    An acceptance mail waiting to be sent for a wish, the wish is only marked
+    as accepted once the mail is delivered. See gcc.mailing.
+    """
+
+    wish = models.ForeignKey(
+        EventWish, related_name='acceptance_mails', on_delete=models.CASCADE
+    )
+    status = EnumField(
+        MailJobStatusTypes,
+        db_index=True,
+        default=MailJobStatusTypes.pending.value,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return 'Acceptance mail for {}'.format(self.wish)
+
+    class Meta:
+        ordering = ('created',)
 
 
 @ChoiceEnum.labels(str.capitalize)
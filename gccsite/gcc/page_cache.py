@@ -0,0 +1,150 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Cache of the public pages served to anonymous visitors.
+
+Pages are cached per URL and language under a generation token, which is
+changed by gcc.signals each time a sponsor, an event, an edition or a news
+entry changes so that all the cached pages are purged at once. CSRF tokens
+are stripped from the cached content and replaced by the token of the visitor
+when the page is served.
+
+The events open for signup change without any model change when a signup
+period starts or ends, so pages are also keyed by the next signup boundary of
+the current edition and don't outlive it, see gcc.models.SignupWindow.
+"""
+
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.encoding import iri_to_uri
+
+from gcc.models import Edition, signup_window
+
+GENERATION_KEY = 'gcc.page_cache.generation'
+
+CSRF_PLACEHOLDER = b'__page_cache_csrf_token__'
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def page_cache():
+    return caches[settings.GCC_PAGE_CACHE_ALIAS]
+
+
+def page_cache_generation():
+    return page_cache().get_or_set(
+        GENERATION_KEY, lambda: uuid.uuid4().hex, None
+    )
+
+
+def purge_page_cache():
+    page_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def is_cacheable(request):
+    """
+    Only GET requests of anonymous visitors to one of GCC_PAGE_CACHE_VIEWS
+    are cached. Visitors with a session may have pending messages or content
+    unlocked in their session, so they are never served from the cache.
+    """
+    match = request.resolver_match
+    views = settings.GCC_PAGE_CACHE_VIEWS
+
+    return (
+        request.method == 'GET'
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+        and match is not None
+        and (match.view_name in views or match.namespace in views)
+    )
+
+
+def signup_boundary():
+    """
+    Get the next signup_start or signup_end of the current edition, if any.
+    """
+    try:
+        return signup_window.get().expires
+    except Edition.DoesNotExist:
+        return None
+
+
+def page_cache_timeout(boundary):
+    """
+    Get the lifetime of the pages cached now, in seconds.
+    """
+    timeout = settings.GCC_PAGE_CACHE_TIMEOUT
+
+    if boundary is not None:
+        remaining = (boundary - timezone.now()).total_seconds()
+        timeout = remaining if timeout is None else min(timeout, remaining)
+
+    return timeout
+
+
+def page_cache_key(request, boundary):
+    url = hashlib.md5(iri_to_uri(request.get_full_path()).encode())
+    return 'gcc.page_cache.{}.{}.{}.{}'.format(
+        page_cache_generation(),
+        boundary.timestamp() if boundary is not None else 'none',
+        request.LANGUAGE_CODE,
+        url.hexdigest(),
+    )
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """
+    Serve the pages listed in GCC_PAGE_CACHE_VIEWS from the cache for
+    anonymous visitors. Must be placed after LocaleMiddleware.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not is_cacheable(request):
+            return None
+
+        boundary = signup_boundary()
+        key = page_cache_key(request, boundary)
+        cached = page_cache().get(key)
+
+        if cached is None:
+            request._page_cache_key = key
+            request._page_cache_timeout = page_cache_timeout(boundary)
+            return None
+
+        content_type, content = cached
+
+        if CSRF_PLACEHOLDER in content:
+            content = content.replace(
+                CSRF_PLACEHOLDER, get_token(request).encode()
+            )
+
+        return HttpResponse(content, content_type=content_type)
+
+    def process_response(self, request, response):
+        key = getattr(request, '_page_cache_key', None)
+
+        if key is None or response.status_code != 200 or response.streaming:
+            return response
+
+        timeout = request._page_cache_timeout
+
+        if timeout is not None and timeout <= 0:
+            return response
+
+        content = CSRF_INPUT.sub(
+            rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content
+        )
+        page_cache().set(
+            key,
+            (response['Content-Type'], content),
+            timeout,
+        )
+        return response
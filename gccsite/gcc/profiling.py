@@ -0,0 +1,317 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Sampling profiler of the views.
+
+A fraction GCC_PROFILING_SAMPLE_RATE of the requests is profiled: the time
+spent in the whole request, in SQL queries and rendering templates is recorded
+along with the number of queries. Queries run several times from the same
+line of code during a request, typically N+1 queries in a loop, are recorded
+with their call site.
+
+Samples are aggregated in the memory of each process and regularly flushed to
+the cache, where the staff dashboard and the `profiling` management command
+merge the samples of all the processes. The cache must be shared by the
+processes (not LocMemCache) for them to see the production samples.
+"""
+
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque, namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+GENERATION_KEY = 'gcc.profiling.generation'
+
+# Maximum length of the SQL stored with call sites
+SQL_MAX_LENGTH = 200
+
+Sample = namedtuple('Sample', 'duration queries sql_time template_time')
+Percentiles = namedtuple('Percentiles', 'p50 p90 p99 max')
+CallSite = namedtuple('CallSite', 'site sql count')
+ViewProfile = namedtuple(
+    'ViewProfile',
+    'view samples duration queries sql_time template_time call_sites',
+)
+
+
+def profiling_cache():
+    return caches[settings.GCC_PROFILING_CACHE_ALIAS]
+
+
+def profiling_generation():
+    return profiling_cache().get_or_set(
+        GENERATION_KEY, lambda: uuid.uuid4().hex, None
+    )
+
+
+def reset_profiling():
+    """
+    Forget the samples of all the processes.
+    """
+    profiling_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def processes_key(generation):
+    return 'gcc.profiling.{}.processes'.format(generation)
+
+
+def call_site():
+    """
+    Get the innermost line of the project or of a template running the
+    current query.
+    """
+    frame = sys._getframe(2)
+
+    while frame is not None:
+        code = frame.f_code
+
+        if code.co_name == 'render_annotated' and 'self' in frame.f_locals:
+            node = frame.f_locals['self']
+            token = getattr(node, 'token', None)
+
+            if token is not None:
+                origin = node.origin
+                return '{}:{}'.format(
+                    origin.template_name or origin.name, token.lineno
+                )
+        elif (
+            code.co_filename.startswith(settings.BASE_DIR)
+            and code.co_filename != __file__
+            and 'site-packages' not in code.co_filename
+        ):
+            return '{}:{} ({})'.format(
+                os.path.relpath(code.co_filename, settings.BASE_DIR),
+                frame.f_lineno,
+                code.co_name,
+            )
+
+        frame = frame.f_back
+
+    return '?'
+
+
+class RequestProfile:
+    """
+    Measurements of a single request, installed as an execute wrapper of the
+    database connections.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.duration = 0
+        self.queries = 0
+        self.sql_time = 0
+        self.template_start = None
+        self.template_time = 0
+        self.call_sites = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.call_sites[call_site(), sql[:SQL_MAX_LENGTH]] += 1
+
+    def rendered(self, response):
+        self.template_time = time.perf_counter() - self.template_start
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.start
+
+    def sample(self):
+        return Sample(
+            self.duration, self.queries, self.sql_time, self.template_time
+        )
+
+
+class Profiler:
+    """
+    Samples of the current process, per view name.
+    """
+
+    def __init__(self):
+        self.key = 'gcc.profiling.process.' + uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.generation = None
+        self.clear()
+
+    def clear(self):
+        self.samples = defaultdict(
+            lambda: deque(maxlen=settings.GCC_PROFILING_MAX_SAMPLES)
+        )
+        # Highest number of repetitions of each call site during a request
+        self.call_sites = defaultdict(Counter)
+        self.flushed_at = None
+
+    def _check_generation(self):
+        """
+        Forget the samples collected before a reset.
+        """
+        generation = profiling_generation()
+
+        if self.generation not in (None, generation):
+            self.clear()
+
+        self.generation = generation
+
+    def record(self, view, profile):
+        with self.lock:
+            # Before appending, so that the sample survives a reset
+            self._check_generation()
+            self.samples[view].append(profile.sample())
+            call_sites = self.call_sites[view]
+
+            for site, count in profile.call_sites.items():
+                if count > max(1, call_sites[site]):
+                    call_sites[site] = count
+
+            if (
+                self.flushed_at is None
+                or time.monotonic() - self.flushed_at
+                >= settings.GCC_PROFILING_FLUSH_INTERVAL
+            ):
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self._check_generation()
+        generation = self.generation
+        self.flushed_at = time.monotonic()
+
+        if not self.samples:
+            return
+
+        cache = profiling_cache()
+        key = '{}.{}'.format(self.key, generation)
+        cache.set(
+            key,
+            {
+                'samples': {
+                    view: list(samples)
+                    for view, samples in self.samples.items()
+                },
+                'call_sites': dict(self.call_sites),
+            },
+            settings.GCC_PROFILING_RETENTION,
+        )
+
+        processes = cache.get(processes_key(generation), set())
+
+        if key not in processes:
+            processes.add(key)
+            cache.set(
+                processes_key(generation),
+                processes,
+                settings.GCC_PROFILING_RETENTION,
+            )
+
+
+profiler = Profiler()
+
+
+def percentiles(values):
+    values = sorted(values)
+    return Percentiles(
+        *(
+            values[max(0, math.ceil(ratio * len(values)) - 1)]
+            for ratio in (0.5, 0.9, 0.99, 1)
+        )
+    )
+
+
+def collect():
+    """
+    Merge the samples flushed by all the processes, get the profile of each
+    view sorted by decreasing 90th percentile of the request duration.
+    """
+    profiler.flush()
+    cache = profiling_cache()
+    keys = cache.get(processes_key(profiling_generation()), set())
+    samples = defaultdict(list)
+    call_sites = defaultdict(Counter)
+
+    for snapshot in cache.get_many(keys).values():
+        for view, view_samples in snapshot['samples'].items():
+            samples[view].extend(Sample(*sample) for sample in view_samples)
+
+        for view, view_call_sites in snapshot['call_sites'].items():
+            for site, count in view_call_sites.items():
+                if count > call_sites[view][site]:
+                    call_sites[view][site] = count
+
+    profiles = [
+        ViewProfile(
+            view=view,
+            samples=len(view_samples),
+            duration=percentiles(s.duration for s in view_samples),
+            queries=percentiles(s.queries for s in view_samples),
+            sql_time=percentiles(s.sql_time for s in view_samples),
+            template_time=percentiles(s.template_time for s in view_samples),
+            call_sites=[
+                CallSite(site, sql, count)
+                for (site, sql), count in call_sites[view].most_common(
+                    settings.GCC_PROFILING_TOP_CALL_SITES
+                )
+            ],
+        )
+        for view, view_samples in samples.items()
+    ]
+    profiles.sort(key=lambda profile: profile.duration.p90, reverse=True)
+    return profiles
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of the requests. Must be placed at the top of
+    MIDDLEWARE, so that the time spent in the other middlewares is measured
+    too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.GCC_PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        request._profile = profile
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+
+            response = self.get_response(request)
+
+        profile.stop()
+
+        if request.resolver_match is not None:
+            profiler.record(request.resolver_match.view_name, profile)
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before the response is rendered
+        profile = getattr(request, '_profile', None)
+
+        if profile is not None:
+            profile.template_start = time.perf_counter()
+            response.add_post_render_callback(profile.rendered)
+
+        return response
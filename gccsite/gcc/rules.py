@@ -3,7 +3,38 @@
 
 import rules
 
-from gcc.models import ApplicantStatusTypes, Corrector, Event
+from gcc.models import Corrector
+
+# Incremented each time a corrector assignment changes, this invalidates the
+# events cached on user instances by corrected_events()
+_correctors_generation = 0
+
+
+def invalidate_corrected_events():
+    global _correctors_generation
+    _correctors_generation += 1
+
+
+def corrected_events(user):
+    """
+    Get the set of events a user is a corrector for. The set is loaded once
+    and cached on the user instance, which lives as long as the request.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    generation, events = getattr(user, '_corrected_events', (None, None))
+
+    if generation != _correctors_generation:
+        generation = _correctors_generation
+        events = frozenset(
+            Corrector.objects.filter(user=user).values_list(
+                'event_id', flat=True
+            )
+        )
+        user._corrected_events = (generation, events)
+
+    return events
 
 
 @rules.predicate
@@ -17,19 +48,20 @@ def can_edit_application_labels(user, applicant):
     This permission is granted if the corrector is allowed to review for an
     event the applicant applies to.
     """
-    return Event.objects.filter(
-        correctors__user=user, applicants=applicant
-    ).exists()
+    events = corrected_events(user)
+    return any(
+        wish.event_id in events for wish in applicant.eventwish_set.all()
+    )
 
 
 @rules.predicate
 def can_accept_wish(user, wish):
-    return can_review_event(user, wish.event)
+    return wish.event_id in corrected_events(user)
 
 
 @rules.predicate
 def can_review_event(user, event):
-    return Corrector.objects.filter(event=event, user=user).exists()
+    return event.pk in corrected_events(user)
 
 
 rules.add_perm('gcc.can_edit_own_application', can_edit_own_application)
@@ -37,3 +69,4 @@ rules.add_perm('gcc.can_edit_application_labels', can_edit_application_labels)
 rules.add_perm('gcc.can_accept_wish', can_accept_wish)
 rules.add_perm('gcc.can_review', rules.is_staff)
 rules.add_perm('gcc.can_review_event', can_review_event)
+rules.add_perm('gcc.can_view_profiling', rules.is_staff)
@@ -0,0 +1,95 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from zinnia.models import Entry
+
+from centers.center_map import CenterMap
+from centers.models import Center
+from gcc.forms import invalidate_compiled_forms
+from gcc.models import (
+    Applicant,
+    Corrector,
+    Edition,
+    Event,
+    EventWish,
+    Question,
+    QuestionForForm,
+    SignupWindow,
+    Sponsor,
+)
+from gcc.page_cache import purge_page_cache
+from gcc.rules import invalidate_corrected_events
+
+
+@receiver(post_save, sender=EventWish)
+@receiver(post_delete, sender=EventWish)
+def update_applicant_status(sender, instance, **kwargs):
+    """
+    Keep the stored status of an applicant in sync with its wishes.
+    """
+    changed = Applicant.objects.filter(
+        pk=instance.applicant_id
+    ).update_status()
+
+    # Also refresh the applicant instance attached to the wish, if any
+    if instance.applicant_id in changed and EventWish.applicant.is_cached(
+        instance
+    ):
+        instance.applicant.status = changed[instance.applicant_id]
+
+
+@receiver(post_delete, sender=Applicant)
+def update_participations_count(sender, instance, **kwargs):
+    """
+    Forget the participation of a deleted applicant.
+    """
+    get_user_model().objects.filter(
+        pk=instance.user_id
+    ).update_participations_count()
+
+
+@receiver(post_save, sender=Corrector)
+@receiver(post_delete, sender=Corrector)
+def invalidate_corrector_cache(sender, **kwargs):
+    invalidate_corrected_events()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=QuestionForForm)
+@receiver(post_delete, sender=QuestionForForm)
+def invalidate_forms_cache(sender, **kwargs):
+    invalidate_compiled_forms()
+
+
+@receiver(post_save, sender=Edition)
+@receiver(post_delete, sender=Edition)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Center)
+def invalidate_signup_window(sender, **kwargs):
+    SignupWindow.invalidate()
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_delete, sender=Center)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_center_map(sender, **kwargs):
+    CenterMap.invalidate()
+
+
+@receiver(post_save, sender=Sponsor)
+@receiver(post_delete, sender=Sponsor)
+@receiver(post_save, sender=Edition)
+@receiver(post_delete, sender=Edition)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Center)
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def purge_public_pages(sender, **kwargs):
+    purge_page_cache()
@@ -1,28 +1,35 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
-import sys
-import os
+import json
+from itertools import groupby
+from operator import attrgetter
+
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.functions import Upper
 from django.http.response import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import RedirectView, TemplateView, View
-from prologin.email import send_email
-from django.utils.text import slugify
-
 
+from gcc import profiling
+from gcc.mailing import (
+    acceptance_progress,
+    attachment_bundles,
+    enqueue_acceptance_mails,
+)
 from gcc.models import (
-    Answer,
     Applicant,
     ApplicantLabel,
     ApplicantStatusTypes,
     Event,
     EventWish,
 )
+from prologin.utils import LoginRequiredMixin
 from rules.contrib.views import PermissionRequiredMixin
 
 
@@ -44,6 +51,21 @@ class ApplicationReviewIndexView(PermissionRequiredMixin, TemplateView):
         return context
 
 
+class ProfilingView(PermissionRequiredMixin, TemplateView):
+    permission_required = 'gcc.can_view_profiling'
+    template_name = "gcc/profiling.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(
+            {
+                'profiles': profiling.collect(),
+                'sample_percent': settings.GCC_PROFILING_SAMPLE_RATE * 100,
+            }
+        )
+        return context
+
+
 class ApplicationReviewView(PermissionRequiredMixin, TemplateView):
     permission_required = 'gcc.can_review_event'
     template_name = "gcc/application/review.html"
@@ -56,43 +78,41 @@ class ApplicationReviewView(PermissionRequiredMixin, TemplateView):
         Extract the list of users who have an application this year and list
         their applications in the same object.
         """
-        event = get_object_or_404(Event, pk=kwargs['event'])
-        applicants = Applicant.objects.filter(assignation_wishes=event)
-        applicants = applicants.prefetch_related(
-            'user',
-            'answers',
-            'answers__question',
-            'eventwish_set',
-            'eventwish_set__event',
-            'labels',
+        event = get_object_or_404(
+            Event.objects.select_related('center', 'edition'),
+            pk=kwargs['event'],
         )
-        acceptable_applicants = Applicant.acceptable_applicants_for(event)
-
-        # Group applicants by choice order
-        grouped_applicants = dict()
-
-        for applicant in applicants:
-            order = EventWish.objects.get(
-                applicant=applicant, event=event
-            ).order
-
-            if order not in grouped_applicants:
-                grouped_applicants[order] = []
 
-            grouped_applicants[order].append(applicant)
+        # TODO: remove redundancy
+        assert event.edition.year == kwargs['edition']
 
-        for group in grouped_applicants.values():
-            group.sort(
-                key=lambda applicant: (
-                    applicant.user.last_name.upper(),
-                    applicant.user.first_name.upper(),
-                )
+        # Fetch all the wishes for this event at once, sorted by choice order
+        # and applicant name so that they can be grouped in a single pass
+        wishes = (
+            EventWish.objects.filter(event=event)
+            .select_related('applicant__user')
+            .prefetch_related(
+                Prefetch(
+                    'applicant__eventwish_set',
+                    queryset=EventWish.objects.select_related('event__center'),
+                ),
+                'applicant__answers__question',
+                'applicant__labels',
+            )
+            .annotate(
+                last_name_key=Upper('applicant__user__last_name'),
+                first_name_key=Upper('applicant__user__first_name'),
             )
+            .order_by('order', 'last_name_key', 'first_name_key')
+        )
 
-        grouped_applicants = sorted(grouped_applicants.items())
+        # Group applicants by choice order
+        grouped_applicants = [
+            (order, [wish.applicant for wish in group])
+            for order, group in groupby(wishes, key=attrgetter('order'))
+        ]
 
-        # TODO: remove redundancy
-        assert event.edition.year == kwargs['edition']
+        counters = EventWish.objects.filter(event=event).status_counts()
 
         context = super().get_context_data(**kwargs)
         context.update(
@@ -100,15 +120,11 @@ class ApplicationReviewView(PermissionRequiredMixin, TemplateView):
                 'grouped_applicants': grouped_applicants,
                 'event': event,
                 'labels': ApplicantLabel.objects.all(),
-                'nb_acceptables': len(acceptable_applicants),
+                'nb_acceptables': counters['selected'],
+                'nb_accepted': counters['accepted'],
+                'nb_confirmed': counters['confirmed'],
             }
         )
-
-        context['nb_accepted'] = len(Applicant.accepted_applicants_for(event))
-        context['nb_confirmed'] = len(
-            Applicant.confirmed_applicants_for(event)
-        )
-
         return context
 
 
@@ -128,11 +144,19 @@ class ApplicationAcceptView(PermissionRequiredMixin, TemplateView):
         return get_object_or_404(Event, pk=self.kwargs['event'])
 
     def get_context_data(self, **kwargs):
-        event = get_object_or_404(Event, pk=kwargs['event'])
+        event = get_object_or_404(
+            Event.objects.select_related('center'), pk=kwargs['event']
+        )
         applicants = Applicant.acceptable_applicants_for(event)
 
         context = super().get_context_data(**kwargs)
-        context.update({'applicants': applicants, 'event': event})
+        context.update(
+            {
+                'applicants': applicants,
+                'event': event,
+                'attachment_errors': attachment_bundles.check(event),
+            }
+        )
         return context
 
 
@@ -151,97 +175,37 @@ class ApplicationAcceptSendView(PermissionRequiredMixin, RedirectView):
 
     def get(self, request, *args, **kwargs):
         event = get_object_or_404(Event, pk=kwargs['event'])
-        acceptables = Applicant.acceptable_applicants_for(event)
-
-        for applicant in acceptables:
-            wish = get_object_or_404(
-                EventWish, applicant=applicant, event=event
+        attachment_errors = attachment_bundles.check(event)
+
+        if attachment_errors:
+            messages.add_message(
+                self.request,
+                messages.ERROR,
+                _('No mail sent, invalid attachments: %(errors)s')
+                % {'errors': ', '.join(attachment_errors)},
             )
+            return super().get(request, *args, **kwargs)
 
-            try:
-
-                def catch_attachment(path):
-                    return open(staticfiles_storage.path(path), 'rb').read()
-
-                event_center = str(event.center)
-                event_date = event.event_start.strftime('%Y-%m-%d')
-
-                event_name = slugify(event_center + '-' + event_date)
-
-                attachments = (
-                    (
-                        'autorisation-participation.pdf',
-                        catch_attachment(
-                            'gcc/attachments/autorisation-participation-'
-                            + event_name
-                            + '.pdf'
-                        ),
-                        'application/pdf',
-                    ),
-                    (
-                        'planning.pdf',
-                        catch_attachment(
-                            'gcc/attachments/planning-' + event_name + '.pdf'
-                        ),
-                        'application/pdf',
-                    ),
-                    (
-                        'droits-image.pdf',
-                        catch_attachment(
-                            'gcc/attachments/droits-image-'
-                            + event_name
-                            + '.pdf'
-                        ),
-                        'application/pdf',
-                    ),
-                    (
-                        'fiche-sanitaire.pdf',
-                        catch_attachment(
-                            'gcc/attachments/fiche-sanitaire-'
-                            + event_name
-                            + '.pdf'
-                        ),
-                        'application/pdf',
-                    ),
-                )
+        queued = enqueue_acceptance_mails(event)
+        messages.add_message(
+            self.request,
+            messages.SUCCESS,
+            _('%(count)d acceptance mails queued.') % {'count': queued},
+        )
+        return super().get(request, *args, **kwargs)
 
-                # TODO: CRITICAL: this is hardcoded pk of parent's email
-                parent_email = Answer.objects.get(
-                    applicant=applicant, question__pk=17
-                ).response
-
-                for dest in [applicant.user.email, parent_email]:
-                    confirm_url = (
-                        'https://'
-                        + settings.SITE_HOST
-                        + reverse('gcc:confirm', kwargs={'wish': wish.pk})
-                    )
-
-                    send_email(
-                        'gcc/mails/accept',
-                        dest,
-                        {
-                            'applicant': applicant,
-                            'event': event,
-                            'confirm_url': confirm_url,
-                        },
-                        attachments,
-                    )
-
-                wish.status = ApplicantStatusTypes.accepted.value
-                wish.save()
-            except Exception as exp:
-                exc_type, exc_obj, exc_tb = sys.exc_info()
-                fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-                messages.add_message(
-                    self.request,
-                    messages.ERROR,
-                    'Failed to accept: {}: {} ({}:{})'.format(
-                        applicant.user.username, exp, fname, exc_tb.tb_lineno
-                    ),
-                )
 
-        return super().get(request, *args, **kwargs)
+class ApplicationAcceptProgressView(PermissionRequiredMixin, View):
+    permission_required = 'gcc.can_review_event'
+
+    def get_permission_object(self):
+        return get_object_or_404(Event, pk=self.kwargs['event'])
+
+    def get(self, request, *args, **kwargs):
+        event = get_object_or_404(Event, pk=kwargs['event'])
+        return JsonResponse(
+            {'status': 'ok', 'mails': acceptance_progress(event)}
+        )
 
 
 #  __        ___     _                  ___     _          _          _
@@ -347,7 +311,9 @@ class UpdateWish(PermissionRequiredMixin, View):
         wish.status = status
         wish.save()
 
-        nb_acceptables = len(Applicant.acceptable_applicants_for(wish.event))
+        nb_acceptables = EventWish.objects.filter(
+            event=wish.event, status=ApplicantStatusTypes.selected.value
+        ).count()
         return JsonResponse(
             {
                 'status': 'ok',
@@ -356,3 +322,72 @@ class UpdateWish(PermissionRequiredMixin, View):
                 'nb_acceptable_applicants': nb_acceptables,
             }
         )
+
+
+class UpdateWishes(LoginRequiredMixin, View):
+    """
+    Apply a batch of status transitions, the request body is a JSON object:
+    {"transitions": [{"wish": <pk>, "status": <status>}, ...]}
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            transitions = {
+                int(transition['wish']): int(transition['status'])
+                for transition in json.loads(request.body)['transitions']
+            }
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse(
+                {'status': 'error', 'reason': _('invalid request')}
+            )
+
+        statuses = set(status.value for status in ApplicantStatusTypes)
+
+        if not transitions or not set(transitions.values()) <= statuses:
+            return JsonResponse(
+                {'status': 'error', 'reason': _('invalid request')}
+            )
+
+        with transaction.atomic():
+            wishes = list(
+                EventWish.objects.select_for_update().filter(
+                    pk__in=transitions
+                )
+            )
+
+            if len(wishes) != len(transitions):
+                return JsonResponse(
+                    {'status': 'error', 'reason': _('wish does not exist')}
+                )
+
+            # Same rule as UpdateWish, corrected events are loaded once
+            if not all(
+                request.user.has_perm('gcc.can_accept_wish', wish)
+                for wish in wishes
+            ):
+                return JsonResponse(
+                    {'status': 'error', 'reason': _('not allowed')}
+                )
+
+            for wish in wishes:
+                wish.status = transitions[wish.pk]
+
+            EventWish.objects.bulk_update(wishes, ['status'])
+
+        applicants = Applicant.objects.filter(
+            pk__in=[wish.applicant_id for wish in wishes]
+        )
+        counters = EventWish.objects.filter(
+            event__in=[wish.event_id for wish in wishes]
+        ).status_counts_by_event()
+
+        return JsonResponse(
+            {
+                'status': 'ok',
+                'applicants': {
+                    applicant.pk: applicant.get_status_display()
+                    for applicant in applicants.only('status')
+                },
+                'events': counters,
+            }
+        )
@@ -86,6 +86,38 @@ document.addEventListener('keydown', (event) => {
     }
 });
 
+/**
+ * Display the progress of acceptance mails, refresh it while some mails are
+ * still waiting to be sent
+ */
+function refreshAcceptanceProgress() {
+    const progress = $('.acceptance-progress');
+
+    if (progress.length == 0)
+        return;
+
+    $.getJSON(progress.attr('data-url'), function(data) {
+        if (data['status'] != 'ok') {
+            console.error('error:', data);
+            return;
+        }
+
+        const mails = data['mails'];
+
+        if (mails['pending'] + mails['sent'] + mails['failed'] > 0)
+            progress.show();
+
+        progress.find('.mails-pending').text(mails['pending']);
+        progress.find('.mails-sent').text(mails['sent']);
+        progress.find('.mails-failed').text(mails['failed']);
+
+        if (mails['pending'] > 0)
+            setTimeout(refreshAcceptanceProgress, 2000);
+    });
+}
+
+refreshAcceptanceProgress();
+
 /**
  * Enable dropdowns
  */
@@ -137,39 +169,106 @@ $('.add-label').on('click', function (event) {
 
 /**
  * Handle wish updates
+ *
+ * Decisions are applied to the page right away and queued, the queue is sent
+ * to the server in batches.
  */
-$('.update-wish').on('click', function (event) {
-    event.stopPropagation();
-
-    const wish_id = $(event.target).attr('for-wish');
-    const new_status = $(event.target).attr('new-status');
-    const url = `/application/update_wish/${wish_id}/${new_status}/`;
+const FLUSH_DELAY = 2000;
+const FLUSH_SIZE = 20;
 
-    $.getJSON(url, function(data) {
-        if (data['status'] == 'ok') {
-            const applicant = data['applicant'];
-            const elem = $(`#wish-${wish_id}`);
-            elem.find('.update-wish').hide();
+const applicants_table = $('#applicants');
+const pending_transitions = new Map();
+let flush_timeout = null;
 
-            // Update buttons
-            if (new_status == 1)
-                elem.find('.update-wish:not([new-status="1"])').show();
-            else
-                elem.find('.update-wish[new-status="1"]').show();
+function flushTransitions() {
+    clearTimeout(flush_timeout);
+    flush_timeout = null;
 
-            // Update badge
-            elem.find('.badge').hide();
-            elem.find(`.badge[status=${new_status}]`).show();
+    if (pending_transitions.size == 0)
+        return;
 
-            // Update applicant status
-            $(`#applicant-${applicant} .applicant-status`).text(data['applicant-status']);
+    const transitions = Array.from(pending_transitions, ([wish, status]) => ({
+        'wish': wish,
+        'status': status
+    }));
+    pending_transitions.clear();
 
-            // Update acceptables counter
-            $(".acceptables-counter").text(data['nb_acceptable_applicants']);
-        }
-        else {
+    fetch(applicants_table.attr('data-update-url'), {
+        method: 'POST',
+        credentials: 'same-origin',
+        keepalive: true,
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': $('[name=csrfmiddlewaretoken]').val()
+        },
+        body: JSON.stringify({'transitions': transitions})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data['status'] != 'ok') {
             console.error('error:', data);
+            alert('Failed to save decisions, please reload the page.');
+            return;
         }
-    })
-})
 
+        // Update applicants status
+        for (const [applicant, status] of Object.entries(data['applicants']))
+            $(`#applicant-${applicant} .applicant-status`).text(status);
+
+        // Update acceptables counter
+        const counters = data['events'][applicants_table.attr('data-event')];
+        if (counters !== undefined)
+            $(".acceptables-counter").text(counters['selected']);
+    });
+}
+
+function updateWish(wish_id, new_status) {
+    const elem = $(`#wish-${wish_id}`);
+    elem.find('.update-wish').hide();
+
+    // Update buttons
+    if (new_status == 1)
+        elem.find('.update-wish:not([new-status="1"])').show();
+    else
+        elem.find('.update-wish[new-status="1"]').show();
+
+    // Update badge
+    elem.find('.badge').hide();
+    elem.find(`.badge[status=${new_status}]`).show();
+
+    // Queue the transition
+    pending_transitions.set(parseInt(wish_id), parseInt(new_status));
+
+    if (pending_transitions.size >= FLUSH_SIZE)
+        flushTransitions();
+    else if (flush_timeout === null)
+        flush_timeout = setTimeout(flushTransitions, FLUSH_DELAY);
+}
+
+$('.update-wish').on('click', function (event) {
+    event.stopPropagation();
+    updateWish(
+        $(event.target).attr('for-wish'), $(event.target).attr('new-status')
+    );
+});
+
+/**
+ * Decide for the wish of the expanded applicant with the keyboard
+ */
+const DECISION_KEYS = {'s': 3, 'r': 2, 'c': 1};
+
+document.addEventListener('keydown', (event) => {
+    if (!(event.key in DECISION_KEYS))
+        return;
+
+    const action = $('.highlighted:visible .update-wish:visible')
+        .filter(`[new-status="${DECISION_KEYS[event.key]}"]`);
+
+    if (action.length == 1)
+        updateWish(action.attr('for-wish'), action.attr('new-status'));
+});
+
+/**
+ * Don't lose queued decisions when leaving the page
+ */
+window.addEventListener('pagehide', flushTransitions);
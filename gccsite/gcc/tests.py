@@ -0,0 +1,1813 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import csv
+import gc
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+
+from centers.models import Center
+import centers.urls
+import gcc.urls
+import users.urls
+from gcc import mailing, profiling, staff_views
+from gcc.admin import FormAdmin
+from gcc.export import export_queryset_as_csv
+from gcc.factories import next_user_id, seed_edition
+from gcc.forms import (
+    ApplicationWishesForm,
+    build_dynamic_form,
+    compile_form,
+)
+from gcc.page_cache import CSRF_PLACEHOLDER
+from gcc.models import (
+    Answer,
+    AnswerTypes,
+    Applicant,
+    ApplicantLabel,
+    ApplicantStatusTypes,
+    Corrector,
+    Edition,
+    Event,
+    EventWish,
+    Form,
+    MailJobStatusTypes,
+    Question,
+    QuestionForForm,
+    SignupWindow,
+    Sponsor,
+    signup_window,
+)
+from gccsite.settings.common import CacheSetting
+from prologin.models import Gender
+from prologin.utils import cached
+from prologin.utils.cache import (
+    cache_key,
+    cache_result,
+    invalidate,
+    prologin_cache,
+)
+from prologin.utils.markdown import markdown_pool, render
+from prologin.utils.markdown import scoreboard as scoreboard_markdown
+from prologin.utils.scoring import Scoreboard, decorate_with_rank
+
+
+class WithEditionMixin:
+    """
+    Create an edition with a signup form and a single event, and provide
+    helpers to fill it with applicants.
+    """
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+
+        self.form = Form.objects.create(name="signup")
+        self.questions = [
+            Question.objects.create(
+                question="Question {}".format(i),
+                response_type=AnswerTypes.string.value,
+            )
+            for i in range(3)
+        ]
+        for question in self.questions:
+            QuestionForForm.objects.create(question=question, form=self.form)
+
+        self.edition = Edition.objects.create(
+            year=now.year, signup_form=self.form
+        )
+        self.center = Center.objects.create(
+            name="Prologin", type=Center.Type.center.value
+        )
+        self.event = Event.objects.create(
+            center=self.center,
+            edition=self.edition,
+            event_start=now + timedelta(days=30),
+            event_end=now + timedelta(days=35),
+            signup_start=now - timedelta(days=1),
+            signup_end=now + timedelta(days=10),
+            signup_form=self.form,
+        )
+        self.labels = [
+            ApplicantLabel.objects.create(display="label {}".format(i))
+            for i in range(2)
+        ]
+        self.corrector = get_user_model().objects.create_user(
+            id=1, username='corrector', email='corrector@example.org'
+        )
+        Corrector.objects.create(event=self.event, user=self.corrector)
+
+    def create_applicants(self, count, event=None, status=None):
+        event = event or self.event
+        status = status or ApplicantStatusTypes.pending.value
+        first_id = get_user_model().objects.count() + 1000
+        applicants = []
+
+        for i in range(first_id, first_id + count):
+            user = get_user_model().objects.create_user(
+                id=i,
+                username='applicant{}'.format(i),
+                email='applicant{}@example.org'.format(i),
+                first_name='First{}'.format(i),
+                last_name='Last{}'.format(i),
+            )
+            applicant = Applicant.objects.create(
+                user=user, edition=self.edition
+            )
+            applicant.labels.set(self.labels)
+            EventWish.objects.create(
+                applicant=applicant, event=event, status=status, order=1
+            )
+            for question in self.questions:
+                Answer.objects.create(
+                    applicant=applicant, question=question, response='yes'
+                )
+            applicants.append(applicant)
+
+        return applicants
+
+
+class ApplicationReviewTest(WithEditionMixin, TestCase):
+    def get_review_context(self):
+        request = RequestFactory().get('/')
+        request.user = self.corrector
+        view = staff_views.ApplicationReviewView()
+        view.setup(request, edition=self.edition.year, event=self.event.pk)
+        context = view.get_context_data(**view.kwargs)
+
+        # Force evaluation of everything the template reads
+        for order, applicants in context['grouped_applicants']:
+            for applicant in applicants:
+                list(applicant.eventwish_set.all())
+                list(applicant.labels.all())
+                for answer in applicant.answers.all():
+                    str(answer)
+
+        return context
+
+    def test_grouping(self):
+        self.create_applicants(3)
+        other = self.create_applicants(2)
+        EventWish.objects.filter(applicant__in=other).update(order=2)
+
+        grouped = self.get_review_context()['grouped_applicants']
+        self.assertEqual([order for order, _ in grouped], [1, 2])
+        self.assertEqual([len(group) for _, group in grouped], [3, 2])
+
+    def test_counters(self):
+        self.create_applicants(2, status=ApplicantStatusTypes.selected.value)
+        self.create_applicants(1, status=ApplicantStatusTypes.confirmed.value)
+
+        context = self.get_review_context()
+        self.assertEqual(context['nb_acceptables'], 2)
+        self.assertEqual(context['nb_accepted'], 0)
+        self.assertEqual(context['nb_confirmed'], 1)
+
+    def test_constant_query_count(self):
+        # event, wishes, wishes of each applicant, answers, questions, labels
+        # and status counters
+        for count in (1, 20):
+            self.create_applicants(count)
+            with self.assertNumQueries(7):
+                self.get_review_context()
+
+
+class ApplicationPagesTest(WithEditionMixin, TestCase):
+    def test_accept_constant_query_count(self):
+        self.client.force_login(self.corrector)
+        url = reverse('gcc:accept_all', kwargs={'event': self.event.pk})
+        query_counts = []
+        total = 0
+
+        for count in (1, 20):
+            self.create_applicants(
+                count, status=ApplicantStatusTypes.selected.value
+            )
+            total += count
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(response.context['applicants']), total)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_summary_constant_query_count(self):
+        applicant = self.create_applicants(1)[0]
+        self.client.force_login(applicant.user)
+        url = reverse(
+            'gcc:application_summary', kwargs={'pk': applicant.user.pk}
+        )
+        query_counts = []
+
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            query_counts.append(len(queries))
+
+            # More answers and wishes for the second request
+            for i in range(5):
+                Answer.objects.create(
+                    applicant=applicant,
+                    question=Question.objects.create(
+                        question="Extra {}".format(i),
+                        response_type=AnswerTypes.string.value,
+                    ),
+                    response='yes',
+                )
+                EventWish.objects.create(
+                    applicant=applicant,
+                    event=Event.objects.create(
+                        center=self.center,
+                        edition=self.edition,
+                        event_start=self.event.event_start,
+                        event_end=self.event.event_end,
+                        signup_start=self.event.signup_start,
+                        signup_end=self.event.signup_end,
+                    ),
+                    order=i + 2,
+                )
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+
+class SignupWindowTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.window = SignupWindow()
+
+    def test_cached(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.window.edition(), self.edition)
+            self.assertEqual(self.window.open_events(), (self.event,))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.window.edition(), self.edition)
+            self.assertEqual(
+                self.window.open_events(self.edition.pk), (self.event,)
+            )
+
+    def test_expiry(self):
+        self.assertEqual(self.window.get().expires, self.event.signup_end)
+
+        later = self.event.signup_end + timedelta(seconds=1)
+
+        with mock.patch('gcc.models.timezone.now', return_value=later):
+            self.assertEqual(self.window.open_events(), ())
+            self.assertIsNone(self.window.get().expires)
+
+    def test_invalidation(self):
+        self.assertEqual(self.window.open_events(), (self.event,))
+
+        self.event.signup_end = timezone.now() - timedelta(days=1)
+        self.event.save()
+        self.assertEqual(self.window.open_events(), ())
+        self.assertFalse(self.edition.subscription_is_open())
+
+        edition = Edition.objects.create(
+            year=self.edition.year + 1, signup_form=self.form
+        )
+        self.assertEqual(self.window.edition(), edition)
+
+
+class PageCacheTest(WithEditionMixin, TestCase):
+    def test_anonymous_page_cache(self):
+        url = reverse('gcc:index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+
+        self.assertEqual(cached.status_code, 200)
+        self.assertContains(cached, 'name="csrfmiddlewaretoken"')
+        self.assertNotContains(cached, CSRF_PLACEHOLDER.decode())
+
+        # Pages are cached per language
+        with self.assertNumQueries(0):
+            self.client.get(url, HTTP_ACCEPT_LANGUAGE='fr')
+        self.assertNumQueriesGreater(
+            lambda: self.client.get(url, HTTP_ACCEPT_LANGUAGE='en')
+        )
+
+    def test_purge(self):
+        url = reverse('gcc:index')
+        self.client.get(url)
+        Sponsor.objects.create(name="ACME Corp", is_active=True)
+        response = self.assertNumQueriesGreater(lambda: self.client.get(url))
+        self.assertContains(response, "ACME Corp")
+
+    def test_signup_boundary(self):
+        url = reverse('gcc:index')
+        now = timezone.now()
+        Event.objects.filter(pk=self.event.pk).update(
+            signup_end=now + timedelta(minutes=5)
+        )
+        Center.objects.filter(pk=self.center.pk).update(name="Closing soon")
+        SignupWindow.invalidate()
+        self.assertContains(self.client.get(url), "Closing soon")
+
+        with mock.patch(
+            'django.utils.timezone.now',
+            return_value=now + timedelta(minutes=10),
+        ):
+            response = self.assertNumQueriesGreater(
+                lambda: self.client.get(url)
+            )
+        self.assertNotContains(response, "Closing soon")
+
+    def test_session_bypass(self):
+        url = reverse('gcc:index')
+        self.client.get(url)
+        self.client.force_login(self.corrector)
+        self.assertNumQueriesGreater(lambda: self.client.get(url))
+
+    def assertNumQueriesGreater(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+
+        self.assertGreater(len(queries), 0)
+        return result
+
+
+@override_settings(
+    PROLOGIN_CACHES={
+        'answer': CacheSetting('answer.{question}', 60),
+        'forever': CacheSetting('forever', None),
+    }
+)
+class CachedTest(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        @cache_result('answer')
+        def answer(question, falsy=False):
+            self.calls.append(question)
+            return None if falsy else len(self.calls)
+
+        self.answer = answer
+        self.answer.invalidate()
+
+    def test_key_templating(self):
+        self.assertEqual(self.answer('life'), 1)
+        self.assertEqual(self.answer('universe'), 2)
+        self.assertEqual(self.answer(question='life'), 1)
+        self.assertEqual(self.calls, ['life', 'universe'])
+
+    def test_falsy_values(self):
+        self.assertIsNone(self.answer('nothing', falsy=True))
+        self.assertIsNone(self.answer('nothing', falsy=True))
+        self.assertEqual(self.calls, ['nothing'])
+
+    def test_invalidate(self):
+        self.assertEqual(self.answer('life'), 1)
+        self.answer.invalidate()
+        self.assertEqual(self.answer('life'), 2)
+
+    def test_early_refresh(self):
+        self.answer('life')
+        key = cache_key('answer', question='life')
+        later = time.time() + 59
+
+        with mock.patch('prologin.utils.cache.time.time', return_value=later):
+            # Another process is already refreshing the value
+            prologin_cache().add(key + '.lock', True)
+            self.assertEqual(self.answer('life'), 1)
+
+            prologin_cache().delete(key + '.lock')
+            self.assertEqual(self.answer('life'), 2)
+
+    @mock.patch('prologin.utils.cache.WAIT_TIMEOUT', 0.1)
+    def test_stampede(self):
+        key = cache_key('answer', question='life')
+        prologin_cache().add(key + '.lock', True)
+
+        # The value is computed anyway if the lock holder takes too long,
+        # but the lock of the other process is kept
+        self.assertEqual(self.answer('life'), 1)
+        self.assertTrue(prologin_cache().get(key + '.lock'))
+
+    def test_lock_released(self):
+        key = cache_key('answer', question='life')
+        self.answer('life')
+        self.assertIsNone(prologin_cache().get(key + '.lock'))
+
+    def test_legacy_call(self):
+        invalidate('forever')
+        self.assertEqual(cached(lambda: 42, 'forever'), 42)
+        self.assertEqual(cached(lambda: 0, 'forever'), 42)
+
+
+class MarkdownPoolTest(TestCase):
+    def setUp(self):
+        markdown_pool.clear()
+
+    def test_engines_are_reused(self):
+        with markdown_pool.engine('default') as md:
+            pass
+        with markdown_pool.engine('default') as other:
+            self.assertIs(other, md)
+        with markdown_pool.engine('nofollow') as other:
+            self.assertIsNot(other, md)
+
+    def test_state_is_reset(self):
+        self.assertIn(
+            'href="https://prologin.org"',
+            render('[site][ref]\n\n[ref]: https://prologin.org'),
+        )
+        # The references of the previous document don't leak
+        self.assertEqual(render('[site][ref]'), '<p>[site][ref]</p>')
+
+    def test_nested_documents(self):
+        with markdown_pool.engine('default') as md:
+            self.assertEqual(render('*nested*'), '<p><em>nested</em></p>')
+            self.assertEqual(
+                md.convert('**outer**'), '<p><strong>outer</strong></p>'
+            )
+
+    def test_nofollow(self):
+        html = render(
+            '[site](https://prologin.org) <https://gcc.prologin.org>',
+            engine='nofollow',
+        )
+        self.assertEqual(html.count('rel="nofollow"'), 2)
+        self.assertNotIn('nofollow', render('[site](https://prologin.org)'))
+
+
+class ScoreboardTest(TestCase):
+    def setUp(self):
+        self.scoreboard = Scoreboard(
+            {'name': name, 'score': score}
+            for name, score in (('a', 9), ('b', 7), ('c', 7), ('d', 5))
+        )
+
+    def ranks(self, entries):
+        return [
+            (entry.item['name'], entry.rank, entry.ex_aequo, entry.nonlinear)
+            for entry in entries
+        ]
+
+    def test_ranks(self):
+        self.assertEqual(
+            self.ranks(self.scoreboard),
+            [
+                ('a', 1, False, False),
+                ('b', 2, False, False),
+                ('c', 2, True, True),
+                ('d', 4, False, True),
+            ],
+        )
+
+    def test_slices(self):
+        self.assertEqual(
+            [entry.item['name'] for entry in self.scoreboard[:2]], ['a', 'b']
+        )
+        self.assertEqual(
+            self.ranks(self.scoreboard[3:]),
+            [
+                ('c', 2, True, True),
+                ('d', 4, False, True),
+            ],
+        )
+        self.assertEqual(len(self.scoreboard[3:10]), 2)
+        self.assertEqual(list(self.scoreboard[5:]), [])
+
+    def test_reentrant_iteration(self):
+        first = iter(self.scoreboard)
+        next(first)
+        self.assertEqual(len(list(self.scoreboard)), 4)
+        self.assertEqual(next(first).item['name'], 'b')
+
+    def test_rank(self):
+        self.assertEqual(
+            [self.scoreboard.rank(score) for score in (10, 9, 8, 7, 5, 0)],
+            [1, 1, 2, 2, 4, 5],
+        )
+
+    def test_insert(self):
+        self.scoreboard.insert({'name': 'e', 'score': 7})
+        self.scoreboard.insert({'name': 'f', 'score': 8})
+        self.assertEqual(
+            [(entry.item['name'], entry.rank) for entry in self.scoreboard],
+            [('a', 1), ('f', 2), ('b', 3), ('c', 3), ('e', 3), ('d', 6)],
+        )
+
+    def test_decorate_with_rank(self):
+        ranks = []
+        decorate_with_rank(
+            [3, 2, 2], lambda score: score, lambda *args: ranks.append(args)
+        )
+        self.assertEqual(ranks, [(3, 1, False), (2, 2, False), (2, 2, True)])
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'OPTIONS': {
+                'loaders': [
+                    (
+                        'django.template.loaders.locmem.Loader',
+                        {
+                            'archives/inline-scoreboard.html': (
+                                '<ol>{% for entry in scoreboard %}'
+                                '<li>{{ entry.rank }} {{ entry.item.name }}'
+                                '</li>{% endfor %}</ol>'
+                            )
+                        },
+                    )
+                ]
+            },
+        }
+    ]
+)
+class ScoreboardMarkdownTest(TestCase):
+    def setUp(self):
+        scoreboard_markdown.fragment_cache.clear()
+        self.scoreboard = Scoreboard(
+            [{'name': '*a*', 'score': 3}, {'name': 'b', 'score': 2}]
+        )
+
+    def render(self):
+        return render(
+            '{% scoreboard before 1 %}\n\ntext\n\n{% scoreboard %}',
+            engine='scoreboard',
+            scoreboard=self.scoreboard,
+        )
+
+    def test_fragments_are_cached(self):
+        with mock.patch.object(
+            scoreboard_markdown,
+            'render_fragment',
+            wraps=scoreboard_markdown.render_fragment,
+        ) as render_fragment:
+            html = self.render()
+            self.assertEqual(self.render(), html)
+            self.assertEqual(render_fragment.call_count, 2)
+
+            self.scoreboard.insert({'name': 'c', 'score': 1})
+            self.assertIn('<li>3 c</li>', self.render())
+            self.assertEqual(render_fragment.call_count, 4)
+
+    def test_shared_scoreboard(self):
+        with mock.patch.object(
+            scoreboard_markdown,
+            'render_fragment',
+            wraps=scoreboard_markdown.render_fragment,
+        ) as render_fragment:
+            first = render(
+                'first\n\n{% scoreboard %}',
+                engine='scoreboard',
+                scoreboard=self.scoreboard,
+            )
+            second = render(
+                'second\n\n{% scoreboard %}',
+                engine='scoreboard',
+                scoreboard=self.scoreboard,
+            )
+            # The second document is a cache hit
+            self.assertEqual(render_fragment.call_count, 1)
+            self.assertEqual(first.replace('first', 'second'), second)
+
+    def test_plain_ranking_is_not_shared(self):
+        ranking = self.scoreboard.items
+        with mock.patch.object(
+            scoreboard_markdown,
+            'render_fragment',
+            wraps=scoreboard_markdown.render_fragment,
+        ) as render_fragment:
+            for _ in range(2):
+                render(
+                    '{% scoreboard %}\n\n{% scoreboard %}',
+                    engine='scoreboard',
+                    scoreboard=ranking,
+                )
+            # Reused within a document only
+            self.assertEqual(render_fragment.call_count, 2)
+
+    def test_fragments(self):
+        html = self.render()
+        self.assertEqual(html.count('<div class="scoreboard">'), 2)
+        # The rendered names are not Markdown
+        self.assertIn('<li>1 *a*</li>', html)
+        self.assertIn('<li>2 b</li>', html)
+
+    def test_plain_ranking(self):
+        html = render(
+            '{% scoreboard after 1 %}',
+            engine='scoreboard',
+            scoreboard=self.scoreboard.items,
+        )
+        self.assertNotIn('*a*', html)
+        self.assertIn('<li>2 b</li>', html)
+
+
+class ApplicantStatusTest(WithEditionMixin, TestCase):
+    def assertStatus(self, applicant, status):
+        applicant.refresh_from_db()
+        self.assertEqual(applicant.status, status)
+        self.assertEqual(applicant.compute_status(), status)
+
+    def test_status_follows_wishes(self):
+        applicant = self.create_applicants(1)[0]
+        self.assertStatus(applicant, ApplicantStatusTypes.pending.value)
+
+        wish = applicant.eventwish_set.get()
+        wish.status = ApplicantStatusTypes.selected.value
+        wish.save()
+        self.assertEqual(
+            wish.applicant.status, ApplicantStatusTypes.selected.value
+        )
+        self.assertStatus(applicant, ApplicantStatusTypes.selected.value)
+
+        wish.delete()
+        self.assertStatus(applicant, ApplicantStatusTypes.incomplete.value)
+
+    def test_bulk_update(self):
+        applicants = self.create_applicants(3)
+        EventWish.objects.filter(applicant__in=applicants[:2]).update(
+            status=ApplicantStatusTypes.rejected.value
+        )
+
+        self.assertStatus(applicants[0], ApplicantStatusTypes.rejected.value)
+        self.assertStatus(applicants[1], ApplicantStatusTypes.rejected.value)
+        self.assertStatus(applicants[2], ApplicantStatusTypes.pending.value)
+        self.assertEqual(
+            Applicant.objects.filter(
+                status=ApplicantStatusTypes.rejected.value
+            ).count(),
+            2,
+        )
+
+    def test_check_and_backfill(self):
+        applicants = self.create_applicants(2)
+        Applicant.objects.filter(pk=applicants[0].pk).update(
+            status=ApplicantStatusTypes.confirmed.value
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('applicant_status', 'check')
+
+        call_command('applicant_status', 'backfill')
+        call_command('applicant_status', 'check')
+        self.assertStatus(applicants[0], ApplicantStatusTypes.pending.value)
+
+
+class ParticipationsTest(WithEditionMixin, TestCase):
+    def assertParticipations(self, user, count):
+        user.refresh_from_db()
+        self.assertEqual(user.participations_count, count)
+        self.assertEqual(
+            get_user_model()
+            .objects.with_participations()
+            .get(pk=user.pk)
+            .participations,
+            count,
+        )
+
+    def test_counter_follows_confirmation(self):
+        applicant = self.create_applicants(1)[0]
+        user = applicant.user
+        self.assertParticipations(user, 0)
+
+        wish = applicant.eventwish_set.get()
+        wish.status = ApplicantStatusTypes.confirmed.value
+        wish.save()
+        self.assertParticipations(user, 1)
+
+        wish.status = ApplicantStatusTypes.accepted.value
+        wish.save()
+        self.assertParticipations(user, 0)
+
+        EventWish.objects.filter(pk=wish.pk).update(
+            status=ApplicantStatusTypes.confirmed.value
+        )
+        self.assertParticipations(user, 1)
+
+        applicant.delete()
+        self.assertParticipations(user, 0)
+
+    def test_users_without_applicant(self):
+        self.assertParticipations(self.corrector, 0)
+
+
+class CompleteApplicationTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.applicants = self.create_applicants(3)
+        get_user_model().objects.filter(applicant__in=self.applicants).update(
+            address="1 rue de la Paix",
+            city="Paris",
+            country="France",
+            postal_code="75000",
+            gender=Gender.female.value,
+            birthday=date(2004, 1, 1),
+            phone="0123456789",
+        )
+
+        # The second applicant misses a required answer, the third one only
+        # misses an optional answer
+        Answer.objects.filter(
+            applicant=self.applicants[1], question=self.questions[0]
+        ).delete()
+        Question.objects.filter(pk=self.questions[1].pk).update(
+            finaly_required=False
+        )
+        Answer.objects.filter(
+            applicant=self.applicants[2], question=self.questions[1]
+        ).delete()
+        self.expected = {
+            self.applicants[0].pk: True,
+            self.applicants[1].pk: False,
+            self.applicants[2].pk: True,
+        }
+
+    def test_complete_application(self):
+        for applicant in Applicant.objects.all():
+            self.assertEqual(
+                applicant.has_complete_application(),
+                self.expected[applicant.pk],
+            )
+
+    def test_prefetched_answers(self):
+        applicants = Applicant.objects.select_related('user').prefetch_related(
+            'answers'
+        )
+
+        with self.assertNumQueries(2 + len(self.applicants)):
+            for applicant in applicants:
+                self.assertEqual(
+                    applicant.has_complete_application(),
+                    self.expected[applicant.pk],
+                )
+
+    def test_bulk(self):
+        self.create_applicants(10)
+
+        with self.assertNumQueries(3):
+            complete = Applicant.objects.complete_application()
+
+        for pk, expected in self.expected.items():
+            self.assertEqual(complete[pk], expected)
+
+        # Users created by create_applicants have an incomplete profile
+        self.assertEqual(sum(complete.values()), 2)
+
+
+class DynamicFormTest(WithEditionMixin, TestCase):
+    def test_compiled_once(self):
+        form_class = compile_form(self.form)
+        self.assertEqual(
+            list(form_class.base_fields),
+            [
+                form_class.question_field_name(question.pk)
+                for question in self.questions
+            ],
+        )
+
+        with self.assertNumQueries(0):
+            self.assertIs(compile_form(self.form), form_class)
+
+    def test_invalidation(self):
+        form_class = compile_form(self.form)
+        question = self.questions[0]
+        question.question = "Changed"
+        question.save()
+
+        compiled = compile_form(self.form)
+        self.assertIsNot(compiled, form_class)
+        field_name = compiled.question_field_name(question.pk)
+        # Questions are required by default, see Question.__str__
+        self.assertEqual(compiled.base_fields[field_name].label, "Changed (*)")
+
+        FormAdmin(Form, admin.site).after_sorting()
+        self.assertIsNot(compile_form(self.form), compiled)
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            },
+            'forms': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'forms',
+            },
+        },
+        GCC_FORMS_CACHE_ALIAS='forms',
+    )
+    def test_forms_cache_alias(self):
+        form_class = compile_form(self.form)
+        caches['default'].clear()
+        self.assertIs(compile_form(self.form), form_class)
+
+        caches['forms'].clear()
+        self.assertIsNot(compile_form(self.form), form_class)
+
+    def test_save_locks_applicant(self):
+        applicant = self.create_applicants(1)[0]
+        form_class = build_dynamic_form(
+            self.form, applicant.user, self.edition
+        )
+        form = form_class(
+            {
+                compile_form(self.form).question_field_name(question.pk): 'new'
+                for question in self.questions
+            }
+        )
+        self.assertTrue(form.is_valid())
+
+        with CaptureQueriesContext(connection) as queries:
+            form.save()
+
+        self.assertTrue(
+            any(
+                query['sql'].startswith('SELECT "gcc_applicant"')
+                and query['sql'].endswith('FOR UPDATE')
+                for query in queries
+            )
+        )
+
+    def test_initial_and_save(self):
+        applicant = self.create_applicants(1)[0]
+        Answer.objects.filter(
+            applicant=applicant, question=self.questions[0]
+        ).delete()
+        form_class = build_dynamic_form(
+            self.form, applicant.user, self.edition
+        )
+
+        with self.assertNumQueries(1):
+            form = form_class(instance=applicant.user)
+
+        names = [
+            form.question_field_name(question.pk)
+            for question in self.questions
+        ]
+        self.assertNotIn(names[0], form.initial)
+        self.assertEqual(form.initial[names[1]], 'yes')
+
+        form = form_class(
+            {names[0]: 'new', names[1]: 'no', names[2]: 'yes'},
+            instance=applicant.user,
+        )
+        self.assertTrue(form.is_valid())
+        form.save()
+
+        self.assertEqual(
+            dict(applicant.answers.values_list('question_id', 'response')),
+            {
+                self.questions[0].pk: 'new',
+                self.questions[1].pk: 'no',
+                self.questions[2].pk: 'yes',
+            },
+        )
+
+
+class ExportTest(WithEditionMixin, TestCase):
+    def export(self):
+        response = export_queryset_as_csv(Applicant.objects.all(), 'export')
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_export_content(self):
+        applicants = self.create_applicants(2)
+        Answer.objects.filter(
+            applicant=applicants[1], question=self.questions[0]
+        ).delete()
+
+        header, *rows = self.export()
+        self.assertEqual(
+            header[6:], [str(question) for question in self.questions]
+        )
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][0], applicants[0].user.username)
+        self.assertEqual(rows[0][5], 'label 0, label 1')
+        self.assertEqual(rows[0][6:], ['yes', 'yes', 'yes'])
+        self.assertEqual(rows[1][6:], ['(empty)', 'yes', 'yes'])
+
+    def test_constant_query_count(self):
+        # columns, applicants and answers
+        for count in (1, 20):
+            self.create_applicants(count)
+            with self.assertNumQueries(3):
+                self.export()
+
+
+@override_settings(
+    DJMAIL_REAL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+)
+@mock.patch('gcc.mailing.attachment_bundles.get', return_value=[])
+class AcceptanceMailTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.parent_question = Question.objects.create(
+            question="Parent's email", response_type=AnswerTypes.string.value
+        )
+        patcher = mock.patch(
+            'gcc.mailing.PARENT_EMAIL_QUESTION', self.parent_question.pk
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_selected(self, count):
+        applicants = self.create_applicants(
+            count, status=ApplicantStatusTypes.selected.value
+        )
+        for applicant in applicants:
+            Answer.objects.create(
+                applicant=applicant,
+                question=self.parent_question,
+                response='parent@example.org',
+            )
+        return applicants
+
+    def test_enqueue(self, attachments):
+        self.create_selected(3)
+        self.assertEqual(mailing.enqueue_acceptance_mails(self.event), 3)
+        self.assertEqual(mailing.enqueue_acceptance_mails(self.event), 0)
+        self.assertEqual(
+            mailing.acceptance_progress(self.event),
+            {'pending': 3, 'sent': 0, 'failed': 0, 'cancelled': 0},
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_delivery(self, attachments):
+        applicants = self.create_selected(3)
+        mailing.enqueue_acceptance_mails(self.event)
+
+        self.assertEqual(mailing.send_acceptance_mails(), (3, 0, 0))
+        self.assertEqual(mailing.send_acceptance_mails(), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(
+            mailing.acceptance_progress(self.event),
+            {'pending': 0, 'sent': 3, 'failed': 0, 'cancelled': 0},
+        )
+        for applicant in applicants:
+            applicant.refresh_from_db()
+            self.assertEqual(
+                applicant.status, ApplicantStatusTypes.accepted.value
+            )
+
+    def test_retry(self, attachments):
+        applicant = self.create_applicants(
+            1, status=ApplicantStatusTypes.selected.value
+        )[0]
+        mailing.enqueue_acceptance_mails(self.event)
+
+        self.assertEqual(mailing.send_acceptance_mails(), (0, 1, 0))
+        job = applicant.eventwish_set.get().acceptance_mails.get()
+        self.assertEqual(job.status, MailJobStatusTypes.pending.value)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt, timezone.now())
+
+        # The job is not due yet and the wish is not accepted
+        self.assertEqual(mailing.send_acceptance_mails(), (0, 0, 0))
+        applicant.refresh_from_db()
+        self.assertEqual(applicant.status, ApplicantStatusTypes.selected.value)
+
+    def test_wish_changed_after_enqueue(self, attachments):
+        applicants = self.create_selected(2)
+        mailing.enqueue_acceptance_mails(self.event)
+        EventWish.objects.filter(applicant=applicants[0]).update(
+            status=ApplicantStatusTypes.rejected.value
+        )
+
+        self.assertEqual(mailing.send_acceptance_mails(), (1, 0, 1))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            mailing.acceptance_progress(self.event),
+            {'pending': 0, 'sent': 1, 'failed': 0, 'cancelled': 1},
+        )
+        self.assertEqual(
+            EventWish.objects.get(applicant=applicants[0]).status,
+            ApplicantStatusTypes.rejected.value,
+        )
+        self.assertEqual(
+            EventWish.objects.get(applicant=applicants[1]).status,
+            ApplicantStatusTypes.accepted.value,
+        )
+
+    def test_command_after_cancelled_batch(self, attachments):
+        applicants = self.create_selected(2)
+        mailing.enqueue_acceptance_mails(self.event)
+        EventWish.objects.filter(applicant=applicants[0]).update(
+            status=ApplicantStatusTypes.rejected.value
+        )
+        stdout = io.StringIO()
+
+        # The first batch only holds the cancelled job
+        call_command(
+            'acceptance_mails', once=True, batch_size=1, stdout=stdout
+        )
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            mailing.acceptance_progress(self.event),
+            {'pending': 0, 'sent': 1, 'failed': 0, 'cancelled': 1},
+        )
+        self.assertIn("0 mails sent, 0 failed, 1 cancelled", stdout.getvalue())
+
+
+class AttachmentBundlesTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        settings_override = override_settings(STATIC_ROOT=static_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = os.path.join(static_root.name, 'gcc', 'attachments')
+        os.makedirs(self.directory)
+        self.bundles = mailing.AttachmentBundles(max_size=1024)
+
+    def write_attachments(self, event, content=b'%PDF-1.4'):
+        slug = self.bundles.event_slug(event)
+        paths = []
+
+        for name in mailing.ATTACHMENTS:
+            path = os.path.join(self.directory, '{}-{}.pdf'.format(name, slug))
+            with open(path, 'wb') as attachment:
+                attachment.write(content)
+            paths.append(path)
+
+        return paths
+
+    def test_check(self):
+        self.assertEqual(
+            len(self.bundles.check(self.event)), len(mailing.ATTACHMENTS)
+        )
+
+        paths = self.write_attachments(self.event, content=b'not a pdf')
+        self.assertIn('invalid PDF', self.bundles.check(self.event)[0])
+
+        for path in paths[1:]:
+            os.remove(path)
+        self.assertEqual(len(self.bundles.check(self.event)), 4)
+
+        self.write_attachments(self.event)
+        self.assertEqual(self.bundles.check(self.event), [])
+
+    def test_cache(self):
+        paths = self.write_attachments(self.event)
+        attachments = self.bundles.get(self.event)
+        self.assertEqual(len(attachments), len(mailing.ATTACHMENTS))
+
+        # The bundle is not read again from the disk
+        for path in paths:
+            os.remove(path)
+        self.assertEqual(self.bundles.get(self.event), attachments)
+
+    def test_size_limit(self):
+        self.write_attachments(self.event, content=b'%PDF-' + b'x' * 200)
+        self.bundles.get(self.event)
+        self.assertEqual(len(self.bundles.bundles), 1)
+
+        other = Event.objects.create(
+            center=self.center,
+            edition=self.edition,
+            event_start=self.event.event_start + timedelta(days=7),
+            event_end=self.event.event_end + timedelta(days=7),
+            signup_start=self.event.signup_start,
+            signup_end=self.event.signup_end,
+        )
+        self.write_attachments(other, content=b'%PDF-' + b'x' * 200)
+        self.bundles.get(other)
+        self.assertEqual(
+            list(self.bundles.bundles), [self.bundles.event_slug(other)]
+        )
+        self.assertLessEqual(self.bundles.size, self.bundles.max_size)
+
+
+class UpdateWishesTest(WithEditionMixin, TestCase):
+    def post_transitions(self, transitions):
+        response = self.client.post(
+            reverse('gcc:update_wishes'),
+            json.dumps(
+                {
+                    'transitions': [
+                        {'wish': wish.pk, 'status': status}
+                        for wish, status in transitions
+                    ]
+                }
+            ),
+            content_type='application/json',
+        )
+        return response.json()
+
+    def test_batch(self):
+        self.client.force_login(self.corrector)
+        wishes = [
+            applicant.eventwish_set.get()
+            for applicant in self.create_applicants(3)
+        ]
+
+        data = self.post_transitions(
+            [
+                (wishes[0], ApplicantStatusTypes.selected.value),
+                (wishes[1], ApplicantStatusTypes.selected.value),
+                (wishes[2], ApplicantStatusTypes.rejected.value),
+            ]
+        )
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(data['events'][str(self.event.pk)]['selected'], 2)
+        self.assertEqual(data['events'][str(self.event.pk)]['rejected'], 1)
+        self.assertEqual(
+            data['applicants'][str(wishes[2].applicant_id)], 'rejected'
+        )
+        self.assertEqual(
+            Applicant.objects.filter(
+                status=ApplicantStatusTypes.selected.value
+            ).count(),
+            2,
+        )
+
+    def test_permission(self):
+        other_event = Event.objects.create(
+            center=self.center,
+            edition=self.edition,
+            event_start=self.event.event_start,
+            event_end=self.event.event_end,
+            signup_start=self.event.signup_start,
+            signup_end=self.event.signup_end,
+        )
+        allowed = self.create_applicants(1)[0].eventwish_set.get()
+        forbidden = self.create_applicants(1, event=other_event)[0]
+        forbidden = forbidden.eventwish_set.get()
+        self.client.force_login(self.corrector)
+
+        data = self.post_transitions(
+            [
+                (allowed, ApplicantStatusTypes.selected.value),
+                (forbidden, ApplicantStatusTypes.selected.value),
+            ]
+        )
+        self.assertEqual(data['status'], 'error')
+        allowed.refresh_from_db()
+        self.assertEqual(allowed.status, ApplicantStatusTypes.pending.value)
+
+        # Superusers are granted every permission, as in UpdateWish
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                id=2,
+                username='staff',
+                email='staff@example.org',
+                password=None,
+            )
+        )
+        data = self.post_transitions(
+            [(forbidden, ApplicantStatusTypes.selected.value)]
+        )
+        self.assertEqual(data['status'], 'ok')
+
+    def test_constant_query_count(self):
+        self.client.force_login(self.corrector)
+        query_counts = []
+
+        for count in (1, 20):
+            wishes = [
+                applicant.eventwish_set.get()
+                for applicant in self.create_applicants(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.post_transitions(
+                    [
+                        (wish, ApplicantStatusTypes.selected.value)
+                        for wish in wishes
+                    ]
+                )
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+
+class RulesTest(WithEditionMixin, TestCase):
+    def test_constant_query_count(self):
+        for count in (1, 20):
+            applicants = self.create_applicants(count)
+            wishes = list(
+                EventWish.objects.filter(applicant__in=applicants)
+                .select_related('event')
+                .prefetch_related('applicant__eventwish_set')
+            )
+            user = get_user_model().objects.get(pk=self.corrector.pk)
+
+            # Only the events of the corrector are loaded
+            with self.assertNumQueries(1):
+                for wish in wishes:
+                    self.assertTrue(user.has_perm('gcc.can_accept_wish', wish))
+                    self.assertTrue(
+                        user.has_perm(
+                            'gcc.can_edit_application_labels', wish.applicant
+                        )
+                    )
+                    self.assertTrue(
+                        user.has_perm('gcc.can_review_event', wish.event)
+                    )
+
+    def test_invalidation(self):
+        wish = self.create_applicants(1)[0].eventwish_set.get()
+        user = get_user_model().objects.get(pk=self.corrector.pk)
+        self.assertTrue(user.has_perm('gcc.can_accept_wish', wish))
+
+        Corrector.objects.filter(user=self.corrector).delete()
+        self.assertFalse(user.has_perm('gcc.can_accept_wish', wish))
+
+        Corrector.objects.create(event=self.event, user=self.corrector)
+        self.assertTrue(user.has_perm('gcc.can_accept_wish', wish))
+
+
+@override_settings(GCC_PROFILING_SAMPLE_RATE=1, GCC_PROFILING_FLUSH_INTERVAL=0)
+class ProfilingTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        profiling.reset_profiling()
+        self.staff = get_user_model().objects.create_user(
+            id=2, username='staff', email='staff@example.org', is_staff=True
+        )
+
+    def get_profile(self, view):
+        return next(
+            profile for profile in profiling.collect() if profile.view == view
+        )
+
+    def test_sampling(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('gcc:application_review_index'))
+        profile = self.get_profile('gcc:application_review_index')
+
+        self.assertEqual(profile.samples, 1)
+        self.assertGreater(profile.queries.max, 0)
+        self.assertGreater(profile.template_time.max, 0)
+
+        with override_settings(GCC_PROFILING_SAMPLE_RATE=0):
+            self.client.get(reverse('gcc:application_review_index'))
+
+        profile = self.get_profile('gcc:application_review_index')
+        self.assertEqual(profile.samples, 1)
+
+    def test_repeated_queries(self):
+        profile = profiling.RequestProfile()
+
+        with connection.execute_wrapper(profile):
+            for _ in range(3):
+                list(Event.objects.all())
+
+            Edition.objects.count()
+
+        profile.stop()
+        profiling.profiler.record('test', profile)
+        call_sites = self.get_profile('test').call_sites
+
+        self.assertEqual(len(call_sites), 1)
+        self.assertEqual(call_sites[0].count, 3)
+        self.assertTrue(call_sites[0].site.startswith('gcc/tests.py:'))
+
+    def test_dashboard(self):
+        self.client.get(reverse('gcc:privacy'))
+        self.client.force_login(self.corrector)
+        response = self.client.get(reverse('gcc:profiling'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('gcc:profiling'))
+        self.assertContains(response, 'gcc:privacy')
+
+    def test_command(self):
+        self.client.get(reverse('gcc:privacy'))
+        out = io.StringIO()
+        call_command('profiling', 'show', stdout=out)
+        self.assertIn('gcc:privacy (1 samples)', out.getvalue())
+
+        call_command('profiling', 'reset', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('profiling', 'show', stdout=out)
+        self.assertIn('No request was profiled yet.', out.getvalue())
+
+
+QUERY_BUDGETS_PATH = os.path.join(
+    os.path.dirname(__file__), 'query_budgets.json'
+)
+
+
+def url_names(urlpatterns, namespace):
+    """
+    List the names of the views of an URLconf, the included applications
+    (eg. the admin) excepted.
+    """
+    names = set()
+
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver) and pattern.namespace is None:
+            names |= url_names(pattern.url_patterns, namespace)
+        elif isinstance(pattern, URLPattern):
+            names.add('{}:{}'.format(namespace, pattern.name))
+
+    return names
+
+
+@override_settings(GCC_PROFILING_SAMPLE_RATE=0)
+class QueryBudgetTest(TestCase):
+    """
+    Compare the query count and wall time of every view of gcc, users and
+    centers to the budgets stored in query_budgets.json, on a realistic
+    edition. Views are requested as anonymous, applicant, corrector and staff
+    users.
+
+    Run with GCC_UPDATE_QUERY_BUDGETS=1 to record the current measurements
+    as the new budgets, views without a budget are skipped.
+    """
+
+    applicants = 2000
+    # The wall time depends on the machine, only large regressions fail
+    time_tolerance = 3
+    # Milliseconds added to each time budget, for the fastest views
+    time_slack = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed_edition(applicants=cls.applicants)
+        # Without statistics on the seeded rows, the planner takes the tables
+        # for empty and the measured plans are nothing like production's
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.applicant = (
+            Applicant.objects.filter(
+                edition=cls.seeded.edition,
+                status=ApplicantStatusTypes.incomplete.value,
+            )
+            .select_related('user')
+            .order_by('pk')
+            .first()
+        )
+        cls.wish = cls.applicant.eventwish_set.order_by('order').first()
+        cls.corrector = Corrector.objects.get(event=cls.wish.event).user
+        cls.staff = get_user_model().objects.create_superuser(
+            id=next_user_id(),
+            username='staff',
+            email='staff@example.org',
+            password=None,
+        )
+
+    def roles(self):
+        return [
+            ('anonymous', None),
+            ('applicant', self.applicant.user),
+            ('corrector', self.corrector),
+            ('staff', self.staff),
+        ]
+
+    def cases(self):
+        """
+        List the requests as (name, url, method, data), each name starts with
+        the name of the requested view.
+        """
+        user = self.applicant.user
+        year = self.seeded.edition.year
+        event = self.wish.event
+        label = self.seeded.labels[0]
+        selected = ApplicantStatusTypes.selected.value
+        applicants_url = reverse('admin:gcc_applicant_changelist')
+        events_url = reverse('admin:gcc_event_changelist')
+
+        return [
+            ('gcc:index', reverse('gcc:index'), 'get', None),
+            ('gcc:learn_more', reverse('gcc:learn_more'), 'get', None),
+            ('gcc:resources', reverse('gcc:resources'), 'get', None),
+            ('gcc:privacy', reverse('gcc:privacy'), 'get', None),
+            ('gcc:editions', reverse('gcc:editions'), 'get', None),
+            (
+                'gcc:editions year',
+                reverse('gcc:editions', args=[year]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:news_unsubscribe',
+                reverse('gcc:news_unsubscribe', args=[user.email, 'invalid']),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_review_index',
+                reverse('gcc:application_review_index'),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_review',
+                reverse('gcc:application_review', args=[year, event.pk]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_validation',
+                reverse('gcc:application_validation', args=[user.pk, year]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_form',
+                reverse('gcc:application_form', args=[year]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_wishes',
+                reverse('gcc:application_wishes', args=[year]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:application_summary',
+                reverse('gcc:application_summary', args=[user.pk]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:confirm',
+                reverse('gcc:confirm', args=[self.wish.pk]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:delete_applicant_label',
+                reverse(
+                    'gcc:delete_applicant_label',
+                    args=[event.pk, self.applicant.pk, label.pk],
+                ),
+                'get',
+                None,
+            ),
+            (
+                'gcc:add_applicant_label',
+                reverse(
+                    'gcc:add_applicant_label',
+                    args=[event.pk, self.applicant.pk, label.pk],
+                ),
+                'get',
+                None,
+            ),
+            (
+                'gcc:update_wish',
+                reverse('gcc:update_wish', args=[self.wish.pk, selected]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:update_wishes',
+                reverse('gcc:update_wishes'),
+                'post',
+                json.dumps(
+                    {
+                        'transitions': [
+                            {'wish': wish.pk, 'status': selected}
+                            for wish in EventWish.objects.filter(event=event)[
+                                :50
+                            ]
+                        ]
+                    }
+                ),
+            ),
+            (
+                'gcc:accept_all',
+                reverse('gcc:accept_all', args=[event.pk]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:accept_all_send',
+                reverse('gcc:accept_all_send', args=[event.pk]),
+                'get',
+                None,
+            ),
+            (
+                'gcc:accept_progress',
+                reverse('gcc:accept_progress', args=[event.pk]),
+                'get',
+                None,
+            ),
+            ('gcc:profiling', reverse('gcc:profiling'), 'get', None),
+            (
+                'users:profile',
+                reverse('users:profile', args=[user.pk]),
+                'get',
+                None,
+            ),
+            ('users:edit', reverse('users:edit', args=[user.pk]), 'get', None),
+            ('users:logout', reverse('users:logout'), 'post', {}),
+            ('centers:map', reverse('centers:map'), 'get', None),
+            ('centers:geojson', reverse('centers:geojson'), 'get', None),
+            (
+                'centers:nearest',
+                reverse('centers:nearest'),
+                'get',
+                {'lat': 45.76, 'lng': 4.84},
+            ),
+            ('admin applicants', applicants_url, 'get', None),
+            (
+                'admin applicants export_as_csv',
+                applicants_url,
+                'post',
+                {
+                    'action': 'export_as_csv',
+                    '_selected_action': self.seeded.applicants,
+                },
+            ),
+            ('admin events', events_url, 'get', None),
+        ] + [
+            (
+                'admin events ' + action,
+                events_url,
+                'post',
+                {
+                    'action': action,
+                    '_selected_action': [
+                        event.pk for event in self.seeded.events
+                    ],
+                },
+            )
+            for action in (
+                'incomplete_export_as_csv',
+                'pending_export_as_csv',
+                'accepted_and_confirmed_export_as_csv',
+                'rejected_export_as_csv',
+            )
+        ]
+
+    def measure(self, user, method, url, data):
+        """
+        Request a page with a cold cache and roll back the changes it made,
+        get its query count and wall time in milliseconds.
+        """
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+
+        caches['default'].clear()
+        kwargs = {}
+
+        if isinstance(data, str):
+            kwargs['content_type'] = 'application/json'
+
+        # Like timeit, keep collections of the seeded objects out of the time
+        gc.collect()
+        gc.disable()
+
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = getattr(self.client, method)(
+                        url, data, **kwargs
+                    )
+
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+
+                    duration = (time.perf_counter() - start) * 1000
+
+                transaction.set_rollback(True)
+        finally:
+            gc.enable()
+
+        self.assertLess(response.status_code, 500)
+        return len(queries), duration
+
+    def test_every_view_has_a_case(self):
+        names = (
+            url_names(gcc.urls.urlpatterns, 'gcc')
+            | url_names(users.urls.urlpatterns, 'users')
+            | url_names(centers.urls.urlpatterns, 'centers')
+        )
+        self.assertEqual(
+            names - {name.split()[0] for name, *_ in self.cases()}, set()
+        )
+
+    def test_query_budgets(self):
+        update = os.environ.get('GCC_UPDATE_QUERY_BUDGETS')
+
+        with open(QUERY_BUDGETS_PATH) as f:
+            budgets = json.load(f)
+
+        for name, url, method, data in self.cases():
+            for role, user in self.roles():
+                key = '{} ({})'.format(name, role)
+
+                with self.subTest(key):
+                    queries, duration = self.measure(user, method, url, data)
+                    budget = budgets.get(key)
+
+                    if update:
+                        budgets[key] = {
+                            'queries': queries,
+                            'time': round(duration, 1),
+                        }
+                        continue
+
+                    if budget is None:
+                        self.skipTest("no budget for " + key)
+
+                    self.assertLessEqual(
+                        queries, budget['queries'], "query count regression"
+                    )
+                    self.assertLessEqual(
+                        duration,
+                        budget['time'] * self.time_tolerance + self.time_slack,
+                        "wall time regression",
+                    )
+
+        if update:
+            with open(QUERY_BUDGETS_PATH, 'w') as f:
+                json.dump(budgets, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+
+class SeedTest(TestCase):
+    def test_seed(self):
+        call_command(
+            'seed',
+            editions=2,
+            applicants=30,
+            returning=0.2,
+            force=True,
+            stdout=io.StringIO(),
+        )
+        first, last = Edition.objects.order_by('year')
+
+        self.assertEqual(Applicant.objects.filter(edition=last).count(), 30)
+        self.assertEqual(Applicant.objects.inconsistent_status(), [])
+        self.assertEqual(
+            get_user_model()
+            .objects.filter(applicant__edition=first)
+            .filter(applicant__edition=last)
+            .count(),
+            6,
+        )
+        self.assertEqual(
+            Answer.objects.filter(applicant__edition=last).count(),
+            30 * Question.objects.filter(form=last.signup_form).count(),
+        )
+
+    def test_refuse_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('seed', stdout=io.StringIO())
+
+
+class IndexTest(TestCase):
+    """
+    Check that the planner uses the indexes of the hot queries on a seeded
+    edition. Sequential scans are disabled since the tables are too small
+    for the planner to prefer an index on its own.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed_edition(applicants=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE gcc_event, gcc_eventwish, gcc_applicant')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+
+    def test_wishes_by_event_and_status(self):
+        self.assertUsesIndex(
+            EventWish.objects.filter(
+                event=self.seeded.events[0],
+                status=ApplicantStatusTypes.selected.value,
+            ),
+            'eventwish_event_status_idx',
+        )
+
+    def test_active_wishes(self):
+        # No plan is checked: an applicant has at most three wishes, so the
+        # indexes starting with applicant_id cost the same to the planner and
+        # its choice flips with the statistics. Check that the partial index
+        # covers the query of Applicant.has_non_rejected_choices instead.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexdef FROM pg_indexes WHERE indexname = %s',
+                ['eventwish_active_idx'],
+            )
+            (definition,) = cursor.fetchone()
+
+        self.assertIn('(applicant_id, status)', definition)
+        self.assertIn(
+            'WHERE (NOT (status = {}))'.format(
+                ApplicantStatusTypes.rejected.value
+            ),
+            definition,
+        )
+
+    def test_open_events(self):
+        now = timezone.now()
+        self.assertUsesIndex(
+            Event.objects.filter(
+                edition=self.seeded.edition,
+                signup_start__lt=now,
+                signup_end__gt=now,
+            ),
+            'event_signup_idx',
+        )
+
+
+class ApplicationWishesFormTest(WithEditionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_event = Event.objects.create(
+            center=self.center,
+            edition=self.edition,
+            event_start=self.event.event_start + timedelta(days=7),
+            event_end=self.event.event_end + timedelta(days=7),
+            signup_start=self.event.signup_start,
+            signup_end=self.event.signup_end,
+            signup_form=self.form,
+        )
+        self.user = get_user_model().objects.create_user(
+            id=2, username='applicant', email='applicant@example.org'
+        )
+        signup_window.get()
+
+    def wishes_form(self, *priorities):
+        data = {
+            'priority{}'.format(i): priority
+            for i, priority in enumerate(priorities, 1)
+        }
+        return ApplicationWishesForm(self.edition, self.user, data)
+
+    def test_choices_exclude_tried_events(self):
+        applicant = Applicant.objects.create(
+            user=self.user, edition=self.edition
+        )
+        EventWish.objects.create(
+            applicant=applicant,
+            event=self.event,
+            status=ApplicantStatusTypes.rejected.value,
+        )
+
+        with self.assertNumQueries(1):
+            choices = self.wishes_form().fields['priority1'].choices
+
+        self.assertEqual(
+            [pk for pk, _ in choices], [None, self.other_event.pk]
+        )
+
+    def test_save(self):
+        form = self.wishes_form(self.other_event.pk, self.other_event.pk, '')
+        self.assertTrue(form.is_valid())
+        form.save(self.user, self.edition)
+
+        form = self.wishes_form(
+            self.event.pk, self.other_event.pk, self.event.pk
+        )
+        self.assertTrue(form.is_valid())
+        form.save(self.user, self.edition)
+
+        applicant = Applicant.objects.get(user=self.user)
+        self.assertEqual(
+            list(applicant.eventwish_set.values_list('event', 'order')),
+            [(self.event.pk, 1), (self.other_event.pk, 2)],
+        )
+
+    def test_locked_application(self):
+        form = self.wishes_form(self.event.pk)
+        self.assertTrue(form.is_valid())
+        form.save(self.user, self.edition)
+        EventWish.objects.update(status=ApplicantStatusTypes.pending.value)
+
+        with self.assertRaises(Applicant.AlreadyLocked):
+            form.save(self.user, self.edition)
+
+        self.assertEqual(EventWish.objects.count(), 1)
+
+    def test_deleted_event(self):
+        form = self.wishes_form(self.event.pk, self.other_event.pk)
+        self.assertTrue(form.is_valid())
+        self.other_event.delete()
+
+        with self.assertRaises(ValidationError):
+            form.save(self.user, self.edition)
+
+        self.assertFalse(EventWish.objects.exists())
@@ -67,6 +67,11 @@ APPLICATION_PATTERNS = [
         staff_views.UpdateWish.as_view(),
         name='update_wish',
     ),
+    path(
+        'update_wishes/',
+        staff_views.UpdateWishes.as_view(),
+        name='update_wishes',
+    ),
     path(
         'accept_all/<int:event>/',
         staff_views.ApplicationAcceptView.as_view(),
@@ -77,6 +82,11 @@ APPLICATION_PATTERNS = [
         staff_views.ApplicationAcceptSendView.as_view(),
         name='accept_all_send',
     ),
+    path(
+        'accept_progress/<int:event>/',
+        staff_views.ApplicationAcceptProgressView.as_view(),
+        name='accept_progress',
+    ),
 ]
 
 urlpatterns = [
@@ -90,6 +100,7 @@ urlpatterns = [
     path(
         'editions/<int:year>/', views.EditionsView.as_view(), name='editions'
     ),
+    path('profiling/', staff_views.ProfilingView.as_view(), name='profiling'),
     # Admin panel
     path('admin/', admin.site.urls),
 ]
@@ -1,11 +1,10 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
-import random
-from datetime import datetime
-
 from django.conf import settings
 from django.contrib import auth, messages
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
 from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
@@ -20,15 +19,17 @@ from gcc.forms import (
     EmailForm,
 )
 from gcc.models import (
+    Answer,
     Applicant,
     ApplicantStatusTypes,
     Edition,
-    Event,
     EventWish,
     Sponsor,
     SubscriberEmail,
+    signup_window,
 )
 from prologin.email import send_email
+from prologin.utils import LoginRequiredMixin
 from rules.contrib.views import PermissionRequiredMixin
 from zinnia.models import Entry
 
@@ -84,17 +85,12 @@ class IndexView(FormView):
         ]
         context.update(
             {
-                'last_edition': Edition.objects.latest(),
-                'sponsors': list(Sponsor.objects.active()),
+                'last_edition': signup_window.edition(),
+                'events': signup_window.open_events(),
+                'sponsors': Sponsor.objects.active().order_by('name'),
                 'articles': articles,
             }
         )
-        context['events'] = Event.objects.filter(
-            signup_start__lt=datetime.now(),
-            signup_end__gt=datetime.now(),
-            edition=context['last_edition'],
-        ).order_by('event_start')
-        random.shuffle(context['sponsors'])
         return context
 
 
@@ -112,15 +108,11 @@ class LearnMoreView(TemplateView):
         context = super().get_context_data(**kwargs)
         context.update(
             {
-                'last_edition': Edition.objects.latest(),
+                'last_edition': signup_window.edition(),
+                'events': signup_window.open_events(),
                 'SITE_HOST': settings.SITE_HOST,
             }
         )
-        context['events'] = Event.objects.filter(
-            signup_start__lt=datetime.now(),
-            signup_end__gt=datetime.now(),
-            edition=context['last_edition'],
-        ).order_by('event_start')
         return context
 
 
@@ -171,13 +163,26 @@ class ApplicationSummaryView(PermissionRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         shown_user = context[self.context_object_name]
+        current_edition = signup_window.edition()
+        # Everything the template reads, whatever the number of answers
+        applicants = Applicant.objects.select_related(
+            'user', 'edition'
+        ).prefetch_related(
+            Prefetch(
+                'answers', queryset=Answer.objects.select_related('question')
+            ),
+            Prefetch(
+                'eventwish_set',
+                queryset=EventWish.objects.select_related('event__center'),
+            ),
+        )
 
         context.update(
             {
                 'shown_user': shown_user,
-                'current_edition': Edition.current(),
-                'applicant': get_object_or_404(Applicant, user=shown_user),
-                'has_applied_to_current': Edition.current().user_has_applied(
+                'current_edition': current_edition,
+                'applicant': get_object_or_404(applicants, user=shown_user),
+                'has_applied_to_current': current_edition.user_has_applied(
                     shown_user
                 ),
             }
@@ -251,15 +256,12 @@ class ApplicationValidationView(PermissionRequiredMixin, DetailView):
         )
 
 
-class ApplicationFormView(FormView):
+class ApplicationFormView(LoginRequiredMixin, FormView):
     template_name = 'gcc/application/form.html'
     form_class = CombinedApplicantUserForm
 
     def dispatch(self, request, *args, **kwargs):
         # Redirect if already validated for this year.
-        if request.user.is_anonymous:
-            return super().dispatch(request, *args, **kwargs)
-
         edition = get_object_or_404(Edition, year=kwargs['edition'])
         applicant = Applicant.for_user_and_edition(self.request.user, edition)
 
@@ -318,7 +320,9 @@ class ApplicationFormView(FormView):
         return super().form_valid(form)
 
 
-class ApplicationWishesView(FormView, PermissionRequiredMixin):
+class ApplicationWishesView(
+    LoginRequiredMixin, FormView, PermissionRequiredMixin
+):
     template_name = 'gcc/application/wishes.html'
     form_class = ApplicationWishesForm
     permission_required = 'gcc.can_edit_own_application'
@@ -364,16 +368,18 @@ class ApplicationWishesView(FormView, PermissionRequiredMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['events'] = Event.objects.filter(
-            signup_start__lt=datetime.now(),
-            signup_end__gt=datetime.now(),
-            edition=self.kwargs['edition'],
-        ).order_by('event_start')
+        context['events'] = signup_window.open_events(self.kwargs['edition'])
         return context
 
     def form_valid(self, form):
         edition = get_object_or_404(Edition, year=self.kwargs['edition'])
-        form.save(self.request.user, edition)
+
+        try:
+            form.save(self.request.user, edition)
+        except ValidationError as error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
+
         return super().form_valid(form)
 
 
@@ -0,0 +1,109 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import time
+
+import markdown
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from prologin.utils.markdown import render
+
+# A short document with the usual syntax of news entries and user content
+SAMPLE = '''
+# Girls Can Code!
+
+The **summer camps** of [Prologin](https://prologin.org) are open for
+signup, see the [list of centers][centers] or <https://gcc.prologin.org>.
+
+* Learn to *code* in Python
+* Meet other girls
+
+Contact us at <info@prologin.org>.
+
+[centers]: https://gcc.prologin.org/centers/
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the time to convert Markdown documents with a new engine "
+        "per document and with the pooled engines of "
+        "prologin.utils.markdown."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            default=list(settings.PROLOGIN_MARKDOWN_ENGINES),
+            help="engines of PROLOGIN_MARKDOWN_ENGINES to measure",
+        )
+        parser.add_argument(
+            '--documents',
+            type=int,
+            default=2000,
+            help="number of converted documents",
+        )
+        parser.add_argument(
+            '--file', help="converted document (default: a short sample)"
+        )
+
+    def measure(self, convert, text, count):
+        convert(text)
+        start = time.perf_counter()
+
+        for _ in range(count):
+            convert(text)
+
+        return (time.perf_counter() - start) / count
+
+    def handle(self, *args, **options):
+        unknown = set(options['engines']) - set(
+            settings.PROLOGIN_MARKDOWN_ENGINES
+        )
+
+        if unknown:
+            raise CommandError(
+                "unknown engines: {}".format(', '.join(sorted(unknown)))
+            )
+
+        if options['file']:
+            with open(options['file']) as f:
+                text = f.read()
+        else:
+            text = SAMPLE
+
+        count = options['documents']
+        self.stdout.write(
+            "{:<12} {:>10} {:>10} {:>10} {:>8}".format(
+                'engine', 'setup', 'new', 'pooled', 'saved'
+            )
+        )
+
+        for name in options['engines']:
+            extensions = settings.PROLOGIN_MARKDOWN_ENGINES[name]
+            setup = self.measure(
+                lambda text: markdown.Markdown(extensions=extensions),
+                text,
+                count,
+            )
+            new = self.measure(
+                lambda text: markdown.markdown(text, extensions=extensions),
+                text,
+                count,
+            )
+            pooled = self.measure(
+                lambda text: render(text, engine=name), text, count
+            )
+            self.stdout.write(
+                "{:<12} {:>10.1f} {:>10.1f} {:>10.1f} {:>8.1%}".format(
+                    name,
+                    setup * 1000000,
+                    new * 1000000,
+                    pooled * 1000000,
+                    (new - pooled) / new,
+                )
+            )
+
+        self.stdout.write("Times are in microseconds per document.")
@@ -0,0 +1,135 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import os
+import random
+import tempfile
+import time
+
+import markdown
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from prologin.utils.markdown.scoreboard import (
+    ScoreboardExtension,
+    ScoreboardProcessor,
+    fragment_cache,
+)
+from prologin.utils.scoring import Scoreboard
+
+# Stand-in for the template of the archives, which is not part of this site
+TEMPLATE = '''<table class="table">
+{% for entry in scoreboard %}<tr{% if entry.nonlinear %} class="nonlinear"{% endif %}>
+<td>{% if not entry.ex_aequo %}{{ entry.rank }}{% endif %}</td>
+<td>{{ entry.item.name }}</td>
+<td>{{ entry.item.score }}</td>
+</tr>{% endfor %}
+</table>'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the time to convert Markdown documents with many scoreboard "
+        "blocks with and without the cache of scoreboard fragments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--blocks',
+            type=int,
+            default=50,
+            help="number of scoreboard blocks per document",
+        )
+        parser.add_argument(
+            '--documents',
+            type=int,
+            default=50,
+            help="number of converted documents",
+        )
+        parser.add_argument(
+            '--size', type=int, default=100, help="size of the scoreboard"
+        )
+
+    def document(self, rng, blocks, size):
+        paragraphs = []
+
+        for _ in range(blocks):
+            paragraphs.append("Some *text* about the contest.")
+            paragraphs.append(
+                '{{% scoreboard {} {} %}}'.format(
+                    rng.choice(('before', 'after')), rng.randrange(size // 10)
+                )
+            )
+
+        return '\n\n'.join(paragraphs)
+
+    def measure(self, md, documents, clear):
+        start = time.perf_counter()
+
+        for text in documents:
+            if clear:
+                fragment_cache.clear()
+            md.reset()
+            md.convert(text)
+
+        return (time.perf_counter() - start) / len(documents)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        scoreboard = Scoreboard(
+            sorted(
+                (
+                    {'name': 'Team {}'.format(i), 'score': rng.randrange(50)}
+                    for i in range(options['size'])
+                ),
+                key=lambda item: -item['score'],
+            )
+        )
+        documents = [
+            self.document(rng, options['blocks'], options['size'])
+            for _ in range(options['documents'])
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, ScoreboardProcessor.TEMPLATE_NAME)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(TEMPLATE)
+
+            templates = [
+                {
+                    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                    'DIRS': [directory],
+                }
+            ]
+
+            with override_settings(TEMPLATES=templates):
+                results = [
+                    (
+                        name,
+                        self.measure(
+                            markdown.Markdown(
+                                extensions=[
+                                    ScoreboardExtension(
+                                        scoreboard=scoreboard, cache=cache
+                                    )
+                                ]
+                            ),
+                            documents,
+                            clear,
+                        ),
+                    )
+                    for name, cache, clear in (
+                        ('uncached', False, False),
+                        ('cold cache', True, True),
+                        ('warm cache', True, False),
+                    )
+                ]
+
+        baseline = results[0][1]
+        for name, duration in results:
+            self.stdout.write(
+                "{:<12} {:>10.2f} ms per document {:>8.1%}".format(
+                    name, duration * 1000, (baseline - duration) / baseline
+                )
+            )
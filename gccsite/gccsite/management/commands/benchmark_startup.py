@@ -0,0 +1,151 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from gccsite.settings.common import with_dev_apps
+
+# Boot a WSGI worker in a fresh interpreter and print the time it took, the
+# development applications listed in argv are enabled before the setup
+STARTUP_SCRIPT = '''
+import sys
+import time
+
+start = time.perf_counter()
+
+from django.conf import settings
+from gccsite.settings.common import with_dev_apps
+
+settings.INSTALLED_APPS, settings.MIDDLEWARE = with_dev_apps(
+    tuple(settings.INSTALLED_APPS), tuple(settings.MIDDLEWARE), *sys.argv[1:]
+)
+
+from django.core.wsgi import get_wsgi_application
+
+get_wsgi_application()
+print(time.perf_counter() - start)
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the startup and per-request overhead of the development "
+        "applications (see DEV_APPS) with the current settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apps',
+            nargs='+',
+            default=list(settings.DEV_APPS),
+            help="development applications to measure",
+        )
+        parser.add_argument(
+            '--startups',
+            type=int,
+            default=5,
+            help="number of measured worker startups",
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help="number of measured requests",
+        )
+        parser.add_argument(
+            '--path', help="path of the requested page (default: privacy)"
+        )
+
+    def startup_time(self, apps, count):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        times = []
+
+        for _ in range(count):
+            result = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT, *apps],
+                cwd=settings.BASE_DIR,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+
+            if result.returncode != 0:
+                raise CommandError(result.stderr)
+
+            times.append(float(result.stdout.split()[-1]))
+
+        return statistics.median(times)
+
+    def request_time(self, path, count):
+        client = Client()
+        client.get(path)
+        start = time.perf_counter()
+
+        for _ in range(count):
+            client.get(path)
+
+        return (time.perf_counter() - start) / count
+
+    def report(self, name, without, with_apps, unit, scale):
+        self.stdout.write(
+            "{:<10} without: {:8.2f}{unit}  with: {:8.2f}{unit}  "
+            "saved: {:8.2f}{unit} ({:.1%})".format(
+                name,
+                without * scale,
+                with_apps * scale,
+                (with_apps - without) * scale,
+                (with_apps - without) / with_apps,
+                unit=unit,
+            )
+        )
+
+    def handle(self, *args, **options):
+        apps = options['apps']
+        unknown = set(apps) - set(settings.DEV_APPS)
+
+        if unknown:
+            raise CommandError(
+                "unknown development apps: {}".format(', '.join(unknown))
+            )
+
+        installed = [app for app in apps if app in settings.INSTALLED_APPS]
+
+        if installed:
+            raise CommandError(
+                "already enabled by the settings: {}".format(
+                    ', '.join(installed)
+                )
+            )
+
+        path = options['path'] or reverse('gcc:privacy')
+
+        self.stdout.write("Measuring {}".format(', '.join(apps)))
+        self.report(
+            "startup",
+            self.startup_time([], options['startups']),
+            self.startup_time(apps, options['startups']),
+            'ms',
+            1000,
+        )
+
+        # The per-request overhead comes from the middlewares, which run on
+        # every request even if they are disabled by DEBUG = False
+        _, middleware = with_dev_apps((), tuple(settings.MIDDLEWARE), *apps)
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            without = self.request_time(path, options['requests'])
+
+            with override_settings(MIDDLEWARE=middleware):
+                with_apps = self.request_time(path, options['requests'])
+
+        self.report("request", without, with_apps, 'µs', 1000000)
@@ -61,12 +61,10 @@ INSTALLED_APPS = (
     # Django and vendor, at the bottom for template overriding
     'django.contrib.admin',
     'zinnia',
-    # Debug Toolbar (will not load if DEBUG = False)
-    'debug_toolbar',
 )
 
 MIDDLEWARE = (
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'gcc.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -76,6 +74,7 @@ MIDDLEWARE = (
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'proloauth_client.middleware.RefreshTokenMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'gcc.page_cache.AnonymousPageCacheMiddleware',
 )
 
 TEMPLATES = [
@@ -122,6 +121,44 @@ FORMAT_MODULE_PATH = ['formats']
 
 USE_TZ = True
 
+# Caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gccsite',
+    }
+}
+
+# Public pages served from the cache to anonymous visitors, the cache is
+# purged whenever their content changes, see gcc.page_cache
+GCC_PAGE_CACHE_ALIAS = 'default'
+GCC_PAGE_CACHE_TIMEOUT = 60 * 60
+GCC_PAGE_CACHE_VIEWS = (
+    'gcc:index',
+    'gcc:learn_more',
+    'gcc:resources',
+    'gcc:privacy',
+    'gcc:editions',
+    'zinnia',
+)
+
+# Cache of the invalidation token of the signup forms compiled by each process,
+# see gcc.forms.compile_form. It must be shared by all the workers (as in
+# prod.sample.py), or changes to the questions only reach the worker which
+# saved them.
+GCC_FORMS_CACHE_ALIAS = 'default'
+
+# Sampling profiler of the views, see gcc.profiling. The samples of each
+# process are flushed to the cache every GCC_PROFILING_FLUSH_INTERVAL seconds
+GCC_PROFILING_SAMPLE_RATE = 0.01
+GCC_PROFILING_CACHE_ALIAS = 'default'
+GCC_PROFILING_FLUSH_INTERVAL = 60
+GCC_PROFILING_RETENTION = 7 * 24 * 60 * 60
+# Samples kept per view and process
+GCC_PROFILING_MAX_SAMPLES = 1000
+GCC_PROFILING_TOP_CALL_SITES = 5
+
 # Emails
 
 DJMAIL_BODY_TEMPLATE_PROTOTYPE = "{name}.body.{type}.{ext}"
@@ -129,6 +166,26 @@ DJMAIL_SUBJECT_TEMPLATE_PROTOTYPE = "{name}.subject.{ext}"
 DJMAIL_REAL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_BACKEND = "djmail.backends.default.EmailBackend"
 
+# Acceptance mails queue, failed deliveries are retried after
+# GCC_ACCEPTANCE_MAIL_RETRY_DELAY seconds, doubled after each attempt
+GCC_ACCEPTANCE_MAIL_MAX_ATTEMPTS = 5
+GCC_ACCEPTANCE_MAIL_RETRY_DELAY = 60
+# Maximum size of the in-memory cache of acceptance mails attachments (bytes)
+GCC_ACCEPTANCE_ATTACHMENTS_CACHE_SIZE = 64 * 1024 * 1024
+
+# Geocoding of the centers, see centers.geocoding. Use
+# centers.geocoding.OfflineBackend to geocode without network access
+CENTERS_GEOCODING_BACKEND = 'centers.geocoding.GeopyBackend'
+CENTERS_GEOCODING_OPTIONS = {'service': 'google'}
+CENTERS_GEOCODING_SUFFIX = ', FRANCE'
+# Threads of the worker and requests per second to the geocoder, per process
+CENTERS_GEOCODING_CONCURRENCY = 4
+CENTERS_GEOCODING_RATE_LIMIT = 10
+# Failed jobs are retried after CENTERS_GEOCODING_RETRY_DELAY seconds, doubled
+# after each attempt
+CENTERS_GEOCODING_MAX_ATTEMPTS = 3
+CENTERS_GEOCODING_RETRY_DELAY = 60
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.7/howto/static-files/
@@ -175,8 +232,43 @@ ARCHIVES_REPOSITORY_STATIC_PREFIX = 'archives'
 OAUTH_ENDPOINT = 'https://prologin.org/user/auth'
 OAUTH_CLIENT_ID = 'gcc'
 
-# Cache durations and keys
+# Cache durations and keys, see prologin.utils.cache
 CacheSetting = namedtuple('CacheSetting', 'key duration')
+PROLOGIN_CACHE_ALIAS = 'default'
+PROLOGIN_CACHES = {}
+
+# Extensions of the pooled Markdown engines, see prologin.utils.markdown
+PROLOGIN_MARKDOWN_ENGINES = {
+    'default': [],
+    # News entries, see news.rendering
+    'news': [],
+    # Content written by users, whose links are not endorsed
+    'nofollow': ['prologin.utils.markdown.nofollow'],
+    'scoreboard': ['prologin.utils.markdown.scoreboard'],
+}
+
+
+# Development applications, they are not installed by default and have to be
+# enabled by the settings with with_dev_apps(). Each application is mapped to
+# the middlewares it needs, which are placed at the top of MIDDLEWARE.
+DEV_APPS = {
+    'debug_toolbar': ('debug_toolbar.middleware.DebugToolbarMiddleware',)
+}
+
+
+def with_dev_apps(installed_apps, middleware, *apps):
+    """
+    Add development applications and their middlewares to the settings, eg.
+
+        INSTALLED_APPS, MIDDLEWARE = with_dev_apps(
+            INSTALLED_APPS, MIDDLEWARE, 'debug_toolbar'
+        )
+    """
+    for app in apps:
+        installed_apps += (app,)
+        middleware = DEV_APPS[app] + middleware
+
+    return installed_apps, middleware
 
 
 # Debug toolbar
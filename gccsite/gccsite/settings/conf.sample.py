@@ -15,6 +15,11 @@ SESSION_COOKIE_NAME = 'sessionid_gcc'
 ALLOWED_HOSTS = ['127.0.0.1', '::1', 'localhost', 'testserver']
 INTERNAL_IPS = ALLOWED_HOSTS
 
+# Development applications, see DEV_APPS
+INSTALLED_APPS, MIDDLEWARE = with_dev_apps(
+    INSTALLED_APPS, MIDDLEWARE, 'debug_toolbar'
+)
+
 SITE_HOST = "localhost:8001"
 
 # Repository paths
@@ -59,3 +64,8 @@ EMAIL_USE_SSL = False
 
 RECAPTCHA_PUBLIC_KEY = ''
 RECAPTCHA_PRIVATE_KEY = ''
+
+
+# Geocoding of the centers, without network access
+
+CENTERS_GEOCODING_BACKEND = 'centers.geocoding.OfflineBackend'
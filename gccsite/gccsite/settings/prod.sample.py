@@ -0,0 +1,48 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+# Production settings, to be copied to prod.py which is used by gccsite.wsgi.
+# Development applications such as the debug toolbar are not installed, see
+# DEV_APPS in common.py.
+
+from .common import *
+
+# You can use $ pwgen -y 64
+SECRET_KEY = 'CHANGEME'
+
+DEBUG = False
+
+ALLOWED_HOSTS = [SITE_HOST]
+
+# OAuth client
+OAUTH_SECRET = 'CHANGEME'
+
+# Database, connections are kept open between requests
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': 'gcc',
+        'CONN_MAX_AGE': 60,
+    }
+}
+
+# The cache is shared by all the workers, so that invalidations (eg. of the
+# anonymous pages cache or of the compiled signup forms) reach every one of
+# them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/cache/gccsite',
+    }
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Email
+EMAIL_HOST = "localhost"
+EMAIL_PORT = 25
+
+# Geocoding of the centers
+CENTERS_GEOCODING_OPTIONS = {'service': 'google', 'api_key': 'CHANGEME'}
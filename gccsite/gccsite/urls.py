@@ -1,20 +1,19 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import TemplateView
 
-import debug_toolbar
-
 urlpatterns = [
-    # Debug toolbar
-    path('__debug__/', include(debug_toolbar.urls)),
     # GCC
     path('', include('gcc.urls', namespace='gcc')),
     # GCC
     path('user/', include('users.urls', namespace='users')),
+    # Centers
+    path('centers/', include('centers.urls', namespace='centers')),
     # Oauth
     path(
         'user/auth/',
@@ -28,6 +27,11 @@ urlpatterns = [
     path('news/', include('news.urls')),
 ]
 
+if apps.is_installed('debug_toolbar'):
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))
+
 if settings.DEBUG:
     urlpatterns.extend(
         [
@@ -10,6 +10,9 @@ class NewsConfig(AppConfig):
     verbose_name = 'News'
 
     def ready(self):
+        # Register signal handlers
+        import news.signals  # noqa
+
         # Terrible monkey patching to use our own author URL instead of
         # built-in zinnia profile. This is required because zinnia uses the
         # username in the URL but our username authorized charset is more
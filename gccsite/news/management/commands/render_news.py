@@ -0,0 +1,81 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from zinnia.models import Entry
+
+from news.models import RenderedEntry
+from news.rendering import content_hash, markup_version, render_entry
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the HTML of the news entries in parallel, to be run when the "
+        "markup pipeline changes. Only the stale entries are rendered unless "
+        "--all is given."
+    )
+
+    def add_arguments(self, parser):
+        """
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help="number of rendering processes",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="render the entries which are up to date too",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        entries = Entry.objects.values_list(
+            'pk',
+            'content',
+            'lead',
+            'rendering__content_hash',
+            'rendering__version',
+        )
+        stale = [
+            (pk, content, lead)
+            for pk, content, lead, rendered_hash, version in entries
+            if options['all']
+            or (rendered_hash, version)
+            != (content_hash(content, lead), markup_version())
+        ]
+
+        if not stale:
+            self.stdout.write("All entries are up to date.")
+            return
+
+        with ProcessPoolExecutor(
+            options['processes'], initializer=django.setup
+        ) as executor:
+            htmls = executor.map(
+                render_entry,
+                [content for _, content, _ in stale],
+                [lead for _, _, lead in stale],
+                chunksize=max(1, len(stale) // (4 * options['processes'])),
+            )
+
+            with transaction.atomic():
+                for (pk, content, lead), (html, lead_html) in zip(
+                    stale, htmls
+                ):
+                    RenderedEntry.store(pk, content, lead, html, lead_html)
+
+        self.stdout.write(
+            "Rendered {} entries in {:.1f}s.".format(
+                len(stale), time.perf_counter() - start
+            )
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.3 on 2019-08-27 20:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('zinnia', '0004_on_delete_arg'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedEntry',
+            fields=[
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rendering', serialize=False, to='zinnia.Entry')),
+                ('content_hash', models.CharField(max_length=40)),
+                ('version', models.CharField(max_length=40)),
+                ('html', models.TextField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2019-09-02 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renderedentry',
+            name='lead_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
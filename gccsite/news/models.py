@@ -1,12 +1,22 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
-from django.utils.html import linebreaks
-from zinnia.markups import markdown
-from zinnia.markups import restructuredtext
-from zinnia.markups import textile
+from django.db import models
+from zinnia.managers import EntryPublishedManager
 from zinnia.models_bases.entry import AbstractEntry
-from zinnia.settings import MARKUP_LANGUAGE
+
+from news.rendering import (
+    content_hash,
+    is_stale,
+    markup_version,
+    render,
+    render_lead,
+)
+
+
+class NewsEntryPublishedManager(EntryPublishedManager):
+    def get_queryset(self):
+        return super().get_queryset().select_related('rendering')
 
 
 class NewsEntry(AbstractEntry):
@@ -14,21 +24,89 @@ class NewsEntry(AbstractEntry):
     Represents a news entry.
     """
 
-    # The default Zinnia implementation of this does stupid content sniffing,
-    # assuming that if something contains </p> it is raw HTML. That's not true,
-    # since Markdown can contain HTML.
+    # Redeclared first to remain the default manager
+    objects = models.Manager()
+    published = NewsEntryPublishedManager()
+
+    @property
+    def fresh_rendering(self):
+        """
+        The stored rendering of the entry, None if there is none or if it is
+        out of date.
+        """
+        try:
+            rendering = self.rendering
+        except RenderedEntry.DoesNotExist:
+            return None
+
+        if is_stale(rendering, self.content, self.lead):
+            return None
+
+        return rendering
+
     @property
     def html_content(self):
         """
-        Returns the "content" field formatted in HTML.
+        Returns the "content" field formatted in HTML, from the stored
+        rendering if it is up to date. Otherwise it is rendered but not
+        stored, which is left to the post_save signal and the render_news
+        command.
         """
-        if MARKUP_LANGUAGE == 'markdown':
-            return markdown(self.content)
-        elif MARKUP_LANGUAGE == 'textile':
-            return textile(self.content)
-        elif MARKUP_LANGUAGE == 'restructuredtext':
-            return restructuredtext(self.content)
-        return linebreaks(self.content)
+        rendering = self.fresh_rendering
+        if rendering is None:
+            return render(self.content)
+
+        return rendering.html
+
+    @property
+    def html_lead(self):
+        """
+        Returns the "lead" field formatted in HTML, like html_content.
+        """
+        rendering = self.fresh_rendering
+        if rendering is None:
+            return render_lead(self.lead)
+
+        return rendering.lead_html
 
     class Meta(AbstractEntry.Meta):
         abstract = True
+
+
+class RenderedEntry(models.Model):
+    """
+    HTML of a news entry, see news.rendering.
+    """
+
+    entry = models.OneToOneField(
+        'zinnia.Entry',
+        primary_key=True,
+        related_name='rendering',
+        on_delete=models.CASCADE,
+    )
+    content_hash = models.CharField(max_length=40)
+    version = models.CharField(max_length=40)
+    html = models.TextField()
+    lead_html = models.TextField(blank=True, default='')
+
+    @classmethod
+    def store(cls, entry_id, content, lead, html=None, lead_html=None):
+        """
+        Save the HTML of the content and lead of an entry, rendering them if
+        not given.
+        """
+        rendering, _ = cls.objects.update_or_create(
+            entry_id=entry_id,
+            defaults={
+                'content_hash': content_hash(content, lead),
+                'version': markup_version(),
+                'html': render(content) if html is None else html,
+                'lead_html': (
+                    render_lead(lead) if lead_html is None else lead_html
+                ),
+            },
+        )
+        return rendering
+
+    def __str__(self):
+        return 'Rendering of {}'.format(self.entry_id)
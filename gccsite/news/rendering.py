@@ -0,0 +1,94 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Stored HTML of the news entries.
+
+The rendered content and lead of each entry are saved in a RenderedEntry when
+the entry is saved, along with the hash of their source and the version of the
+markup pipeline they were rendered with. NewsEntry.html_content and
+NewsEntry.html_lead serve them as long as both match, so that list pages,
+archives and feeds don't run the markup conversion on each request. A stale
+rendering is rendered again in memory but not saved, reads never write.
+
+Bump RENDERER_VERSION whenever the output of the pipeline changes (e.g.
+prologin.utils.markdown), then re-render the entries with the `render_news`
+management command.
+"""
+
+import functools
+import hashlib
+
+import markdown
+from django.conf import settings
+from django.utils.html import linebreaks
+from zinnia.markups import restructuredtext
+from zinnia.markups import textile
+from zinnia.settings import MARKUP_LANGUAGE
+
+from prologin.utils.markdown import render as render_markdown
+
+RENDERER_VERSION = 1
+
+
+def render(content):
+    """
+    Format the "content" field of an entry in HTML.
+    """
+    # The default Zinnia implementation of this does stupid content sniffing,
+    # assuming that if something contains </p> it is raw HTML. That's not
+    # true, since Markdown can contain HTML.
+    if MARKUP_LANGUAGE == 'markdown':
+        return render_markdown(content, engine='news')
+    elif MARKUP_LANGUAGE == 'textile':
+        return textile(content)
+    elif MARKUP_LANGUAGE == 'restructuredtext':
+        return restructuredtext(content)
+    return linebreaks(content)
+
+
+def render_lead(lead):
+    """
+    Format the "lead" field of an entry in HTML, empty if there is no lead.
+    """
+    if not lead:
+        return ''
+
+    return render(lead)
+
+
+def render_entry(content, lead):
+    return render(content), render_lead(lead)
+
+
+def content_hash(content, lead=''):
+    return hashlib.sha1('\0'.join((content, lead)).encode()).hexdigest()
+
+
+@functools.lru_cache()
+def markup_version():
+    """
+    Identify the markup pipeline, rendered entries of another version are
+    stale.
+    """
+    return hashlib.sha1(
+        repr(
+            (
+                RENDERER_VERSION,
+                MARKUP_LANGUAGE,
+                [
+                    str(extension)
+                    for extension in settings.PROLOGIN_MARKDOWN_ENGINES['news']
+                ],
+                markdown.__version__,
+            )
+        ).encode()
+    ).hexdigest()
+
+
+def is_stale(rendering, content, lead=''):
+    return (
+        rendering is None
+        or rendering.content_hash != content_hash(content, lead)
+        or rendering.version != markup_version()
+    )
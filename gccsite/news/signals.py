@@ -0,0 +1,26 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from zinnia.models import Entry
+
+from news.models import RenderedEntry
+from news.rendering import is_stale
+
+
+@receiver(post_save, sender=Entry)
+def render_entry(sender, instance, raw=False, **kwargs):
+    """
+    Store the HTML of a saved entry, unless its content and lead didn't
+    change.
+    """
+    if raw:
+        return
+
+    rendering = RenderedEntry.objects.filter(entry=instance).first()
+
+    if is_stale(rendering, instance.content, instance.lead):
+        instance.rendering = RenderedEntry.store(
+            instance.pk, instance.content, instance.lead
+        )
@@ -1,6 +1,66 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+from django.contrib.sites.models import Site
+from django.core.management import call_command
 from django.test import TestCase
+from zinnia.managers import PUBLISHED
+from zinnia.models import Entry
 
-# Create your tests here.
+from news.models import RenderedEntry
+from news.rendering import markup_version
+
+
+class RenderedEntryTest(TestCase):
+    def setUp(self):
+        self.entry = Entry.objects.create(
+            title="News",
+            slug='news',
+            content="# Title\n\nSome *news*.",
+            lead="A *lead*.",
+            status=PUBLISHED,
+        )
+        self.entry.sites.add(Site.objects.get_current())
+
+    def test_rendered_on_save(self):
+        rendering = RenderedEntry.objects.get(entry=self.entry)
+        self.assertIn('<h1>Title</h1>', rendering.html)
+        self.assertEqual(rendering.lead_html, '<p>A <em>lead</em>.</p>')
+        self.assertEqual(rendering.version, markup_version())
+
+        self.entry.content = "Other *news*."
+        self.entry.save()
+        rendering.refresh_from_db()
+        self.assertEqual(rendering.html, '<p>Other <em>news</em>.</p>')
+
+        self.entry.lead = ''
+        self.entry.save()
+        rendering.refresh_from_db()
+        self.assertEqual(rendering.lead_html, '')
+
+    def test_html_is_stored(self):
+        entry = Entry.published.get(pk=self.entry.pk)
+        with self.assertNumQueries(0):
+            self.assertIn('<em>news</em>', entry.html_content)
+            self.assertIn('<em>lead</em>', entry.html_lead)
+
+    def test_stale_rendering(self):
+        RenderedEntry.objects.update(
+            version='old', html='old', lead_html='old'
+        )
+        entry = Entry.published.get(pk=self.entry.pk)
+        # Rendered in memory, reads don't write
+        with self.assertNumQueries(0):
+            self.assertIn('<em>news</em>', entry.html_content)
+            self.assertIn('<em>lead</em>', entry.html_lead)
+        self.assertEqual(RenderedEntry.objects.get(entry=entry).html, 'old')
+
+    def test_render_command(self):
+        RenderedEntry.objects.update(
+            version='old', html='old', lead_html='old'
+        )
+        call_command('render_news', processes=2)
+        rendering = RenderedEntry.objects.get(entry=self.entry)
+        self.assertEqual(rendering.version, markup_version())
+        self.assertIn('<h1>Title</h1>', rendering.html)
+        self.assertEqual(rendering.lead_html, '<p>A <em>lead</em>.</p>')
@@ -10,12 +10,13 @@ import uuid
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.core.files import File
 from django.urls import reverse
 from django.utils.html import conditional_escape
 from django.utils.translation import ugettext_lazy as _
 
+from prologin.utils.cache import cached  # noqa: F401
+
 
 def absolute_site_url(request, absolute_path):
     return "{protocol}://{host}{path}".format(
@@ -168,17 +169,17 @@ class ChoiceEnum(enum.Enum):
         return choices
 
 
-def cached(func, cache_setting_name, **kwargs):
-    assert callable(func)
-    cache_setting = settings.PROLOGIN_CACHES[cache_setting_name]
-    key = cache_setting.key
-    if kwargs:
-        key = key.format(**kwargs)
-    value = cache.get(key)
-    if value is None:
-        value = func()
-        cache.set(key, value, cache_setting.duration)
-    return value
+def msgpack_dumps(obj):
+    # msgpack is only required by the models using a MsgpackField
+    import msgpack
+
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def msgpack_loads(data):
+    import msgpack
+
+    return msgpack.unpackb(data, raw=False)
 
 
 def admin_url_for(model_admin, obj, method='change', label=lambda e: str(e)):
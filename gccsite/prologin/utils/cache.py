@@ -0,0 +1,171 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Declarative cache layer configured by settings.PROLOGIN_CACHES, a registry
+mapping names to CacheSetting(key, duration). The key is a template formatted
+with the parameters of the cached value, and the duration is its TTL in
+seconds (None to cache forever).
+
+    PROLOGIN_CACHES = {
+        'archives': CacheSetting('archives.{year}', 60 * 60),
+    }
+
+    @cache_result('archives')
+    def archives(year):
+        ...
+
+    archives(2019)              # computed once, then read from the cache
+    archives.invalidate()       # forget the archives of every year
+
+Values are stored along with their refresh date, so that falsy values are
+cached as well. During the last REFRESH_RATIO of their TTL, a single process
+recomputes them while the others keep on serving the cached value, and
+processes missing a value wait for the one computing it instead of all
+hitting the database at once.
+"""
+
+import functools
+import inspect
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Part of the TTL during which values are refreshed early
+REFRESH_RATIO = 0.1
+# Maximum time a process may spend computing a value before others compute
+# it too
+LOCK_TIMEOUT = 30
+# Time waited for another process to compute a missing value
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+
+def prologin_cache():
+    return caches[settings.PROLOGIN_CACHE_ALIAS]
+
+
+def namespace_version(cache_setting_name):
+    return prologin_cache().get_or_set(
+        'prologin.cache.version.' + cache_setting_name,
+        lambda: uuid.uuid4().hex,
+        None,
+    )
+
+
+def invalidate(cache_setting_name):
+    """
+    Forget all the values cached under a cache setting, whatever their
+    parameters.
+    """
+    prologin_cache().set(
+        'prologin.cache.version.' + cache_setting_name,
+        uuid.uuid4().hex,
+        None,
+    )
+
+
+def cache_key(cache_setting_name, **kwargs):
+    key = settings.PROLOGIN_CACHES[cache_setting_name].key
+
+    if kwargs:
+        key = key.format(**kwargs)
+
+    return 'prologin.cache.{}.{}.{}'.format(
+        cache_setting_name, namespace_version(cache_setting_name), key
+    )
+
+
+def wait_for(key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = prologin_cache().get(key)
+
+        if entry is not None:
+            return entry
+
+    return None
+
+
+def cached(func, cache_setting_name, **kwargs):
+    """
+    Get the value cached under the cache setting `cache_setting_name`, whose
+    key template is formatted with `kwargs`. The value is computed by calling
+    `func` if it is missing.
+    """
+    assert callable(func)
+    backend = prologin_cache()
+    duration = settings.PROLOGIN_CACHES[cache_setting_name].duration
+    key = cache_key(cache_setting_name, **kwargs)
+    lock = key + '.lock'
+    # Identifies this call as the owner of the lock
+    token = uuid.uuid4().hex
+    owned = False
+    entry = backend.get(key)
+
+    if entry is not None:
+        value, refresh_at = entry
+
+        if time.time() < refresh_at:
+            return value
+
+        # Let a single process refresh the value
+        owned = backend.add(lock, token, LOCK_TIMEOUT)
+
+        if not owned:
+            return value
+    else:
+        owned = backend.add(lock, token, LOCK_TIMEOUT)
+
+        if not owned:
+            entry = wait_for(key)
+
+            if entry is not None:
+                return entry[0]
+
+    # A process whose wait timed out computes the value without the lock,
+    # which remains held by its owner
+    try:
+        value = func()
+
+        if duration is None:
+            refresh_at = float('inf')
+        else:
+            refresh_at = time.time() + duration * (1 - REFRESH_RATIO)
+
+        backend.set(key, (value, refresh_at), duration)
+    finally:
+        if owned and backend.get(lock) == token:
+            backend.delete(lock)
+
+    return value
+
+
+def cache_result(cache_setting_name):
+    """
+    Decorator caching the result of a function under the cache setting
+    `cache_setting_name`, its key template is formatted with the arguments of
+    the function.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            return cached(
+                functools.partial(func, *args, **kwargs),
+                cache_setting_name,
+                **arguments.arguments,
+            )
+
+        wrapper.invalidate = functools.partial(invalidate, cache_setting_name)
+        return wrapper
+
+    return decorator
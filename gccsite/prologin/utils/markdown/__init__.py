@@ -0,0 +1,84 @@
+# Copyright (C) <2019> Association Prologin <association@prologin.org>
+# SPDX-License-Identifier: GPL-3.0+
+
+"""
+Pool of pre-configured Markdown engines, configured by
+settings.PROLOGIN_MARKDOWN_ENGINES, a registry mapping engine names to their
+list of extensions.
+
+    PROLOGIN_MARKDOWN_ENGINES = {
+        'nofollow': ['prologin.utils.markdown.nofollow'],
+    }
+
+    render('[site](https://prologin.org)', engine='nofollow')
+
+Building a markdown.Markdown instance loads its extensions and compiles and
+registers all their patterns and processors, which costs much more than
+converting a short document. Engines are thus built once per thread and
+engine name, and reset between documents. Values given to `render` as
+keyword arguments are available to the extensions during the conversion as
+`md.context`, e.g. the scoreboard of prologin.utils.markdown.scoreboard, whose
+rendered slices are reused between documents given the same Scoreboard
+instance.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import markdown
+from django.conf import settings
+
+
+class MarkdownPool:
+    """
+    Idle engines of each thread, by engine name. An engine is taken out of
+    the pool while it converts a document, so that documents rendered during
+    the conversion of another one get their own engine.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def idle(self, name):
+        if not hasattr(self.local, 'engines'):
+            self.local.engines = {}
+        return self.local.engines.setdefault(name, [])
+
+    @staticmethod
+    def build(name):
+        md = markdown.Markdown(
+            extensions=settings.PROLOGIN_MARKDOWN_ENGINES[name]
+        )
+        md.context = {}
+        return md
+
+    @contextmanager
+    def engine(self, name, **context):
+        idle = self.idle(name)
+        md = idle.pop() if idle else self.build(name)
+        md.context = context
+
+        try:
+            yield md
+        finally:
+            md.reset()
+            md.context = {}
+            idle.append(md)
+
+    def clear(self):
+        """
+        Forget the engines of the current thread, e.g. when the registry
+        changes.
+        """
+        self.local.engines = {}
+
+
+markdown_pool = MarkdownPool()
+
+
+def render(text, engine='default', **context):
+    """
+    Convert a Markdown document to HTML with a pooled engine.
+    """
+    with markdown_pool.engine(engine, **context) as md:
+        return md.convert(text)
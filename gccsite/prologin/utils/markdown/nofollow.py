@@ -10,56 +10,67 @@ Modify the behavior of links in Python-Markdown by adding rel="nofollow" to all
 
 from markdown import Extension
 from markdown.inlinepatterns import (
-    LinkPattern,
-    ReferencePattern,
-    AutolinkPattern,
-    AutomailPattern,
-    LINK_RE,
-    REFERENCE_RE,
-    SHORT_REF_RE,
     AUTOLINK_RE,
     AUTOMAIL_RE,
+    LINK_RE,
+    REFERENCE_RE,
+    AutolinkInlineProcessor,
+    AutomailInlineProcessor,
+    LinkInlineProcessor,
+    ReferenceInlineProcessor,
+    ShortReferenceInlineProcessor,
 )
 
 
 class NofollowMixin:
-    def handleMatch(self, m):
-        el = super().handleMatch(m)
+    def handleMatch(self, m, data):
+        el, start, end = super().handleMatch(m, data)
         if el is not None:
             el.set('rel', 'nofollow')
-        return el
+        return el, start, end
 
 
-class NofollowLinkPattern(NofollowMixin, LinkPattern):
+class NofollowLinkPattern(NofollowMixin, LinkInlineProcessor):
     pass
 
 
-class NofollowReferencePattern(NofollowMixin, ReferencePattern):
+class NofollowReferencePattern(NofollowMixin, ReferenceInlineProcessor):
     pass
 
 
-class NofollowAutolinkPattern(NofollowMixin, AutolinkPattern):
+class NofollowShortReferencePattern(
+    NofollowMixin, ShortReferenceInlineProcessor
+):
     pass
 
 
-class NofollowAutomailPattern(NofollowMixin, AutomailPattern):
+class NofollowAutolinkPattern(NofollowMixin, AutolinkInlineProcessor):
+    pass
+
+
+class NofollowAutomailPattern(NofollowMixin, AutomailInlineProcessor):
     pass
 
 
 class NofollowExtension(Extension):
-    def extendMarkdown(self, md, md_globals):
-        md.inlinePatterns['link'] = NofollowLinkPattern(LINK_RE, md)
-        md.inlinePatterns['reference'] = NofollowReferencePattern(
-            REFERENCE_RE, md
+    def extendMarkdown(self, md, md_globals=None):
+        # Replace the built-in patterns, with the same priorities
+        md.inlinePatterns.register(
+            NofollowReferencePattern(REFERENCE_RE, md), 'reference', 170
+        )
+        md.inlinePatterns.register(
+            NofollowLinkPattern(LINK_RE, md), 'link', 160
         )
-        md.inlinePatterns['short_reference'] = NofollowReferencePattern(
-            SHORT_REF_RE, md
+        md.inlinePatterns.register(
+            NofollowShortReferencePattern(REFERENCE_RE, md),
+            'short_reference',
+            130,
         )
-        md.inlinePatterns['autolink'] = NofollowAutolinkPattern(
-            AUTOLINK_RE, md
+        md.inlinePatterns.register(
+            NofollowAutolinkPattern(AUTOLINK_RE, md), 'autolink', 120
         )
-        md.inlinePatterns['automail'] = NofollowAutomailPattern(
-            AUTOMAIL_RE, md
+        md.inlinePatterns.register(
+            NofollowAutomailPattern(AUTOMAIL_RE, md), 'automail', 110
         )
 
 
@@ -1,21 +1,124 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+import os
 import re
+import threading
+import weakref
+from xml.etree import ElementTree as etree
+
 from django.template.loader import get_template
 from markdown import Extension
 from markdown.blockprocessors import BlockProcessor
-from markdown.util import etree
+from markdown.util import AtomicString
+
+from prologin.utils.scoring import Scoreboard
+
+
+def template_mtime(template):
+    """
+    Modification time of the file of a template, None if it doesn't come from
+    a file.
+    """
+    try:
+        return os.path.getmtime(template.origin.name)
+    except (OSError, TypeError):
+        return None
+
+
+def render_fragment(template, scoreboard):
+    """
+    Parse the HTML of a scoreboard. Its text is already rendered, so it is
+    marked as atomic to be skipped by the inline patterns.
+    """
+    fragment = etree.fromstring(template.render({'scoreboard': scoreboard}))
+    for element in fragment.iter():
+        if element.text:
+            element.text = AtomicString(element.text)
+        if element.tail:
+            element.tail = AtomicString(element.tail)
+    return fragment
+
+
+def copy_fragment(element):
+    """
+    Copy the elements of a fragment, sharing their immutable text.
+    """
+    fragment = element.makeelement(element.tag, element.attrib)
+    fragment.text = element.text
+    fragment.tail = element.tail
+    fragment.extend(copy_fragment(child) for child in element)
+    return fragment
+
+
+class FragmentCache:
+    """
+    Parsed HTML of the scoreboard slices, by scoreboard and by (slice,
+    template, template modification time). Entries of a scoreboard are
+    dropped along with the scoreboard, or when an item is inserted in it.
+    Callers get a copy of the element, which they may attach to their tree.
+
+    Fragments are only reused between documents rendered against the same
+    Scoreboard instance, so callers rendering many documents against one
+    ranking must wrap it in a Scoreboard once and pass that instance. Plain
+    rankings can't be told apart from an updated copy of themselves: they get
+    a new Scoreboard per document, whose fragments are dropped with it.
+    """
+
+    def __init__(self):
+        self.fragments = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def get(self, scoreboard, start, end, template_name):
+        template = get_template(template_name)
+        key = (start, end, template_name, template_mtime(template))
+
+        with self.lock:
+            version, fragments = self.fragments.get(scoreboard, (None, {}))
+            if version != scoreboard.version:
+                fragments = {}
+                self.fragments[scoreboard] = (scoreboard.version, fragments)
+            element = fragments.get(key)
+
+        if element is None:
+            element = render_fragment(template, scoreboard[start:end])
+            with self.lock:
+                fragments[key] = element
+
+        return copy_fragment(element)
+
+    def clear(self):
+        with self.lock:
+            self.fragments.clear()
+
+
+fragment_cache = FragmentCache()
 
 
 class ScoreboardProcessor(BlockProcessor):
     PATTERN = re.compile(
         r'\{%\s+scoreboard(?:\s+(?P<type>before|after)\s+(?P<n>[0-9]+))?\s+%\}'
     )
+    TEMPLATE_NAME = 'archives/inline-scoreboard.html'
 
-    def __init__(self, parser, scoreboard):
+    def __init__(self, parser, scoreboard=None, cache=True):
         super().__init__(parser)
         self.scoreboard = scoreboard
+        self.cache = cache
+
+    def get_scoreboard(self):
+        """
+        Get the scoreboard of the extension, or else the one given to the
+        pooled engine rendering the current document. Other rankings are
+        wrapped in a Scoreboard, once per document, so that their fragments
+        are only reused within that document.
+        """
+        if self.scoreboard is not None:
+            return self.scoreboard
+        context = self.parser.md.context
+        if not isinstance(context['scoreboard'], Scoreboard):
+            context['scoreboard'] = Scoreboard(context['scoreboard'])
+        return context['scoreboard']
 
     def test(self, parent, block):
         test = self.PATTERN.match(block)
@@ -35,23 +138,33 @@ class ScoreboardProcessor(BlockProcessor):
             else:
                 return
         scoreboard = etree.SubElement(parent, 'div', {'class': 'scoreboard'})
-        html = get_template('archives/inline-scoreboard.html').render(
-            {'scoreboard': self.scoreboard[start:end]}
-        )
-        scoreboard.append(etree.fromstring(html))
+        if self.cache:
+            fragment = fragment_cache.get(
+                self.get_scoreboard(), start, end, self.TEMPLATE_NAME
+            )
+        else:
+            fragment = render_fragment(
+                get_template(self.TEMPLATE_NAME),
+                self.get_scoreboard()[start:end],
+            )
+        scoreboard.append(fragment)
 
 
 class ScoreboardExtension(Extension):
-    def __init__(self, scoreboard, *args, **kwargs):
+    def __init__(self, scoreboard=None, cache=True, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if scoreboard is not None and not isinstance(scoreboard, Scoreboard):
+            scoreboard = Scoreboard(scoreboard)
         self.scoreboard = scoreboard
+        self.cache = cache
 
-    def extendMarkdown(self, md, md_globals):
+    def extendMarkdown(self, md, md_globals=None):
         """ Add an instance of ScoreboardProcessor to BlockParser. """
-        md.parser.blockprocessors.add(
+        # Right before the hash headers
+        md.parser.blockprocessors.register(
+            ScoreboardProcessor(md.parser, self.scoreboard, self.cache),
             'scoreboard',
-            ScoreboardProcessor(md.parser, self.scoreboard),
-            '<hashheader',
+            75,
         )
 
 
@@ -1,57 +1,142 @@
 # Copyright (C) <2019> Association Prologin <association@prologin.org>
 # SPDX-License-Identifier: GPL-3.0+
 
+from array import array
 from collections import namedtuple
 
 
 class Scoreboard:
+    """
+    Ranking of items, given best first. The rank and the ex-aequo flag of each
+    item are computed once and stored in compact arrays, so that slices are
+    views and the rank of a score is found by bisection.
+
+    Slices are by position in the ranking, starting from 1 and including both
+    bounds: scoreboard[:3] are the first three items, scoreboard[4:] all the
+    others. Each iteration of the scoreboard or of a slice is independent.
+    `version` changes each time an item is inserted.
+
+    The score of an item is given by `key`, or else by `get_score`. Best
+    scores are the highest ones, unless `reverse` is false.
+    """
+
     ScoreboardItem = namedtuple(
         'ScoreboardItem', 'rank ex_aequo nonlinear item'
     )
 
-    def __init__(self, iterable):
-        self.iterable = list(iterable)
-        self.slice = slice(0, None)
+    def __init__(self, iterable, key=None, reverse=True):
+        if key is not None:
+            self.get_score = key
+        self.reverse = reverse
+        self.version = 0
+        self.items = list(iterable)
+        self.scores = [self.get_score(item) for item in self.items]
+        self.ranks = array('L')
+        self.ex_aequo = bytearray(len(self.items))
+
+        for i, score in enumerate(self.scores):
+            if i and self.scores[i - 1] == score:
+                self.ranks.append(self.ranks[i - 1])
+                self.ex_aequo[i] = True
+            else:
+                self.ranks.append(i + 1)
 
     def get_score(self, item):
         return item['score']
 
+    def better(self, score, other):
+        return score > other if self.reverse else score < other
+
+    def bisect_left(self, score):
+        """
+        Position of the first item whose score is not better than `score`.
+        """
+        low, high = 0, len(self.scores)
+        while low < high:
+            middle = (low + high) // 2
+            if self.better(self.scores[middle], score):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def bisect_right(self, score):
+        """
+        Position of the first item whose score is worse than `score`.
+        """
+        low, high = 0, len(self.scores)
+        while low < high:
+            middle = (low + high) // 2
+            if self.better(score, self.scores[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def rank(self, score):
+        """
+        Get the rank of an item with the given score.
+        """
+        return self.bisect_left(score) + 1
+
+    def insert(self, item):
+        """
+        Add an item after those with the same score, updating the ranks of
+        the following ones.
+        """
+        score = self.get_score(item)
+        i = self.bisect_right(score)
+        ex_aequo = i > 0 and self.scores[i - 1] == score
+
+        self.items.insert(i, item)
+        self.scores.insert(i, score)
+        self.ranks.insert(i, self.ranks[i - 1] if ex_aequo else i + 1)
+        self.ex_aequo.insert(i, ex_aequo)
+        self.ranks[i + 1 :] = array('L', (r + 1 for r in self.ranks[i + 1 :]))
+        self.version += 1
+
+    def entry(self, i):
+        """
+        Get the ScoreboardItem at index `i`, from 0.
+        """
+        rank = self.ranks[i]
+        return Scoreboard.ScoreboardItem(
+            rank=rank,
+            ex_aequo=bool(self.ex_aequo[i]),
+            nonlinear=i > 0 and self.ranks[i - 1] != rank - 1,
+            item=self.items[i],
+        )
+
     def __getitem__(self, item):
         if isinstance(item, slice):
-            self.slice = item
-            return self.__iter__()
+            start = 0 if item.start is None else max(item.start - 1, 0)
+            stop = len(self) if item.stop is None else item.stop
+            return ScoreboardSlice(self, start, max(min(stop, len(self)), 0))
         raise AttributeError()
 
     def __len__(self):
-        return len(self.iterable)
+        return len(self.items)
 
     def __iter__(self):
-        self.rank = 1
-        self.previous_score = None
-        self.ex_aequo = True
-        self.items = enumerate(self.iterable, 1)
-        return self
-
-    def __next__(self):
-        while True:
-            i, item = next(self.items)
-            score = self.get_score(item)
-            last_rank = self.rank
-            self.ex_aequo = True
-            if self.previous_score is None or self.previous_score != score:
-                self.rank = i
-                self.ex_aequo = False
-                self.previous_score = score
-            if self.slice.stop is not None and i > self.slice.stop:
-                raise StopIteration
-            if self.slice.start is None or i >= self.slice.start:
-                break
-        return Scoreboard.ScoreboardItem(
-            rank=self.rank,
-            ex_aequo=self.ex_aequo,
-            nonlinear=i > 1 and last_rank != self.rank - 1,
-            item=item,
-        )
+        return iter(self[:])
+
+
+class ScoreboardSlice:
+    """
+    View of the items of a Scoreboard from index `start` to `stop`, from 0.
+    """
+
+    def __init__(self, scoreboard, start, stop):
+        self.scoreboard = scoreboard
+        self.start = start
+        self.stop = max(start, stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.scoreboard.entry(i)
 
 
 def decorate_with_rank(iterable, score_getter, decorator):
@@ -67,13 +152,5 @@ def decorate_with_rank(iterable, score_getter, decorator):
     """
     assert callable(score_getter)
     assert callable(decorator)
-    rank = 1
-    previous_score = None
-    for i, item in enumerate(iterable, 1):
-        score = score_getter(item)
-        ex_aequo = True
-        if previous_score is None or previous_score != score:
-            rank = i
-            ex_aequo = False
-            previous_score = score
-        decorator(item, rank, ex_aequo)
+    for entry in Scoreboard(iterable, key=score_getter):
+        decorator(entry.item, entry.rank, entry.ex_aequo)
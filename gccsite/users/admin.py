@@ -9,6 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 
 @admin.register(get_user_model())
 class GCCUserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + ('participations',)
     fieldsets = UserAdmin.fieldsets + (
         (
             _("Profil"),
@@ -27,3 +28,12 @@ class GCCUserAdmin(UserAdmin):
         ),
         (_("Settings"), {'fields': ('allow_mailing', 'timezone')}),
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_participations()
+
+    def participations(self, obj):
+        return obj.participations
+
+    participations.admin_order_field = 'participations'
+    participations.short_description = _("Participations")
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.3 on 2019-08-24 14:12
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import users.models
+
+CONFIRMED = 5
+
+
+def backfill_participations_count(apps, schema_editor):
+    Applicant = apps.get_model('gcc', 'Applicant')
+    GCCUser = apps.get_model('users', 'GCCUser')
+
+    confirmed = (
+        Applicant.objects.filter(user=OuterRef('pk'), status=CONFIRMED)
+        .order_by()
+        .values('user')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    GCCUser.objects.update(
+        participations_count=Coalesce(
+            Subquery(confirmed, output_field=IntegerField()), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_update_id'),
+        ('gcc', '0009_applicant_status'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='gccuser',
+            managers=[('objects', users.models.GCCUserManager())],
+        ),
+        migrations.AddField(
+            model_name='gccuser',
+            name='participations_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='Participations'
+            ),
+        ),
+        migrations.RunPython(
+            backfill_participations_count, migrations.RunPython.noop
+        ),
+    ]
@@ -4,10 +4,11 @@
 import hashlib
 
 from django.conf import settings
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
-from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
 from gcc.models import Applicant, ApplicantStatusTypes
@@ -17,6 +18,7 @@ from prologin.models import (
     EnumField,
     GenderField,
 )
+from prologin.utils.db import ConditionalSum
 from timezone_field import TimeZoneField
 
 
@@ -38,6 +40,44 @@ class EducationStage(ChoiceEnum):
         return tuple(m.value for m in cls)
 
 
+class GCCUserQuerySet(models.QuerySet):
+    def with_participations(self):
+        """
+        Annotate the users with the number of editions they took part in, as
+        `participations`.
+        """
+        return self.annotate(
+            participations=ConditionalSum(
+                applicant__status=ApplicantStatusTypes.confirmed.value
+            )
+        )
+
+    def update_participations_count(self):
+        """
+        Recompute the persisted participations counter of the users with a
+        single UPDATE.
+        """
+        confirmed = (
+            Applicant.objects.filter(
+                user=OuterRef('pk'),
+                status=ApplicantStatusTypes.confirmed.value,
+            )
+            .order_by()
+            .values('user')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.update(
+            participations_count=Coalesce(
+                Subquery(confirmed, output_field=IntegerField()), 0
+            )
+        )
+
+
+class GCCUserManager(UserManager.from_queryset(GCCUserQuerySet)):
+    pass
+
+
 class GCCUser(AbstractUser, AddressableModel):
     @staticmethod
     def upload_seed(instance):
@@ -92,13 +132,13 @@ class GCCUser(AbstractUser, AddressableModel):
         choices=settings.LANGUAGES,
     )
 
-    @cached_property
-    def participations_count(self):
-        applicants = Applicant.objects.filter(user=self)
-        return sum(
-            (applicant.status == ApplicantStatusTypes.confirmed.value)
-            for applicant in applicants
-        )
+    # Denormalized number of confirmed applicants of the user, kept in sync by
+    # ApplicantQuerySet.update_status
+    participations_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Participations")
+    )
+
+    objects = GCCUserManager()
 
     @property
     def unsubscribe_token(self):
@@ -49,6 +49,9 @@ class ProfileView(DetailView):
     context_object_name = 'shown_user'
     template_name = 'users/profile.html'
 
+    def get_queryset(self):
+        return super().get_queryset().with_participations()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         shown_user = context[self.context_object_name]